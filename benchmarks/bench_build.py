@@ -0,0 +1,111 @@
+"""
+bench_build.py
+
+Benchmark for the model build phase (everything in Model.main() before the equations
+are solved), using a model with many sectors.
+
+The model consists of independent copies of model SIM (six sectors each), each in its
+own country and currency. The default of 84 countries gives 504 sectors.
+
+Usage (from the repository root):
+
+python benchmarks/bench_build.py [number_of_countries] [--profile]
+
+Copyright 2017 Brian Romanchuk
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sfc_models.models import Model, Country
+from sfc_models.sector import Market
+from sfc_models.sector_definitions import ConsolidatedGovernment, Household, FixedMarginBusiness, TaxFlow
+
+
+def build_sim_countries(num_countries):
+    """
+    Create a Model with num_countries copies of model SIM.
+    :param num_countries: int
+    :return: Model
+    """
+    mod = Model()
+    for i in range(0, num_countries):
+        code = 'C{0}'.format(i)
+        country = Country(mod, code, 'Country ' + code, currency=code)
+        gov = ConsolidatedGovernment(country, 'GOV', 'Government')
+        Household(country, 'HH', 'Household', alpha_income=.6, alpha_fin=.4)
+        FixedMarginBusiness(country, 'BUS', 'Business Sector')
+        TaxFlow(country, 'TF', 'TaxFlow', taxrate=.2)
+        Market(country, 'LAB', 'Labour market')
+        Market(country, 'GOOD', 'Goods market')
+        gov.SetExogenous('DEM_GOOD', '[0.,] + [20.,] * 105')
+    return mod
+
+
+def build_phases(mod):
+    """
+    Run the build phases of Model.main(), returning a list of (phase name, time).
+    :param mod: Model
+    :return: list
+    """
+    phases = [
+        ('_GenerateFullSectorCodes', mod._GenerateFullSectorCodes),
+        ('_GenerateEquations', mod._GenerateEquations),
+        ('_FixAliases', mod._FixAliases),
+        ('_GenerateRegisteredCashFlows', mod._GenerateRegisteredCashFlows),
+        ('_ProcessExogenous', mod._ProcessExogenous),
+        ('_CreateFinalEquations', mod._CreateFinalEquations),
+    ]
+    out = []
+    for name, func in phases:
+        start = time.time()
+        func()
+        out.append((name, time.time() - start))
+    return out
+
+
+def main(argv):
+    do_profile = '--profile' in argv
+    args = [x for x in argv if not x.startswith('--')]
+    num_countries = 84
+    if len(args) > 0:
+        num_countries = int(args[0])
+    start = time.time()
+    mod = build_sim_countries(num_countries)
+    construct_time = time.time() - start
+    print('Countries: {0}  Sectors: {1}'.format(num_countries, len(mod.GetSectors())))
+    print('{0:<32s}{1:8.3f} s'.format('Sector construction', construct_time))
+    if do_profile:
+        import cProfile
+        import pstats
+        pr = cProfile.Profile()
+        pr.enable()
+    timings = build_phases(mod)
+    if do_profile:
+        pr.disable()
+        pstats.Stats(pr).sort_stats('cumulative').print_stats(25)
+    for name, t in timings:
+        print('{0:<32s}{1:8.3f} s'.format(name, t))
+    print('{0:<32s}{1:8.3f} s'.format('Total build', construct_time + sum([x[1] for x in timings])))
+    print('Final equations: {0} lines'.format(len(mod.FinalEquations.split('\n'))))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,112 @@
+"""
+bench_scaling.py
+
+Scaling benchmark, using the synthetic models generated by large_model.py.
+
+For each combination of the number of countries (N) and the number of households
+per country (M), reports:
+- sector construction time;
+- build time (equation generation, up to the final equation string);
+- parse/reduce time (EquationSolver.ParseString());
+- solve time per period, and iterations per period;
+- peak memory allocated in the build, parse and solve phases (if tracemalloc is
+  available, and --no-memory is not given).
+
+Usage (from the repository root):
+
+python benchmarks/bench_scaling.py [--countries 1 2 4 8] [--households 1 4]
+    [--max-time 20] [--seed 0] [--output scaling.json] [--no-memory]
+
+Copyright 2017 Brian Romanchuk
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import sys
+
+from bench_suite import measure, generate_equations, parse_equations, get_machine_info, format_memory
+from large_model import build_large_model
+
+
+def run_case(num_countries, num_households, max_time, seed, trace_memory):
+    """
+    Benchmark one model size.
+    :param num_countries: int
+    :param num_households: int
+    :param max_time: int
+    :param seed: int
+    :param trace_memory: bool
+    :return: dict
+    """
+    def build():
+        mod = build_large_model(num_countries, num_households, seed)
+        mod.MaxTime = max_time
+        return mod
+
+    out = {'countries': num_countries, 'households': num_households, 'max_time': max_time}
+    mod, out['construct_time'], dummy = measure(build, trace_memory=False)
+    # Construction is repeated, as the equations can only be generated once per Model.
+    dummy, out['build_time'], out['build_peak_memory'] = measure(
+        lambda: generate_equations(build()), trace_memory)
+    out['build_time'] = max(0., out['build_time'] - out['construct_time'])
+    generate_equations(mod)
+    solver, out['parse_time'], out['parse_peak_memory'] = measure(lambda: parse_equations(mod), trace_memory)
+    dummy, solve_time, out['solve_peak_memory'] = measure(solver.SolveEquation, trace_memory)
+    out['solve_time_per_period'] = solve_time / max_time
+    out['iterations_per_period'] = float(sum(solver.IterationCounts)) / max_time
+    out['sectors'] = len(mod.GetSectors())
+    out['equations'] = len(solver.Parser.Endogenous)
+    return out
+
+
+def print_header():
+    print('{0:>4s} {1:>4s} {2:>8s} {3:>6s} {4:>9s} {5:>9s} {6:>9s} {7:>12s} {8:>8s} {9:>9s} {10:>9s}'.format(
+        'N', 'M', 'sectors', 'eqns', 'construct', 'build', 'parse', 'solve/period', 'iter/per',
+        'build mem', 'solve mem'))
+
+
+def print_case(case):
+    print('{0:4d} {1:4d} {2:8d} {3:6d} {4:8.3f}s {5:8.3f}s {6:8.3f}s {7:11.4f}s {8:8.1f} {9} {10}'.format(
+        case['countries'], case['households'], case['sectors'], case['equations'], case['construct_time'],
+        case['build_time'], case['parse_time'], case['solve_time_per_period'], case['iterations_per_period'],
+        format_memory(case['build_peak_memory']), format_memory(case['solve_peak_memory'])))
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='sfc_models scaling benchmark (synthetic models)')
+    parser.add_argument('--countries', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--households', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--max-time', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='file to write the results (JSON)')
+    parser.add_argument('--no-memory', action='store_true', help='do not measure peak memory')
+    args = parser.parse_args(argv)
+    results = {'machine': get_machine_info(), 'seed': args.seed, 'results': []}
+    print_header()
+    for num_households in args.households:
+        for num_countries in args.countries:
+            case = run_case(num_countries, num_households, args.max_time, args.seed, not args.no_memory)
+            results['results'].append(case)
+            print_case(case)
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,93 @@
+"""
+bench_startup.py
+
+Benchmark for the cost of importing sfc_models modules.
+
+Each import is timed in a fresh Python process (so that nothing is cached in
+sys.modules), --repeat times; the fastest time is reported. Also lists the slow
+optional modules (tkinter, matplotlib, pkg_resources) that an import drags in; there
+should be none.
+
+Usage (from the repository root):
+
+python benchmarks/bench_startup.py [--repeat 10] [module names]
+
+Copyright 2017 Brian Romanchuk
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MODULES = ['sfc_models', 'sfc_models.models', 'sfc_models.sector', 'sfc_models.equation_solver',
+                   'sfc_models.objects']
+HEAVY_MODULES = ['tkinter', 'Tkinter', 'matplotlib', 'pkg_resources']
+
+# Run in the child process. Measures the import of a module, and reports which heavy
+# modules are loaded.
+CHILD_CODE = """
+import json, sys, time
+start = time.time()
+__import__({module!r})
+elapsed = time.time() - start
+heavy = [m for m in {heavy!r} if m in sys.modules]
+print(json.dumps({{'time': elapsed, 'heavy': heavy}}))
+"""
+
+
+def time_import(module, python=sys.executable):
+    """
+    Import a module in a new Python process, returning (time, list of heavy modules loaded).
+
+    The interpreter startup time is not included.
+    :param module: str
+    :param python: str
+    :return: tuple
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([ROOT] + [x for x in [env.get('PYTHONPATH')] if x])
+    code = CHILD_CODE.format(module=module, heavy=HEAVY_MODULES)
+    out = subprocess.check_output([python, '-c', code], env=env)
+    info = json.loads(out.decode('utf-8').strip().split('\n')[-1])
+    return info['time'], info['heavy']
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='sfc_models import time benchmark')
+    parser.add_argument('modules', nargs='*', default=DEFAULT_MODULES)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args(argv)
+    # Make sure that the .pyc files exist, so that the first run is not penalised.
+    time_import('sfc_models.objects')
+    print('{0:<30s}{1:>12s}  {2}'.format('Module', 'Import (ms)', 'Heavy modules loaded'))
+    for module in args.modules:
+        best = None
+        heavy = []
+        for i in range(0, args.repeat):
+            elapsed, heavy = time_import(module)
+            if best is None or elapsed < best:
+                best = elapsed
+        print('{0:<30s}{1:12.1f}  {2}'.format(module, 1000. * best, ', '.join(heavy)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
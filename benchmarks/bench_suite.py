@@ -0,0 +1,324 @@
+"""
+bench_suite.py
+
+End-to-end benchmark suite over the models in sfc_models.gl_book.
+
+For each model and each MaxTime value, times three phases separately:
+- build: build_model() plus the equation generation in Model.main(), ending with the
+  final equation string;
+- parse: parsing the equations and equation reduction (EquationSolver.ParseString());
+- solve: EquationSolver.SolveEquation().
+
+Each phase is run --repeat times and the fastest time is kept. The suite also records
+the number of iterations per period and the peak memory allocated during each phase
+(if tracemalloc is available). Models that fail to build or solve are recorded with
+the error message.
+
+Results are written as JSON, along with information about the machine. A results
+file can be compared against a baseline; the comparison lists phases that are slower
+than the baseline by more than the threshold, and changes in the iteration counts.
+The exit status is 1 if there were regressions.
+
+Usage (from the repository root):
+
+python benchmarks/bench_suite.py [--output results.json] [--max-time 20 50 100]
+    [--models SIM PC] [--repeat 3]
+python benchmarks/bench_suite.py --compare baseline.json [results.json] [--threshold 0.2]
+
+If the results file is not given with --compare, the suite is run first.
+
+Copyright 2017 Brian Romanchuk
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import print_function
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import tracemalloc
+except ImportError:  # pragma: no cover   Python 2
+    tracemalloc = None
+
+from sfc_models.equation_solver import EquationSolver
+import sfc_models.gl_book.chapter3 as chapter3
+import sfc_models.gl_book.chapter4 as chapter4
+import sfc_models.gl_book.chapter6 as chapter6
+
+MODELS = [
+    ('SIM', chapter3.SIM),
+    ('SIMEX1', chapter3.SIMEX1),
+    ('PC', chapter4.PC),
+    ('REG', chapter6.REG),
+    ('REG2', chapter6.REG2),
+    ('OPENG', chapter6.OPENG),
+]
+
+# The book exogenous series have 105 points, which limits MaxTime to 104.
+DEFAULT_MAX_TIMES = [20, 50, 100]
+PHASES = ('build', 'parse', 'solve')
+
+
+def get_machine_info():
+    """
+    Information about the machine and the code version, stored with the results.
+    :return: dict
+    """
+    info = {
+        'timestamp': datetime.datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'node': platform.node(),
+    }
+    try:
+        import multiprocessing
+        info['cpu_count'] = multiprocessing.cpu_count()
+    except (ImportError, NotImplementedError):  # pragma: no cover
+        info['cpu_count'] = None
+    try:
+        repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=repo)
+        info['commit'] = commit.decode('ascii').strip()
+    except Exception:
+        info['commit'] = None
+    return info
+
+
+def measure(func, trace_memory=True):
+    """
+    Call func(), returning (result, elapsed time, peak memory in bytes).
+
+    The peak memory is None if tracemalloc is not available (or trace_memory is False).
+    As tracing slows down the code, the time is measured in a separate call without
+    tracing.
+    :param func: function
+    :param trace_memory: bool
+    :return: tuple
+    """
+    peak = None
+    if trace_memory and tracemalloc is not None:
+        tracemalloc.start()
+        try:
+            func()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    start = time.time()
+    result = func()
+    return result, time.time() - start, peak
+
+
+def build_equations(model_class, max_time):
+    """
+    Build a gl_book model, and generate the final equations.
+    :param model_class: class
+    :param max_time: int
+    :return: sfc_models.models.Model
+    """
+    mod = model_class('C', use_book_exogenous=True).build_model()
+    mod.MaxTime = max_time
+    generate_equations(mod)
+    return mod
+
+
+def generate_equations(mod):
+    """
+    Run the steps of Model.main() that generate the final equations.
+    :param mod: sfc_models.models.Model
+    :return: None
+    """
+    mod._GenerateFullSectorCodes()
+    mod._GenerateEquations()
+    mod._FixAliases()
+    mod._GenerateRegisteredCashFlows()
+    mod._ProcessExogenous()
+    mod.FinalEquations = mod._CreateFinalEquations()
+
+
+def parse_equations(mod):
+    """
+    Parse the equations of a built model into a new EquationSolver (with the same
+    MaxIterations and exogenous sources).
+    :param mod: sfc_models.models.Model
+    :return: EquationSolver
+    """
+    solver = EquationSolver()
+    solver.MaxIterations = mod.EquationSolver.MaxIterations
+    solver.ExogenousSources = mod.EquationSolver.ExogenousSources
+    solver.ParseString(mod.FinalEquations)
+    return solver
+
+
+def run_case(model_class, max_time, repeat):
+    """
+    Benchmark one model at one MaxTime.
+    :param model_class: class
+    :param max_time: int
+    :param repeat: int
+    :return: dict
+    """
+    out = {'max_time': max_time}
+    for phase in PHASES:
+        out[phase] = {'time': None, 'peak_memory': None}
+    # Every phase works on a fresh copy of the previous phase's output, so that
+    # repeated runs do the same work.
+    try:
+        for i in range(0, repeat):
+            mod, elapsed, peak = measure(lambda: build_equations(model_class, max_time))
+            _keep_best(out['build'], elapsed, peak)
+            solver, elapsed, peak = measure(lambda: parse_equations(mod))
+            _keep_best(out['parse'], elapsed, peak)
+            dummy, elapsed, peak = measure(solver.SolveEquation)
+            _keep_best(out['solve'], elapsed, peak)
+        out['iterations'] = list(solver.IterationCounts)
+        out['total_iterations'] = sum(solver.IterationCounts)
+        out['num_equations'] = len(solver.Parser.Endogenous)
+        out['num_variables'] = len(solver.TimeSeries.GetSeriesList())
+    except Exception as e:
+        out['error'] = '{0}: {1}'.format(type(e).__name__, str(e))
+    return out
+
+
+def _keep_best(entry, elapsed, peak):
+    if entry['time'] is None or elapsed < entry['time']:
+        entry['time'] = elapsed
+    if peak is not None:
+        entry['peak_memory'] = max(peak, entry['peak_memory'] or 0)
+
+
+def run_suite(model_names, max_times, repeat):
+    """
+    Run the benchmark suite.
+    :param model_names: list
+    :param max_times: list
+    :param repeat: int
+    :return: dict
+    """
+    results = {'machine': get_machine_info(), 'repeat': repeat, 'results': {}}
+    for name, model_class in MODELS:
+        if name not in model_names:
+            continue
+        results['results'][name] = {}
+        for max_time in max_times:
+            case = run_case(model_class, max_time, repeat)
+            results['results'][name][str(max_time)] = case
+            print_case(name, case)
+    return results
+
+
+def format_memory(peak):
+    if peak is None:
+        return '      n/a'
+    return '{0:7.2f}MB'.format(peak / 1e6)
+
+
+def print_case(name, case):
+    label = '{0:<8s}T={1:<5d}'.format(name, case['max_time'])
+    if 'error' in case:
+        print('{0} failed: {1}'.format(label, case['error']))
+        return
+    txt = label
+    for phase in PHASES:
+        txt += '  {0} {1:8.4f}s {2}'.format(phase, case[phase]['time'], format_memory(case[phase]['peak_memory']))
+    txt += '  iter/period {0:5.2f}'.format(float(case['total_iterations']) / max(1, len(case['iterations'])))
+    print(txt)
+
+
+def compare(baseline, results, threshold):
+    """
+    Compare results against a baseline. Returns a list of regression messages.
+
+    A phase regresses if its time exceeds the baseline time by more than threshold
+    (as a fraction); changes in iteration counts, and cases that fail now but did not
+    fail in the baseline, are also reported.
+    :param baseline: dict
+    :param results: dict
+    :param threshold: float
+    :return: list
+    """
+    out = []
+    for name in sorted(results['results']):
+        if name not in baseline['results']:
+            continue
+        for max_time in sorted(results['results'][name], key=int):
+            if max_time not in baseline['results'][name]:
+                continue
+            new = results['results'][name][max_time]
+            old = baseline['results'][name][max_time]
+            label = '{0} T={1}'.format(name, max_time)
+            if 'error' in new:
+                if 'error' not in old:
+                    out.append('{0}: now fails ({1})'.format(label, new['error']))
+                continue
+            if 'error' in old:
+                continue
+            for phase in PHASES:
+                t_old = old[phase]['time']
+                t_new = new[phase]['time']
+                if t_old > 0 and t_new > t_old * (1. + threshold):
+                    out.append('{0}: {1} slower: {2:.4f}s vs {3:.4f}s ({4:+.0%})'.format(
+                        label, phase, t_new, t_old, t_new / t_old - 1.))
+            if new['total_iterations'] != old['total_iterations']:
+                out.append('{0}: total iterations changed: {1} vs {2}'.format(
+                    label, new['total_iterations'], old['total_iterations']))
+    return out
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='sfc_models benchmark suite (gl_book models)')
+    parser.add_argument('--output', help='file to write the results (JSON)')
+    parser.add_argument('--max-time', type=int, nargs='+', default=DEFAULT_MAX_TIMES)
+    parser.add_argument('--models', nargs='+', default=[x[0] for x in MODELS])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--compare', nargs='+', metavar=('BASELINE', 'RESULTS'),
+                        help='compare results (run now if not given) against a baseline')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='relative slowdown that counts as a regression (default 0.2)')
+    args = parser.parse_args(argv)
+    if args.compare is not None and len(args.compare) > 1:
+        with open(args.compare[1], 'r') as f:
+            results = json.load(f)
+    else:
+        results = run_suite(args.models, args.max_time, args.repeat)
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+    if args.compare is None:
+        return 0
+    with open(args.compare[0], 'r') as f:
+        baseline = json.load(f)
+    regressions = compare(baseline, results, args.threshold)
+    if len(regressions) == 0:
+        print('No regressions against {0}'.format(args.compare[0]))
+        return 0
+    print('Regressions against {0}:'.format(args.compare[0]))
+    for msg in regressions:
+        print('  ' + msg)
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
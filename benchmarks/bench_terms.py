@@ -0,0 +1,108 @@
+"""
+bench_terms.py
+
+Benchmark for Term parsing during the model build, using the REG2 and OPENG models
+from Godley and Lavoie (chapter 6).
+
+Each model is built repeatedly (up to and including the creation of the final
+equations), once with the Term parse cache cleared before each build, and once with
+the cache shared across builds (as in a calibration loop).
+
+Usage (from the repository root):
+
+python benchmarks/bench_terms.py [number_of_builds]
+
+Copyright 2017 Brian Romanchuk
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sfc_models.equation
+from sfc_models.equation import Term
+from sfc_models.gl_book.chapter6 import REG2, OPENG
+from sfc_models.utils import Logger
+
+
+def build(builder_class):
+    """
+    Build a model up to the final equations.
+    :param builder_class: GL_book_model
+    :return: Model
+    """
+    mod = builder_class('C', use_book_exogenous=True).build_model()
+    mod._GenerateFullSectorCodes()
+    mod._GenerateEquations()
+    mod._FixAliases()
+    mod._GenerateRegisteredCashFlows()
+    mod._ProcessExogenous()
+    mod._CreateFinalEquations()
+    return mod
+
+
+def time_builds(builder_class, num_builds, clear_cache):
+    """
+    Time num_builds builds; returns the total time and the number of Term._Parse() calls.
+    :param builder_class: GL_book_model
+    :param num_builds: int
+    :param clear_cache: bool
+    :return: tuple
+    """
+    counter = [0]
+    original = Term._Parse
+
+    def counted(term_s, term):
+        counter[0] += 1
+        return original(term_s, term)
+
+    Term._Parse = staticmethod(counted)
+    sfc_models.equation._term_cache.clear()
+    try:
+        start = time.time()
+        for i in range(0, num_builds):
+            if clear_cache:
+                sfc_models.equation._term_cache.clear()
+            build(builder_class)
+        elapsed = time.time() - start
+    finally:
+        Term._Parse = staticmethod(original)
+    return elapsed, counter[0]
+
+
+def main(argv):
+    num_builds = 50
+    if len(argv) > 0:
+        num_builds = int(argv[0])
+    Logger.cleanup()
+    print('{0} builds per model'.format(num_builds))
+    for name, builder_class in (('REG2', REG2), ('OPENG', OPENG)):
+        try:
+            build(builder_class)
+        except Exception as e:
+            print('{0:<8s} skipped (build fails: {1})'.format(name, e))
+            continue
+        cold, cold_parses = time_builds(builder_class, num_builds, clear_cache=True)
+        warm, warm_parses = time_builds(builder_class, num_builds, clear_cache=False)
+        print('{0:<8s} cleared cache {1:7.3f} s ({2} parses)   shared cache {3:7.3f} s ({4} parses)'.format(
+            name, cold, cold_parses, warm, warm_parses))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,106 @@
+"""
+bench_tokens.py
+
+Microbenchmark for the token helpers in sfc_models.utils.
+
+Compares the tokenize module (the old code path) with the regular expression
+tokenizer, and with the cached lookup, on the equations of model PC.
+
+Usage (from the repository root):
+
+python benchmarks/bench_tokens.py
+
+Copyright 2017 Brian Romanchuk
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sfc_models.utils as utils
+from sfc_models.gl_book.chapter4 import PC
+
+
+def get_equation_strings():
+    """
+    Right hand sides of the equations of model PC (as created by the framework).
+    :return: list
+    """
+    model = PC('C', use_book_exogenous=True).build_model()
+    model._GenerateFullSectorCodes()
+    model._GenerateEquations()
+    model._FixAliases()
+    model._GenerateRegisteredCashFlows()
+    model._ProcessExogenous()
+    out = []
+    for row in model._CreateFinalEquations().split('\n'):
+        pos = row.find('#')
+        if pos > -1:
+            row = row[0:pos]
+        if '=' in row:
+            out.append(row.split('=')[1].strip())
+    return out
+
+
+def slow_list_tokens(s):
+    return [tokval for toknum, tokval in utils._tokenize_slow(s) if toknum == utils.NAME]
+
+
+def fast_list_tokens(s):
+    tokens = utils._fast_tokenize(s)
+    if tokens is None:
+        tokens = utils._tokenize_slow(s)
+    return [tokval for toknum, tokval in tokens if toknum == utils.NAME]
+
+
+def slow_replace(s, lookup):
+    result = [(toknum, lookup.get(tokval, tokval)) if toknum == utils.NAME else (toknum, tokval)
+              for toknum, tokval in utils._tokenize_slow(s)]
+    return utils.untokenize(result)
+
+
+def run_case(label, func, equations, number):
+    def loop():
+        for eqn in equations:
+            func(eqn)
+    t = min(timeit.repeat(loop, number=number, repeat=3))
+    per_call = 1e6 * t / (number * len(equations))
+    print('{0:<40s}{1:10.2f} us/call'.format(label, per_call))
+    return per_call
+
+
+def main():
+    equations = get_equation_strings()
+    number = 200
+    lookup = {'HH__DEM_GOOD': 'HH__X'}
+    print('{0} equation strings from model PC\n'.format(len(equations)))
+    base = run_case('list_tokens: tokenize module', slow_list_tokens, equations, number)
+    fast = run_case('list_tokens: regex tokenizer', fast_list_tokens, equations, number)
+    utils._token_cache.clear()
+    cached = run_case('list_tokens: cached', utils.list_tokens, equations, number)
+    print('  speedup (regex / cached): {0:.1f}x / {1:.1f}x\n'.format(base / fast, base / cached))
+    base = run_case('replace_token_from_lookup: tokenize', lambda s: slow_replace(s, lookup),
+                    equations, number)
+    new = run_case('replace_token_from_lookup: current',
+                   lambda s: utils.replace_token_from_lookup(s, lookup), equations, number)
+    print('  speedup: {0:.1f}x'.format(base / new))
+
+
+if __name__ == '__main__':
+    main()
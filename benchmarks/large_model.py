@@ -0,0 +1,121 @@
+"""
+large_model.py
+
+Generator for large synthetic models, used by the scaling benchmarks.
+
+The model has num_countries countries, each with its own currency, and is built from
+the standard sector classes in sfc_models.sector_definitions. Each country has:
+- a ConsolidatedGovernment ('GOV'), with constant demand for goods;
+- a TaxFlow ('TF');
+- a MoneyMarket ('MON') and a DepositMarket ('DEP'), both issued by the government;
+- num_households Household sectors ('HH0', 'HH1', ...), that split their wealth
+  between deposits and money, and share the labour market;
+- a FixedMarginBusinessMultiOutput ('BUS'), that supplies the local goods market and
+  exports to the goods market of the previous country;
+- a labour market ('LAB') and a goods market ('GOOD').
+
+So each country has num_households + 7 sectors. If there is more than one country,
+the goods markets are linked in a ring, with the cross-currency payments going
+through the ExternalSector.
+
+The first period of a run moves from zero to the steady flows, which can take more
+than the default number of iterations; the generated model allows 1000.
+
+Parameters (propensities to consume, tax rates, import shares, ...) are drawn from a
+random.Random object created with the seed, so a given (num_countries,
+num_households, seed) always generates the same model.
+
+Usage:
+
+from large_model import build_large_model
+mod = build_large_model(10, 5)
+mod.main()
+
+Copyright 2017 Brian Romanchuk
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sfc_models.models import Model, Country
+from sfc_models.external import ExternalSector
+from sfc_models.sector import Market
+from sfc_models.sector_definitions import ConsolidatedGovernment, Household, FixedMarginBusinessMultiOutput
+from sfc_models.sector_definitions import TaxFlow, MoneyMarket, DepositMarket
+
+
+def _draw(rng, low, high):
+    # Round, so that the equations are short and identical across platforms.
+    return round(rng.uniform(low, high), 3)
+
+
+def build_country(mod, code, num_households, rng):
+    """
+    Create the sectors of one country.
+    :param mod: Model
+    :param code: str
+    :param num_households: int
+    :param rng: random.Random
+    :return: Country
+    """
+    country = Country(mod, code, 'Country ' + code, currency='CUR_' + code)
+    gov = ConsolidatedGovernment(country, 'GOV', 'Government')
+    TaxFlow(country, 'TF', 'TaxFlow', taxrate=_draw(rng, .15, .25))
+    MoneyMarket(country, issuer_short_code='GOV')
+    DepositMarket(country, issuer_short_code='GOV')
+    labour = Market(country, 'LAB', 'Labour market')
+    goods = Market(country, 'GOOD', 'Goods market')
+    bus = FixedMarginBusinessMultiOutput(country, 'BUS', 'Business Sector', market_list=[goods, ])
+    goods.AddSupplier(bus)
+    # Labour supply: HH0 is the residual supplier, the others supply a fixed share.
+    share = 1. / num_households
+    for i in range(0, num_households):
+        hh = Household(country, 'HH{0}'.format(i), 'Household {0}'.format(i),
+                       alpha_income=_draw(rng, .55, .75), alpha_fin=_draw(rng, .2, .4))
+        hh.GenerateAssetWeighting({'DEP': repr(_draw(rng, .3, .7))}, 'MON')
+        if i == 0:
+            labour.AddSupplier(hh)
+        else:
+            labour.AddSupplier(hh, '{0!r} * DEM_LAB'.format(share))
+    gov.SetExogenous('DEM_GOOD', _draw(rng, 15., 25.))
+    return country
+
+
+def build_large_model(num_countries, num_households, seed=0):
+    """
+    Build the synthetic model (main() is not called).
+    :param num_countries: int
+    :param num_households: int
+    :param seed: int
+    :return: Model
+    """
+    rng = random.Random(seed)
+    mod = Model()
+    mod.EquationSolver.MaxIterations = 1000
+    if num_countries > 1:
+        ExternalSector(mod)
+    countries = [build_country(mod, 'C{0}'.format(i), num_households, rng)
+                 for i in range(0, num_countries)]
+    if num_countries > 1:
+        # Each country imports a share of its demand from the next one.
+        for i, country in enumerate(countries):
+            goods = country['GOOD']
+            exporter = countries[(i + 1) % num_countries]['BUS']
+            goods.AddSupplier(exporter, '{0!r} * DEM_GOOD'.format(_draw(rng, .1, .25)))
+            exporter.AddMarket(goods)
+    return mod
@@ -68,7 +68,6 @@ limitations under the License.
 import sys
 
 from sfc_models.utils import register_standard_logs
-from sfc_models.examples.install_examples import install_examples
 
 __all__ = ['models', 'sector', 'sector_definitions', 'utils']
 
@@ -85,5 +84,18 @@ class Parameters(object):
     pass
 
 
+def install_examples():  # pragma: no cover
+    """
+    Pops up windows to allow the user to choose a directory for installation
+    of sfc_models examples. (See sfc_models.examples.install_examples.)
+
+    The installer (and tkinter) is only imported when this is called, so that importing
+    sfc_models does not pay for it.
+    :return:
+    """
+    from sfc_models.examples.install_examples import install_examples as install
+    install()
+
+
 
 
@@ -0,0 +1,101 @@
+"""
+async_solver.py
+
+Solve an EquationSolver from asyncio code, without blocking the event loop.
+
+The periods are solved in an executor (a thread pool by default), in chunks of
+chunk_size periods; control returns to the event loop between chunks. The results
+are yielded one period at a time, in the same format as EquationSolver.IterSolve().
+
+async for result in solve_async(mod.EquationSolver):
+    print(result['step'], result['values']['GOOD__SUP_GOOD'])
+
+Stopping the loop early (or cancelling the task) stops the solution after the chunk
+that is running.
+
+Requires Python 3.7 or later (the rest of sfc_models does not import this module).
+
+Copyright 2017 Brian Romanchuk
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import asyncio
+
+
+def _next_chunk(generator, chunk_size):
+    """
+    Get up to chunk_size results from the generator.
+
+    Returns the list of results, and whether the generator is finished.
+    :param generator: generator
+    :param chunk_size: int
+    :return: tuple
+    """
+    out = []
+    for dummy in range(0, chunk_size):
+        try:
+            out.append(next(generator))
+        except StopIteration:
+            return out, True
+    return out, False
+
+
+async def solve_async(solver, params=None, chunk_size=10, executor=None):
+    """
+    Asynchronous generator that solves the equations, yielding the result for each
+    period (see EquationSolver.IterSolve()).
+    :param solver: sfc_models.equation_solver.EquationSolver
+    :param params: dict
+    :param chunk_size: int
+    :param executor: concurrent.futures.Executor
+    :return: async_generator
+    """
+    if chunk_size < 1:
+        raise ValueError('chunk_size must be at least 1')
+    loop = asyncio.get_running_loop()
+    generator = solver.IterSolve(params)
+    future = None
+    try:
+        while True:
+            future = loop.run_in_executor(executor, _next_chunk, generator, chunk_size)
+            # Shielded, so that cancelling the task does not abandon a running chunk.
+            chunk, done = await asyncio.shield(future)
+            future = None
+            for result in chunk:
+                yield result
+            if done:
+                return
+    finally:
+        if future is not None:
+            # Cancelled while a chunk is running; the generator can only be closed once it is done.
+            await asyncio.wait([future])
+        generator.close()
+
+
+async def solve(solver, params=None, chunk_size=10, executor=None):
+    """
+    Solve the equations without blocking the event loop (the asynchronous version of
+    EquationSolver.SolveEquation()).
+
+    Returns the number of periods solved.
+    :param solver: sfc_models.equation_solver.EquationSolver
+    :param params: dict
+    :param chunk_size: int
+    :param executor: concurrent.futures.Executor
+    :return: int
+    """
+    num_steps = 0
+    async for dummy in solve_async(solver, params, chunk_size, executor):
+        num_steps += 1
+    return num_steps
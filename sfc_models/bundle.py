@@ -0,0 +1,166 @@
+"""
+bundle.py
+
+Compiled model bundles: a compact file with everything the EquationSolver needs to
+solve a model, so that worker processes can load a model quickly and solve it without
+building it (or importing the sector classes).
+
+A bundle holds:
+- the variable table (names and descriptions);
+- the equations (endogenous, lagged, decoration), parameters, initial conditions
+  and exogenous definitions, as parsed by the EquationSolver;
+- the solver settings;
+- the compiled equation code (only used by the same Python version; other versions
+  compile the equations again);
+- user functions (see EquationSolver.AddFunction()), which have to be importable
+  module-level functions.
+
+Exogenous variables that are read from array-like objects or callables (see
+EquationSolver.AddExogenousSource()) are stored as lists of values up to MaxTime.
+
+In the main process:
+
+mod = build_model()
+mod.SaveBundle('model.bundle')
+
+In a worker:
+
+from sfc_models.bundle import load_bundle
+solver = load_bundle('model.bundle')
+solver.Solve(params={'HH__AlphaIncome': .65})
+
+Bundles are pickle files; only load bundles from sources that you trust.
+
+Copyright 2017 Brian Romanchuk
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import marshal
+import pickle
+import sys
+
+from sfc_models.equation_solver import EquationSolver
+
+FORMAT_NAME = 'sfc_models bundle'
+FORMAT_VERSION = 1
+
+# Solver attributes that are saved.
+SOLVER_SETTINGS = ('MaxIterations', 'MaxTime', 'ParameterErrorTolerance', 'ParameterSolveInitialSteadyState',
+                   'ParameterInitialSteadyStateMaxTime', 'ParameterInitialSteadyStateErrorToler',
+                   'ParameterInitialSteadyStateExcludedVariables', 'ParameterInitialSteadyStateStepError',
+                   'ParameterMemoryWindow', 'MaxWallTime', 'MaxStepTime', 'MaxTotalIterations')
+# Parser attributes that are saved.
+PARSER_FIELDS = ('Endogenous', 'Lagged', 'Decoration', 'Parameters', 'InitialConditions', 'MaxTime',
+                 'Err_Tolerance')
+
+
+def _get_code_version():
+    """
+    Identifies the compiled code format: code objects only load into the same version.
+    :return: tuple
+    """
+    return tuple(sys.version_info[0:2]) + (sys.implementation.name if hasattr(sys, 'implementation') else '',)
+
+
+def create_bundle(solver, descriptions=None):
+    """
+    Create the bundle contents (a dict of plain Python objects) for a parsed
+    EquationSolver.
+    :param solver: EquationSolver
+    :param descriptions: dict
+    :return: dict
+    """
+    if len(solver.VariableList) == 0:
+        solver.ExtractVariableList()
+    parser = solver.Parser
+    max_time = parser.MaxTime
+    exogenous = []
+    for var, eqn in parser.Exogenous:
+        if var in solver.ExogenousSources:
+            source = solver.ExogenousSources[var]
+            eqn = [EquationSolver._ReadSource(source, k) for k in range(0, max_time + 1)]
+        elif var == 'k' and not isinstance(eqn, str):
+            # The time axis created by SetInitialConditions(); created again when solving.
+            continue
+        exogenous.append((var, eqn))
+    try:
+        functions = pickle.dumps(solver.Functions, 2)
+    except Exception as e:
+        raise ValueError('Cannot save user functions in a bundle: {0}'.format(e))
+    # Make sure that all equations are compiled.
+    for var, eqn in parser.Endogenous + parser.Decoration:
+        solver._Compile(eqn)
+    out = {
+        'format': FORMAT_NAME,
+        'version': FORMAT_VERSION,
+        'variables': list(solver.VariableList),
+        'descriptions': dict(descriptions) if descriptions is not None else {},
+        'parser': dict([(x, getattr(parser, x)) for x in PARSER_FIELDS]),
+        'exogenous': exogenous,
+        'settings': dict([(x, getattr(solver, x)) for x in SOLVER_SETTINGS]),
+        'functions': functions,
+        'code_version': _get_code_version(),
+        'code': marshal.dumps(solver.CompiledEquations),
+    }
+    return out
+
+
+def load_bundle_contents(contents):
+    """
+    Create an EquationSolver from bundle contents (create_bundle()).
+    :param contents: dict
+    :return: EquationSolver
+    """
+    if contents.get('format') != FORMAT_NAME:
+        raise ValueError('Not a sfc_models bundle')
+    if contents['version'] > FORMAT_VERSION:
+        raise ValueError('Bundle version {0} is not supported'.format(contents['version']))
+    solver = EquationSolver()
+    parser = solver.Parser
+    for field in PARSER_FIELDS:
+        setattr(parser, field, contents['parser'][field])
+    parser.Exogenous = list(contents['exogenous'])
+    for name, value in contents['settings'].items():
+        setattr(solver, name, value)
+    solver.VariableList = list(contents['variables'])
+    solver.Descriptions = contents['descriptions']
+    solver.Functions = pickle.loads(contents['functions'])
+    solver.ParameterValues = solver.GetDefaultParameters()
+    if tuple(contents['code_version']) == _get_code_version():
+        solver.CompiledEquations = marshal.loads(contents['code'])
+    return solver
+
+
+def save_bundle(solver, file_name, descriptions=None):
+    """
+    Save a bundle file for an EquationSolver (which has to have parsed the equations).
+    :param solver: EquationSolver
+    :param file_name: str
+    :param descriptions: dict
+    :return: None
+    """
+    contents = create_bundle(solver, descriptions)
+    with open(file_name, 'wb') as f:
+        pickle.dump(contents, f, 2)
+
+
+def load_bundle(file_name):
+    """
+    Load a bundle file, returning an EquationSolver that is ready to solve.
+    :param file_name: str
+    :return: EquationSolver
+    """
+    with open(file_name, 'rb') as f:
+        contents = pickle.load(f)
+    return load_bundle_contents(contents)
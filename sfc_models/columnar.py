@@ -0,0 +1,303 @@
+"""
+columnar.py
+
+Binary columnar result format.
+
+A result set is a directory that holds one .npy file per series (float64, one
+dimension), plus an index file ("index.json") with the variable names, descriptions
+and sector codes. Unlike the tab-delimited output, values are not rounded.
+
+Results can be written from a solved model:
+
+model.WriteColumnar('output/run1')
+
+or while the solver runs, by adding a ColumnarSink to the EquationSolver.
+
+The ColumnarResults class opens a result directory. Only the index is read when
+it is opened; each series is memory-mapped when it is first accessed, so that a
+script can read one series out of a very large result set without reading the rest.
+
+Copyright 2017 Brian Romanchuk
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import json
+import mmap
+import os
+import sys
+from array import array
+
+from sfc_models.result_sinks import ResultSink, create_npy_header, read_npy_header, float_bytes
+from sfc_models.result_sinks import NPY_HEADER_SIZE
+from sfc_models.utils import TimeSeriesHolder
+
+is_python_3 = sys.version_info[0] == 3
+
+INDEX_FILE_NAME = 'index.json'
+FORMAT_NAME = 'sfc_models columnar'
+FORMAT_VERSION = 1
+
+
+def get_sector_code(variable_name):
+    """
+    Get the sector FullCode from a full variable name; global variables return ''.
+
+    >>> get_sector_code('HH__AlphaIncome')
+    'HH'
+    >>> get_sector_code('t')
+    ''
+
+    :param variable_name: str
+    :return: str
+    """
+    if '__' not in variable_name:
+        return ''
+    return variable_name.split('__')[0]
+
+
+def _column_file_name(i):
+    # Files are numbered, as variable names that only differ by case would collide
+    # on case-insensitive file systems.
+    return 'c{0:06d}.npy'.format(i)
+
+
+def _write_index(directory, series_names, length, descriptions, time_series_name):
+    if descriptions is None:
+        descriptions = {}
+    info = {
+        'format': FORMAT_NAME,
+        'version': FORMAT_VERSION,
+        'time_series': time_series_name,
+        'length': length,
+        'series': [{'name': name,
+                    'file': _column_file_name(i),
+                    'description': descriptions.get(name, ''),
+                    'sector': get_sector_code(name)} for i, name in enumerate(series_names)],
+    }
+    with open(os.path.join(directory, INDEX_FILE_NAME), 'w') as f:
+        json.dump(info, f, indent=1)
+
+
+def _prepare_directory(directory):
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+
+def write_columnar(directory, holder, descriptions=None):
+    """
+    Write the contents of a TimeSeriesHolder to a columnar result directory.
+
+    All series are written with the length of the shortest series. Raises a
+    ValueError if the holder no longer holds the early periods (if the solver only
+    holds a window of recent periods); use a ColumnarSink instead.
+
+    :param directory: str
+    :param holder: sfc_models.utils.TimeSeriesHolder
+    :param descriptions: dict
+    :return: None
+    """
+    series_names = holder.GetSeriesList()
+    for name in series_names:
+        first = getattr(holder[name], 'FirstIndex', 0)
+        if first > 0:
+            raise ValueError('Time series "{0}" only holds the periods from {1}; use a ColumnarSink '
+                             'to write all periods'.format(name, first))
+    _prepare_directory(directory)
+    if len(series_names) > 0:
+        length = min([len(holder[x]) for x in series_names])
+    else:
+        length = 0
+    for i, name in enumerate(series_names):
+        with open(os.path.join(directory, _column_file_name(i)), 'wb') as f:
+            f.write(create_npy_header((length,)))
+            f.write(float_bytes(holder[name][0:length]))
+    _write_index(directory, series_names, length, descriptions, holder.TimeSeriesName)
+
+
+class ColumnarSink(ResultSink):
+    """
+    ResultSink that writes a columnar result directory while the solver runs.
+
+    Rows are buffered, and appended to the column files every chunk_size periods
+    (and when the run ends). The index and the .npy headers are updated at every
+    flush, so the directory is readable at any time.
+    """
+    def __init__(self, directory, descriptions=None, chunk_size=1000, time_series_name='k'):
+        self.Directory = directory
+        self.Descriptions = descriptions
+        self.ChunkSize = chunk_size
+        self.TimeSeriesName = time_series_name
+        self.Buffer = []
+        self.Length = 0
+        self.SeriesNames = []
+
+    def Open(self, series_names):
+        ResultSink.Open(self, series_names)
+        _prepare_directory(self.Directory)
+        self.Buffer = []
+        self.Length = 0
+        for i in range(0, len(self.SeriesNames)):
+            with open(os.path.join(self.Directory, _column_file_name(i)), 'wb') as f:
+                f.write(create_npy_header((0,)))
+        _write_index(self.Directory, self.SeriesNames, 0, self.Descriptions, self.TimeSeriesName)
+
+    def WriteStep(self, step, values):
+        self.Buffer.append(values)
+        if len(self.Buffer) >= self.ChunkSize:
+            self.Flush()
+
+    def Flush(self):
+        """
+        Append the buffered rows to the column files.
+        :return: None
+        """
+        if len(self.Buffer) == 0:
+            return
+        new_length = self.Length + len(self.Buffer)
+        for i, column in enumerate(zip(*self.Buffer)):
+            with open(os.path.join(self.Directory, _column_file_name(i)), 'r+b') as f:
+                f.write(create_npy_header((new_length,)))
+                f.seek(0, 2)
+                f.write(float_bytes(column))
+        self.Length = new_length
+        self.Buffer = []
+        _write_index(self.Directory, self.SeriesNames, self.Length, self.Descriptions,
+                     self.TimeSeriesName)
+
+    def Close(self):
+        self.Flush()
+
+
+class ColumnarResults(object):
+    """
+    Read access to a columnar result directory.
+
+    results = ColumnarResults('output/run1')
+    y = results['GOOD__SUP_GOOD']
+
+    Series are returned as read-only sequences of floats that are backed by the
+    memory-mapped file (memoryview objects), so nothing is copied until the values
+    are used. Use GetSeries() to get a list copy of all or part of a series.
+
+    Call Close() (or use a "with" block) when done; all memoryviews that were returned
+    should be released first.
+    """
+    def __init__(self, directory):
+        self.Directory = directory
+        with open(os.path.join(directory, INDEX_FILE_NAME), 'r') as f:
+            info = json.load(f)
+        if info.get('format') != FORMAT_NAME:
+            raise ValueError('Not a columnar result directory: ' + directory)
+        self.TimeSeriesName = info['time_series']
+        self.Length = info['length']
+        self.SeriesInfo = {}
+        self.SeriesNames = []
+        for row in info['series']:
+            self.SeriesInfo[row['name']] = row
+            self.SeriesNames.append(row['name'])
+        self.Maps = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.Close()
+
+    def __contains__(self, series_name):
+        return series_name in self.SeriesInfo
+
+    def keys(self):
+        return list(self.SeriesNames)
+
+    def GetDescription(self, series_name):
+        """
+        :param series_name: str
+        :return: str
+        """
+        return self.SeriesInfo[series_name]['description']
+
+    def GetSector(self, series_name):
+        """
+        Sector FullCode associated with a series ('' for global variables).
+        :param series_name: str
+        :return: str
+        """
+        return self.SeriesInfo[series_name]['sector']
+
+    def _Map(self, series_name):
+        if series_name not in self.SeriesInfo:
+            raise KeyError('Time series "{0}" does not exist'.format(series_name))
+        if series_name not in self.Maps:
+            fname = os.path.join(self.Directory, self.SeriesInfo[series_name]['file'])
+            with open(fname, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            shape, offset = read_npy_header(mapped[0:NPY_HEADER_SIZE])
+            self.Maps[series_name] = (mapped, offset, min(shape[0], self.Length))
+        return self.Maps[series_name]
+
+    def __getitem__(self, series_name):
+        mapped, offset, length = self._Map(series_name)
+        if is_python_3 and sys.byteorder == 'little':
+            return memoryview(mapped)[offset:offset + 8 * length].cast('d')
+        else:  # pragma: no cover
+            return self.GetSeries(series_name)
+
+    def GetSeries(self, series_name, start=0, stop=None):
+        """
+        Get a list copy of a series (or the points in [start, stop)).
+        :param series_name: str
+        :param start: int
+        :param stop: int
+        :return: list
+        """
+        mapped, offset, length = self._Map(series_name)
+        if stop is None or stop > length:
+            stop = length
+        if stop <= start:
+            return []
+        out = array('d')
+        raw = mapped[offset + 8 * start:offset + 8 * stop]
+        if is_python_3:
+            out.frombytes(raw)
+        else:  # pragma: no cover
+            out.fromstring(raw)
+        if sys.byteorder != 'little':  # pragma: no cover
+            out.byteswap()
+        return out.tolist()
+
+    def GetTimeSeriesHolder(self, series_names=None):
+        """
+        Load series (by default, all of them) into a TimeSeriesHolder.
+        :param series_names: list
+        :return: TimeSeriesHolder
+        """
+        if series_names is None:
+            series_names = self.SeriesNames
+        out = TimeSeriesHolder(self.TimeSeriesName)
+        for name in series_names:
+            out[name] = self.GetSeries(name)
+        return out
+
+    def Close(self):
+        """
+        Unmap the files.
+        :return: None
+        """
+        for mapped, dummy, dummy2 in self.Maps.values():
+            try:
+                mapped.close()
+            except BufferError:  # pragma: no cover
+                # A memoryview is still in use; the map is closed when it is released.
+                pass
+        self.Maps = {}
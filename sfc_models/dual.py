@@ -0,0 +1,391 @@
+"""
+dual.py
+
+Dual numbers, for forward-mode automatic differentiation.
+
+A Dual holds a value, and the derivatives of that value with respect to a fixed list
+of inputs. Arithmetic on Dual objects applies the chain rule, so that evaluating an
+equation on Dual inputs gives both the value and its derivatives.
+
+>>> x = Dual(2., (1., 0.))
+>>> y = Dual(3., (0., 1.))
+>>> z = x * y + 2. * x
+>>> z.Value
+10.0
+>>> z.Deriv
+(5.0, 2.0)
+
+The EquationSolver uses this to calculate sensitivities to parameters and exogenous
+variables; see EquationSolver.SensitivityVariables. The functions in MATH_FUNCTIONS
+replace those in the math module (and float() and round()) when the equations are
+evaluated.
+
+Operations that would drop the derivatives raise a DualError: converting a Dual to
+float (which includes the math functions that are not in MATH_FUNCTIONS):
+
+>>> math.erf(x)  # doctest: +IGNORE_EXCEPTION_DETAIL
+Traceback (most recent call last):
+...
+DualError: Cannot convert a dual number to float; the derivatives would be lost
+
+Copyright 2017 Brian Romanchuk
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import math
+import warnings
+
+
+class DualError(TypeError):
+    """
+    Raised by operations on dual numbers that would lose the derivatives.
+    """
+    pass
+
+
+class Dual(object):
+    """
+    Number with derivatives. Deriv is a tuple, with one entry per input.
+
+    Comparisons only use the value, so that min(), max() and if/else expressions
+    pick the branch that applies at the value. Rounding (round(), //, int()) gives
+    zero derivatives, as the result is piecewise constant.
+    """
+    __slots__ = ('Value', 'Deriv')
+
+    def __init__(self, value, deriv):
+        self.Value = float(value)
+        self.Deriv = tuple(deriv)
+
+    def __repr__(self):
+        return 'Dual({0!r}, {1!r})'.format(self.Value, self.Deriv)
+
+    def __float__(self):
+        raise DualError('Cannot convert a dual number to float; the derivatives would be lost')
+
+    def __int__(self):
+        return int(self.Value)
+
+    # Python 2
+    __long__ = __int__
+
+    def _Constant(self, value):
+        return Dual(value, self._Scale(0.))
+
+    def _Scale(self, factor):
+        return tuple([factor * d for d in self.Deriv])
+
+    def __add__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.Value + other.Value, [a + b for a, b in zip(self.Deriv, other.Deriv)])
+        return Dual(self.Value + other, self.Deriv)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.Value - other.Value, [a - b for a, b in zip(self.Deriv, other.Deriv)])
+        return Dual(self.Value - other, self.Deriv)
+
+    def __rsub__(self, other):
+        return Dual(other - self.Value, self._Scale(-1.))
+
+    def __mul__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.Value * other.Value,
+                        [self.Value * b + other.Value * a for a, b in zip(self.Deriv, other.Deriv)])
+        return Dual(self.Value * other, self._Scale(other))
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        if isinstance(other, Dual):
+            val = self.Value / other.Value
+            return Dual(val, [(a - val * b) / other.Value for a, b in zip(self.Deriv, other.Deriv)])
+        return Dual(self.Value / other, self._Scale(1. / other))
+
+    def __rtruediv__(self, other):
+        val = other / self.Value
+        return Dual(val, self._Scale(-val / self.Value))
+
+    # Python 2
+    __div__ = __truediv__
+    __rdiv__ = __rtruediv__
+
+    def __floordiv__(self, other):
+        return self._Constant(self.Value // get_value(other))
+
+    def __rfloordiv__(self, other):
+        return self._Constant(other // self.Value)
+
+    def __mod__(self, other):
+        # x % y = x - y * floor(x / y)
+        if isinstance(other, Dual):
+            quotient = math.floor(self.Value / other.Value)
+            return Dual(self.Value % other.Value, [a - quotient * b for a, b in zip(self.Deriv, other.Deriv)])
+        return Dual(self.Value % other, self.Deriv)
+
+    def __rmod__(self, other):
+        return Dual(other % self.Value, self._Scale(-math.floor(other / self.Value)))
+
+    def __round__(self, ndigits=None):
+        if ndigits is None:
+            return self._Constant(round(self.Value))
+        return self._Constant(round(self.Value, ndigits))
+
+    def __pow__(self, other):
+        if isinstance(other, Dual):
+            val = self.Value ** other.Value
+            log_val = math.log(self.Value) if self.Value > 0. else 0.
+            return Dual(val, [val * (b * log_val + other.Value * a / self.Value)
+                              for a, b in zip(self.Deriv, other.Deriv)])
+        if other == 0:
+            return Dual(1., self._Scale(0.))
+        return Dual(self.Value ** other, self._Scale(other * self.Value ** (other - 1)))
+
+    def __rpow__(self, other):
+        val = other ** self.Value
+        return Dual(val, self._Scale(val * math.log(other)))
+
+    def __neg__(self):
+        return Dual(-self.Value, self._Scale(-1.))
+
+    def __pos__(self):
+        return self
+
+    def __abs__(self):
+        if self.Value < 0.:
+            return -self
+        return self
+
+    def __bool__(self):
+        return self.Value != 0.
+
+    # Python 2
+    __nonzero__ = __bool__
+
+    def __eq__(self, other):
+        return self.Value == get_value(other)
+
+    def __ne__(self, other):
+        return self.Value != get_value(other)
+
+    def __lt__(self, other):
+        return self.Value < get_value(other)
+
+    def __le__(self, other):
+        return self.Value <= get_value(other)
+
+    def __gt__(self, other):
+        return self.Value > get_value(other)
+
+    def __ge__(self, other):
+        return self.Value >= get_value(other)
+
+    __hash__ = None
+
+
+def get_value(x):
+    """
+    Value of a Dual, or a plain number.
+
+    >>> get_value(Dual(2., (1.,)))
+    2.0
+    >>> get_value(3.)
+    3.0
+
+    :param x: Dual
+    :return: float
+    """
+    if isinstance(x, Dual):
+        return x.Value
+    return float(x)
+
+
+def get_derivatives(x, num_inputs):
+    """
+    Derivatives of a Dual (zero for a plain number).
+
+    >>> get_derivatives(4., 2)
+    (0.0, 0.0)
+
+    :param x: Dual
+    :param num_inputs: int
+    :return: tuple
+    """
+    if isinstance(x, Dual):
+        return x.Deriv
+    return (0.,) * num_inputs
+
+
+def get_distance(x, y):
+    """
+    Size of the change from y to x, including the changes in the derivatives; used for
+    convergence tests.
+
+    >>> get_distance(Dual(1., (2.,)), Dual(1.5, (1.,)))
+    1.5
+
+    :param x: Dual
+    :param y: Dual
+    :return: float
+    """
+    out = abs(get_value(x) - get_value(y))
+    if isinstance(x, Dual) or isinstance(y, Dual):
+        if isinstance(x, Dual):
+            num_inputs = len(x.Deriv)
+        else:
+            num_inputs = len(y.Deriv)
+        for a, b in zip(get_derivatives(x, num_inputs), get_derivatives(y, num_inputs)):
+            out += abs(a - b)
+    return out
+
+
+def get_relative_change(x, y):
+    """
+    Change from y to x used in the EquationSolver convergence test: the absolute
+    change (see get_distance()) if small, otherwise scaled by the size of the values.
+
+    >>> get_relative_change(Dual(100., (1.,)), Dual(50., (1.,)))
+    0.5
+
+    :param x: Dual
+    :param y: Dual
+    :return: float
+    """
+    difference = get_distance(x, y)
+    scale = max(abs(get_value(x)), abs(get_value(y)))
+    if difference < 1e-3 or scale == 0.:
+        return difference
+    return difference / scale
+
+
+def wrap_function(name, func):
+    """
+    Wrap a user function (see EquationSolver.AddFunction()) for evaluation with dual
+    numbers: a warning is given if the function returns a plain number for Dual
+    arguments, as its derivatives are then taken to be zero.
+    :param name: str
+    :param func: function
+    :return: function
+    """
+    def wrapped(*args):
+        out = func(*args)
+        if not isinstance(out, Dual):
+            for x in args:
+                if isinstance(x, Dual):
+                    warnings.warn('Function {0}() returned a plain number for dual number arguments; '
+                                  'its derivatives are taken to be zero'.format(name))
+                    break
+        return out
+    wrapped.__name__ = getattr(func, '__name__', name)
+    wrapped.__doc__ = func.__doc__
+    return wrapped
+
+
+def wrap_functions(functions):
+    """
+    Apply wrap_function() to a dict of user functions.
+    :param functions: dict
+    :return: dict
+    """
+    return dict([(name, wrap_function(name, func)) for name, func in functions.items()])
+
+
+def _unary(func, deriv_func):
+    def wrapped(x):
+        if not isinstance(x, Dual):
+            return func(x)
+        return Dual(func(x.Value), x._Scale(deriv_func(x.Value)))
+    wrapped.__name__ = func.__name__
+    wrapped.__doc__ = func.__doc__
+    return wrapped
+
+
+def _log(x, base=math.e):
+    if isinstance(base, Dual):
+        return _log(x) / _log(base)
+    if not isinstance(x, Dual):
+        return math.log(x, base)
+    return Dual(math.log(x.Value, base), x._Scale(1. / (x.Value * math.log(base))))
+
+
+def _pow(x, y):
+    if isinstance(x, Dual) or isinstance(y, Dual):
+        if not isinstance(x, Dual):
+            return y.__rpow__(x)
+        return x ** y
+    return math.pow(x, y)
+
+
+def _exp(x):
+    if not isinstance(x, Dual):
+        return math.exp(x)
+    val = math.exp(x.Value)
+    return Dual(val, x._Scale(val))
+
+
+def _piecewise_constant(func):
+    def wrapped(x):
+        if not isinstance(x, Dual):
+            return func(x)
+        return x._Constant(func(x.Value))
+    wrapped.__name__ = func.__name__
+    wrapped.__doc__ = func.__doc__
+    return wrapped
+
+
+def _float(x):
+    # float() is used in equations to convert ints; a Dual is already a float.
+    if isinstance(x, Dual):
+        return x
+    return float(x)
+
+
+def _round(x, ndigits=None):
+    # Python 2 round() does not call __round__().
+    if isinstance(x, Dual):
+        return x.__round__(ndigits)
+    if ndigits is None:
+        return round(x)
+    return round(x, ndigits)
+
+
+# Replacements for the math functions (and built-in functions) that can appear in equations.
+MATH_FUNCTIONS = {
+    'sqrt': _unary(math.sqrt, lambda v: 0.5 / math.sqrt(v)),
+    'exp': _exp,
+    'log': _log,
+    'log10': _unary(math.log10, lambda v: 1. / (v * math.log(10.))),
+    'sin': _unary(math.sin, math.cos),
+    'cos': _unary(math.cos, lambda v: -math.sin(v)),
+    'tan': _unary(math.tan, lambda v: 1. / math.cos(v) ** 2),
+    'atan': _unary(math.atan, lambda v: 1. / (1. + v * v)),
+    'tanh': _unary(math.tanh, lambda v: 1. - math.tanh(v) ** 2),
+    'asin': _unary(math.asin, lambda v: 1. / math.sqrt(1. - v * v)),
+    'acos': _unary(math.acos, lambda v: -1. / math.sqrt(1. - v * v)),
+    'sinh': _unary(math.sinh, math.cosh),
+    'cosh': _unary(math.cosh, math.sinh),
+    'log1p': _unary(math.log1p, lambda v: 1. / (1. + v)),
+    'expm1': _unary(math.expm1, math.exp),
+    'degrees': _unary(math.degrees, lambda v: 180. / math.pi),
+    'radians': _unary(math.radians, lambda v: math.pi / 180.),
+    'floor': _piecewise_constant(math.floor),
+    'ceil': _piecewise_constant(math.ceil),
+    'trunc': _piecewise_constant(math.trunc),
+    'fabs': abs,
+    'pow': _pow,
+    'float': _float,
+    'round': _round,
+}
@@ -34,17 +34,148 @@ else: # pragma: no cover
     from tokenize import untokenize, NAME, ENDMARKER, OP
 
 
-from sfc_models.utils import LogicError, replace_token_from_lookup
+from sfc_models.utils import LogicError, replace_token_from_lookup, list_equation_tokens, list_tokens
 
+# Cache of parsed (non-blob) terms: term string (with white space removed) -> (constant, term),
+# or the exception raised when parsing. Cleared when it reaches TERM_CACHE_SIZE entries.
+TERM_CACHE_SIZE = 20000
+_term_cache = {}
 
 
+class _TrackedTermList(list):
+    """
+    The list of Term objects of an Equation. Changes to the list reset the cached right
+    hand side and term index of the Equation, and added terms are owned by it.
+    """
+    __slots__ = ('Owner',)
+
+    def __init__(self, owner, terms=()):
+        list.__init__(self, terms)
+        self.Owner = owner
+
+    def _Changed(self):
+        # Owner is not set yet when unpickling.
+        owner = getattr(self, 'Owner', None)
+        if owner is None:
+            return
+        for t in self:
+            t.Owner = owner
+        owner._Modified(True)
+
+    def append(self, term):
+        list.append(self, term)
+        self._Changed()
+
+    def extend(self, terms):
+        list.extend(self, terms)
+        self._Changed()
+
+    def insert(self, i, term):
+        list.insert(self, i, term)
+        self._Changed()
+
+    def remove(self, term):
+        list.remove(self, term)
+        self._Changed()
+
+    def pop(self, *args):
+        out = list.pop(self, *args)
+        self._Changed()
+        return out
+
+    def sort(self, *args, **kwargs):
+        list.sort(self, *args, **kwargs)
+        self._Changed()
+
+    def reverse(self):
+        list.reverse(self)
+        self._Changed()
+
+    def __setitem__(self, i, val):
+        list.__setitem__(self, i, val)
+        self._Changed()
+
+    def __delitem__(self, i):
+        list.__delitem__(self, i)
+        self._Changed()
+
+    # Python 2
+    def __setslice__(self, i, j, val):
+        self.__setitem__(slice(i, j), val)
+
+    def __delslice__(self, i, j):
+        self.__delitem__(slice(i, j))
 
+    def __iadd__(self, terms):
+        self.extend(terms)
+        return self
+
+    def __imul__(self, n):
+        out = list.__imul__(self, n)
+        self._Changed()
+        return out
+
+
+class _TrackedEquationDict(dict):
+    """
+    The dict of equations of an EquationBlock. Adding or removing variables resets the
+    cached sorted list of variable names.
+    """
+    __slots__ = ('Owner',)
+
+    def __init__(self, owner):
+        dict.__init__(self)
+        self.Owner = owner
+
+    def _Changed(self):
+        # Owner is not set yet when unpickling.
+        owner = getattr(self, 'Owner', None)
+        if owner is not None:
+            owner._SortedKeys = None
+
+    def __setitem__(self, key, val):
+        if key not in self:
+            self._Changed()
+        dict.__setitem__(self, key, val)
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self._Changed()
+
+    def pop(self, *args):
+        out = dict.pop(self, *args)
+        self._Changed()
+        return out
+
+    def popitem(self):
+        out = dict.popitem(self)
+        self._Changed()
+        return out
+
+    def clear(self):
+        dict.clear(self)
+        self._Changed()
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self._Changed()
+        return dict.setdefault(self, key, default)
+
+    def update(self, *args, **kwargs):
+        dict.update(self, *args, **kwargs)
+        self._Changed()
 
 
 class Equation(object):
     """
     An equation object
+
+    Terms are indexed by their Term string, so that adding a term that already exists
+    does not search the term list. The right hand side string is cached, and is reset
+    when the terms change (AddTerm(), changes to TermList, or changing a Term).
     """
+    __slots__ = ('LeftHandSide', 'Description', '_TermList', '_TermIndex', '_RHS')
+
     def __init__(self, lhs, desc = '', rhs=()):
         """
         Create a new equation. Must pass the left hand side (variable name).
@@ -87,24 +218,63 @@ class Equation(object):
         self.Description = desc
         if type(rhs) == str:
             rhs = Equation.ParseString(rhs)
-        self.TermList = []
+        self._TermList = _TrackedTermList(self)
+        self._TermIndex = None
+        self._RHS = None
         for t in rhs:
             self.AddTerm(t)
 
+    @property
+    def TermList(self):
+        """
+        The list of Term objects. The list can be modified in place; changes reset
+        the cached right hand side and term index.
+        :return: list
+        """
+        return self._TermList
+
+    @TermList.setter
+    def TermList(self, terms):
+        self._TermList = _TrackedTermList(self, terms)
+        self._TermList._Changed()
+
+    def _Modified(self, term_changed):
+        """
+        Called when the terms are modified.
+        :param term_changed: bool
+        :return: None
+        """
+        self._RHS = None
+        if term_changed:
+            self._TermIndex = None
+
+    def _GetTermIndex(self):
+        if self._TermIndex is None:
+            index = {}
+            for t in self._TermList:
+                # Keep the first term if there are duplicates (which can be created by
+                # token replacement); this is the term that a search of the list would find.
+                if t.Term not in index:
+                    index[t.Term] = t
+            self._TermIndex = index
+        return self._TermIndex
+
     def GetRightHandSide(self):
         """
         Returns the string representation of the right hand side.
         :return: str
         """
-        out = [str(s) for s in self.TermList]
-        out = ''.join(out)
-        if out.startswith('+'):
-            out = out[1:]
-        # If we have no terms, we are equal to zero.
-        # This also happens if terms have a Constant = 0
-        if out == '':
-            out = '0.0'
-        return out
+        if self._RHS is None:
+            out = [str(s) for s in self._TermList]
+            out = ''.join(out)
+            if out.startswith('+'):
+                out = out[1:]
+            # If we have no terms, we are equal to zero.
+            # This also happens if terms have a Constant = 0
+            if out == '':
+                out = '0.0'
+            self._RHS = out
+        return self._RHS
 
     def RHS(self):
         """
@@ -120,16 +290,23 @@ class Equation(object):
         :return: None
         """
         term = Term(term)
-        if len(self.TermList) > 0:
+        if len(self._TermList) > 0:
             if term.IsBlob:
                 raise LogicError('Cannot add a blob to non-empty equation')
-        for other in self.TermList:
-            if term.Term == other.Term:
-                # Already exists; just add the constants together.
-                other.Constant += term.Constant
-                return
-        # Otherwise, append
-        self.TermList.append(term)
+        term.Owner = self
+        self._RHS = None
+        if len(self._TermList) == 0:
+            # Most equations have a single term; only build the index once needed.
+            list.append(self._TermList, term)
+            return
+        index = self._GetTermIndex()
+        if term.Term in index:
+            # Already exists; just add the constants together.
+            index[term.Term].Constant += term.Constant
+            return
+        # Otherwise, append (the index is updated here, so it is not reset)
+        list.append(self._TermList, term)
+        index[term.Term] = term
 
     def ReplaceTokensFromLookup(self, lookup):
         """
@@ -137,7 +314,7 @@ class Equation(object):
         :param lookup: dict
         :return:
         """
-        for t in self.TermList:
+        for t in self._TermList:
             t.ReplaceTokensFromLookup(lookup)
 
     @staticmethod
@@ -185,7 +362,12 @@ class Term(object):
         Expected additions:
         [1] Constant term
         [2] one variable times (divided by) another.
+
+        If the Term belongs to an Equation (Owner), changing Constant or Term resets the
+        Equation's cached right hand side.
     """
+    __slots__ = ('_Constant', '_Term', 'IsSimple', 'IsBlob', 'Owner')
+
     def __init__(self, term, is_blob=False):
         """
         Pass in a string (or possibly another term object), and is parsed.
@@ -200,9 +382,10 @@ class Term(object):
         :param term: str
         :param is_blob: False
         """
+        self.Owner = None
         if type(term) == Term:
-            self.Constant = term.Constant
-            self.Term = term.Term
+            self._Constant = term.Constant
+            self._Term = term.Term
             self.IsSimple = term.IsSimple
             # Ignore the is_blob input
             self.IsBlob = term.IsBlob
@@ -213,18 +396,49 @@ class Term(object):
         term_s = term_s.replace(' ','')
         if is_blob:
             # If we are a "blob", don't do any parsing.
-            self.Constant = 1.0
-            self.Term = term_s
+            self._Constant = 1.0
+            self._Term = term_s
             self.IsSimple = True
             self.IsBlob = True
             return
         self.IsBlob = False
+        self.IsSimple = True
+        parsed = _term_cache.get(term_s, None)
+        if parsed is None:
+            try:
+                parsed = Term._Parse(term_s, term)
+            except (LogicError, SyntaxError, NotImplementedError) as e:
+                # Failures are cached too, as Equation.ParseString() tries to parse every
+                # blob as a Term first.
+                parsed = e
+            if len(_term_cache) >= TERM_CACHE_SIZE:
+                _term_cache.clear()
+            _term_cache[term_s] = parsed
+        if isinstance(parsed, Exception):
+            raise type(parsed)(*parsed.args)
+        self._Constant, self._Term = parsed
+
+    @staticmethod
+    def _Parse(term_s, term):
+        """
+        Parse a (non-blob) term string, with white space removed.
+
+        Returns the constant and the term string without the sign; raises an error
+        if the term is not simple.
+
+        >>> Term._Parse('-(-x)', '-(-x)')
+        (1.0, 'x')
+
+        :param term_s: str
+        :param term: str
+        :return: tuple
+        """
         # Rule #1: Eliminate '+' or '-' at front
-        self.Constant = 1.0
+        constant = 1.0
         if term_s.startswith('+'):
             term_s = term_s[1:]
         elif term_s.startswith('-'):
-            self.Constant = -1.0
+            constant = -1.0
             term_s = term_s[1:]
         # Rule #2: Allow matched "("
         if term_s.startswith('('):
@@ -237,7 +451,7 @@ class Term(object):
                 term_s = term_s[1:]
             elif term_s.startswith('-'):
                 # Flip the sign
-                self.Constant *= -1.0
+                constant *= -1.0
                 term_s = term_s[1:]
         # We now cannot have embedded '+' or '-' signs.
         if  '+' in term_s:
@@ -249,28 +463,21 @@ class Term(object):
         # (Will eventually allow for things like '2*x'.)
         if len(term_s) == 0:
             raise LogicError('Attempting to create an empty term object.')
-        if is_python_3:
-            g = tokenize.tokenize(BytesIO(term_s.encode('utf-8')).readline)  # tokenize the string
-        else:  # pragma: no cover   [Do my coverage on Python 3]
-            g = tokenize.generate_tokens(BytesIO(term_s.encode('utf-8')).readline)  # tokenize the string
-        self.IsSimple = True
-        g = tuple(g)
         if is_python_3:
             # Behaviour changed on me, so needed to clean up logic.
             # Remove "white space" tokens
             # Note: The change in behaviour happened between version 3.5 and 3.7. This new code
             # worked for me on version 3.5 as well as 3.7.
-            cleaned = [x for x in g if x[0] not in (ENCODING, NEWLINE, ENDMARKER)]
+            # (list_equation_tokens() drops the white space tokens, and caches the result.)
+            cleaned = list_equation_tokens(term_s)
             if len(cleaned) == 1:
                 if cleaned[0][0] == NAME or cleaned[0][0] == NUMBER:
-                    self.Term = term_s
-                    return
+                    return constant, term_s
             elif len(cleaned) == 3:
                 # Allow
                 if ((cleaned[0][0] in (NAME,NUMBER)) and (cleaned[1][0] == OP) and (cleaned[2][0] in (NAME, NUMBER))
                     and (cleaned[1][1] in ('*', '/'))):
-                    self.Term = term_s
-                    return
+                    return constant, term_s
             # Puke otherwise
             raise NotImplementedError('Non-simple parsing not supported ' +
                                       '(Note: May fail for Python versions before 3.7 (?)): '+ term_s)
@@ -302,6 +509,8 @@ class Term(object):
             #         # self.IsSimple = False
             # self.Term = term_s
         else: # Python 2.7 # pragma: no cover
+            g = tokenize.generate_tokens(BytesIO(term_s.encode('utf-8')).readline)  # tokenize the string
+            g = tuple(g)
             # Missing the first term - augh
             if not g[-1][0] == ENDMARKER:  # pragma: no cover
                 raise LogicError('Internal error: tokenize behaviour changed')
@@ -310,16 +519,34 @@ class Term(object):
                     # Allow variable*variable as a "simple" Variable.
                     if g[0][0] == NAME and g[2][0] == NAME and g[1][0] == OP:
                         if g[1][1] in ('*', '/'):
-                            self.Term = term_s
-                            return
+                            return constant, term_s
                 raise NotImplementedError('Non-simple parsing not done')
                 # self.IsSimple = False
             else:
                 if not g[0][0] == NAME:
                     raise NotImplementedError('Non-simple parsing not done')
                     # self.IsSimple = False
-            self.Term = term_s
+            return constant, term_s
+
+    @property
+    def Constant(self):
+        return self._Constant
 
+    @Constant.setter
+    def Constant(self, value):
+        self._Constant = value
+        if self.Owner is not None:
+            self.Owner._Modified(False)
+
+    @property
+    def Term(self):
+        return self._Term
+
+    @Term.setter
+    def Term(self, value):
+        self._Term = value
+        if self.Owner is not None:
+            self.Owner._Modified(True)
 
     def __str__(self):
         """
@@ -344,6 +571,12 @@ class Term(object):
 
     def ReplaceTokensFromLookup(self, lookup):
         try:
+            # Leave the term untouched if it does not contain any of the tokens.
+            for tok in list_tokens(self.Term):
+                if tok in lookup:
+                    break
+            else:
+                return
             if self.IsBlob:
                 self.Term = replace_token_from_lookup(self.Term, lookup)
                 return
@@ -366,7 +599,17 @@ class EquationBlock(object):
     """
 
     def __init__(self):
-        self.Equations = {}
+        self._Equations = _TrackedEquationDict(self)
+        self._SortedKeys = None
+
+    @property
+    def Equations(self):
+        """
+        The dict of equations (by variable name). The dict can be modified in place;
+        adding or removing variables resets the cached sorted list of variable names.
+        :return: dict
+        """
+        return self._Equations
 
     def AddEquation(self, eqn):
         """
@@ -374,8 +617,7 @@ class EquationBlock(object):
         :param eqn: Equation
         :return: None
         """
-        key = eqn.LeftHandSide
-        self.Equations[key] = eqn
+        self._Equations[eqn.LeftHandSide] = eqn
 
     def GetEquationList(self):
         """
@@ -383,9 +625,9 @@ class EquationBlock(object):
 
         :return: list
         """
-        out = list(self.Equations.keys())
-        out.sort()
-        return out
+        if self._SortedKeys is None:
+            self._SortedKeys = sorted(self._Equations.keys())
+        return list(self._SortedKeys)
 
     def __getitem__(self, key):
         """
@@ -397,7 +639,7 @@ class EquationBlock(object):
         :param key: str
         :return: Equation
         """
-        return self.Equations[key]
+        return self._Equations[key]
 
     def __contains__(self, key):
         """
@@ -405,10 +647,10 @@ class EquationBlock(object):
         :param key: str
         :return: bool
         """
-        return key in self.Equations
+        return key in self._Equations
 
     def ReplaceTokensFromLookup(self, lookup):
-        for eq in self.Equations.values():
+        for eq in self._Equations.values():
             eq.ReplaceTokensFromLookup(lookup)
 
 
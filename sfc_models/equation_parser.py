@@ -18,7 +18,9 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
-from sfc_models.utils import list_tokens, get_invalid_variable_names, get_invalid_tokens, replace_token
+from tokenize import NAME
+
+from sfc_models.utils import get_invalid_variable_names, get_invalid_tokens, list_equation_tokens, LogicError
 
 
 class EquationParser(object):
@@ -33,9 +35,16 @@ class EquationParser(object):
         self.Lagged = []
         self.Exogenous = []
         self.Decoration = []
+        # Parameters: (variable, value string) pairs. Parameters are constants whose values
+        # are held by the EquationSolver, so that they can be changed without parsing again.
+        self.Parameters = []
         self.InitialConditions = {}
         self.AllEquations = {}
         self.Tokens = {}
+        # Token sequences of the equations in AllEquations, and the reverse index:
+        # variable -> set of variables whose equations refer to it.
+        self.TokenSequences = {}
+        self.References = {}
         self.MaxTime = 0
         self.Err_Tolerance = '1e-8'
 
@@ -48,6 +57,14 @@ class EquationParser(object):
         By default, always adds the variables 't' and 'lag_t' as a time axis, unless the user specifies an
         equation for those variables.
 
+        Equations after a '# Parameters' line are parameters, which have to be numbers.
+
+        >>> p = EquationParser()
+        >>> p.ParseString('x = a*t\\n# Parameters\\na = 0.5')
+        ''
+        >>> p.Parameters
+        [('a', '0.5')]
+
         :param equation_string: str
         :return: str
         """
@@ -56,9 +73,12 @@ class EquationParser(object):
         self.Lagged = []
         self.Exogenous = []
         self.Decoration = []
+        self.Parameters = []
         self.AllEquations = {}
         self.InitialConditions = {}
         self.Tokens = {}
+        self.TokenSequences = {}
+        self.References = {}
         self.MaxTime = 0
         self.Err_Tolerance = '1e-8'
         equation_list = equation_string.split('\n')
@@ -71,6 +91,9 @@ class EquationParser(object):
             if 'exogenous' in equation.lower():
                 mode = 'exogenous'
                 continue
+            if equation.strip().lower() in ('# parameters', '#parameters'):
+                mode = 'parameter'
+                continue
             # Remove comments (like this one!)
             pos = equation.find('#')
             if pos > -1:
@@ -118,6 +141,12 @@ class EquationParser(object):
                     self.Endogenous.append((varname, eqn))
                 else:
                     self.Lagged.append((varname, eqn[0:pos]))
+            elif mode == 'parameter':
+                try:
+                    float(eqn)
+                except ValueError:
+                    raise ValueError('Invalid value for parameter {0} = {1}'.format(varname, eqn))
+                self.Parameters.append((varname, eqn))
             else:
                 self.Exogenous.append((varname, eqn))
         if not found_t:
@@ -139,6 +168,9 @@ class EquationParser(object):
         out += 'Exogenous:\n'
         for varname, rhs in self.Exogenous:
             out += '{0} = {1}\n'.format(varname, rhs)
+        out += 'Parameters:\n'
+        for varname, rhs in self.Parameters:
+            out += '{0} = {1}\n'.format(varname, rhs)
         return out
 
     def GenerateTokenList(self):
@@ -153,11 +185,18 @@ class EquationParser(object):
         ['y', 'z']
 
 
+        Also builds the TokenSequences and References (reverse index) used by
+        FindExactMatches().
+
         :return: None
         """
+        self.References = {}
         for var in self.AllEquations:
-            eq = self.AllEquations[var]
-            self.Tokens[var] = list_tokens(eq)
+            seq = list_equation_tokens(self.AllEquations[var])
+            self.TokenSequences[var] = seq
+            self.Tokens[var] = [tok for toknum, tok in seq if toknum == NAME]
+            for tok in self.Tokens[var]:
+                self.References.setdefault(tok, set()).add(var)
 
     def ValidateInputs(self):
         """
@@ -261,20 +300,76 @@ class EquationParser(object):
         ...
         ValueError: Equality loop between t and x
 
+        Alias chains (x = y, y = z) are collapsed in one pass: every usage of x or y is
+        replaced by z. Only the equations that refer to an alias (found with the
+        References index) are modified.
+
         :return: None
         """
+        aliases = {}
+        alias_order = []
         for var, eqn in self.Endogenous:
             rhs = self.CleanupRightHandSide(eqn)
             if rhs in self.AllEquations:
-                # We have a case where VAR1 = VAR2.  Replace occurrences of VAR1 by VAR2 in all equations.
-                # BUT: Must break loops like:  (x=y), (y=x), since they will not converge
-                if var == self.CleanupRightHandSide(self.AllEquations[rhs]):
+                aliases[var] = rhs
+                alias_order.append(var)
+        # We have cases where VAR1 = VAR2.  Replace occurrences of VAR1 by VAR2 in all equations.
+        # BUT: Must break loops like:  (x=y), (y=x), since they will not converge
+        for var in alias_order:
+            rhs = aliases[var]
+            if var == self.CleanupRightHandSide(self.AllEquations[rhs]):
+                raise ValueError('Equality loop between ' + rhs + ' and ' + var)
+            node = rhs
+            visited = set()
+            while node in aliases and node not in visited:
+                if node == var:
                     raise ValueError('Equality loop between ' + rhs + ' and ' + var)
-                for other in self.AllEquations:
-                    self.AllEquations[other] = str(replace_token(self.AllEquations[other], var, rhs).replace(' ', ''))
-                    self.Tokens[other] = list_tokens(self.AllEquations[other])
+                visited.add(node)
+                node = aliases[node]
+        # Find the end of each alias chain (union-find, with path compression).
+        replacements = {}
+        for var in alias_order:
+            path = []
+            node = var
+            while node in aliases and node not in replacements:
+                path.append(node)
+                node = aliases[node]
+            root = replacements.get(node, node)
+            for alias in path:
+                replacements[alias] = root
+        affected = set()
+        for alias in replacements:
+            affected.update(self.References.get(alias, ()))
+        for other in self.AllEquations:
+            if other in affected:
+                self._SubstituteTokens(other, replacements)
+            elif len(replacements) > 0:
+                # Equations are stored without spaces once aliases are removed.
+                self.AllEquations[other] = self.AllEquations[other].replace(' ', '')
         self.RebuildEquations()
 
+    def _SubstituteTokens(self, var, replacements):
+        """
+        Replace NAME tokens in the equation for var, using the replacements dict, and
+        update the equation string and the indexes.
+
+        :param var: str
+        :param replacements: dict
+        :return: None
+        """
+        new_seq = []
+        for toknum, tok in self.TokenSequences[var]:
+            if toknum == NAME and tok in replacements:
+                tok = replacements[tok]
+            new_seq.append((toknum, tok))
+        for tok in self.Tokens[var]:
+            self.References[tok].discard(var)
+        self.TokenSequences[var] = new_seq
+        self.Tokens[var] = [tok for toknum, tok in new_seq if toknum == NAME]
+        for tok in self.Tokens[var]:
+            self.References.setdefault(tok, set()).add(var)
+        self.AllEquations[var] = ''.join([tok for toknum, tok in new_seq]).replace(' ', '')
+
     def RebuildEquations(self):
         """
         Replace endogenous equations from the AllEquations dict.
@@ -284,10 +379,59 @@ class EquationParser(object):
         new_endo = [(x[0], self.AllEquations[x[0]]) for x in self.Endogenous]
         self.Endogenous = new_endo
 
+    def ReplaceEquation(self, var, rhs):
+        """
+        Replace the equation of an endogenous (or decorative) variable, or the value of a
+        parameter, after the equations have been reduced, without parsing all of the
+        equations again.
+
+        The new equation has to refer to the same variables as the existing one, so that
+        the equation reduction is unaffected; otherwise, raises a LogicError.
+
+        >>> p = EquationParser()
+        >>> p.ParseString('x = a*y\\ny = 2\\na = 0.5')
+        ''
+        >>> p.ValidateInputs()
+        >>> p.EquationReduction()
+        >>> p.ReplaceEquation('a', '0.7')
+        >>> p.Decoration
+        [('x', 'a*y'), ('t', 'k'), ('a', '0.7'), ('y', '2')]
+        >>> p.ReplaceEquation('x', 'y')
+        Traceback (most recent call last):
+        ...
+        sfc_models.utils.LogicError: Cannot replace equation for x; variables used change from ['a', 'y'] to ['y']
+
+        :param var: str
+        :param rhs: str
+        :return: None
+        """
+        rhs = EquationParser.CleanupRightHandSide(rhs)
+        seq = list_equation_tokens(rhs)
+        tokens = [tok for toknum, tok in seq if toknum == NAME]
+        old_tokens = self.Tokens.get(var, [])
+        if sorted(set(tokens)) != sorted(set(old_tokens)):
+            raise LogicError('Cannot replace equation for {0}; variables used change from {1} to {2}'.format(
+                var, sorted(set(old_tokens)), sorted(set(tokens))))
+        for block in (self.Endogenous, self.Decoration, self.Parameters):
+            for i in range(0, len(block)):
+                if block[i][0] == var:
+                    if block is self.Parameters:
+                        try:
+                            float(rhs)
+                        except ValueError:
+                            raise ValueError('Invalid value for parameter {0} = {1}'.format(var, rhs))
+                    block[i] = (var, rhs)
+                    self.AllEquations[var] = rhs
+                    self.TokenSequences[var] = seq
+                    self.Tokens[var] = tokens
+                    return
+        raise LogicError('Cannot replace equation for {0}; not an endogenous variable'.format(var))
+
     def MoveDecorative(self):
         """
         Move endogenous variables to the "decorative" category if there is no dependence upon them.
-        Returns the number of variables moved.
+        Moves cascade: a variable that is only used by decorative variables becomes decorative
+        as well. Returns the number of variables moved.
         :return: int
 
         >>> p = EquationParser()
@@ -297,25 +441,42 @@ class EquationParser(object):
         >>> p.Endogenous
         [('x', 't+1'), ('y', '4*x'), ('t', '5')]
         >>> p.GenerateTokenList()  # Need to run before MoveDecorative()
-        >>> # We see that neither x or t depend upon y.
-        >>> p.MoveDecorative()  # Returns 1 since 1 variable was moved...
-        1
+        >>> # No other variable depends upon y; once y is decorative, nothing needs x, and then t.
+        >>> p.MoveDecorative()  # Returns 3 since 3 variables were moved...
+        3
         >>> p.Decoration
-        [('y', '4*x')]
+        [('y', '4*x'), ('x', 't+1'), ('t', '5')]
         >>> p.Endogenous
-        [('x', 't+1'), ('t', '5')]
+        []
         """
-        # Create a copy of the original list.
-        working_list = self.Endogenous[:]
-        num_found = 0
-        for var, old_eqn in working_list:
-            found = False
-            for other_var in self.Tokens:
-                if var in self.Tokens[other_var]:
-                    found = True
-                    break
-            if not found:
-                num_found += 1
-                self.Decoration.append((var, old_eqn))
-                self.Endogenous.remove((var, old_eqn))
-        return num_found
+        # Count the non-decorative equations that refer to each endogenous variable,
+        # using the References index. (A variable that refers to itself is never moved.)
+        decorative = set([x[0] for x in self.Decoration])
+        ref_count = {}
+        for var, dummy in self.Endogenous:
+            ref_count[var] = len(self.References.get(var, set()) - decorative)
+        worklist = [var for var, dummy in self.Endogenous if ref_count[var] == 0]
+        moved = set(worklist)
+        pos = 0
+        while pos < len(worklist):
+            var = worklist[pos]
+            pos += 1
+            seen = set()
+            # Tokens are missing if GenerateTokenList() was not called (as in Model.LogInfo()).
+            for tok in self.Tokens.get(var, ()):
+                # Walk the tokens in order (not via a set), so that the order of the
+                # decorative variables does not depend upon string hashing.
+                if tok in seen:
+                    continue
+                seen.add(tok)
+                if tok in ref_count and tok not in moved:
+                    ref_count[tok] -= 1
+                    if ref_count[tok] == 0:
+                        moved.add(tok)
+                        worklist.append(tok)
+        if len(worklist) == 0:
+            return 0
+        equations = dict(self.Endogenous)
+        self.Decoration.extend([(var, equations[var]) for var in worklist])
+        self.Endogenous = [x for x in self.Endogenous if x[0] not in moved]
+        return len(worklist)
@@ -22,9 +22,11 @@ limitations under the License.
 from math import *
 import warnings
 import copy
+import time
 
 import sfc_models.equation_parser
-from sfc_models.utils import Logger, TimeSeriesHolder
+import sfc_models.dual
+from sfc_models.utils import Logger, TimeSeriesHolder, ArrayTimeSeriesHolder
 from sfc_models import Parameters as Parameters
 
 
@@ -36,6 +38,16 @@ class NoEquilibriumError(ValueError):
     pass
 
 
+class BudgetExceededError(ConvergenceError):
+    """
+    Raised within a solution when a budget (EquationSolver.MaxWallTime, MaxStepTime,
+    MaxTotalIterations) runs out. Status is the EquationSolver.Status code.
+    """
+    def __init__(self, status, msg):
+        ConvergenceError.__init__(self, msg)
+        self.Status = status
+
+
 class EquationSolver(object):
     """
     EquationSolver - Object to solve equations.
@@ -60,6 +72,45 @@ class EquationSolver(object):
         self.ParameterInitialSteadyStateErrorToler = 1e-4
         self.ParameterInitialSteadyStateExcludedVariables = ['t']
         self.ParameterInitialSteadyStateStepError = 1e-6
+        # If not None, only hold this many periods of each series in memory (constants
+        # are held as a single value). (Use a ResultSink to capture the full output.)
+        self.ParameterMemoryWindow = None
+        self.ResultSinks = []
+        # Values of the parameters: set to the values in the equations by ParseString(),
+        # and overridden by the params argument of SolveEquation().
+        self.ParameterValues = {}
+        # Compiled code objects for equations, by equation string.
+        self.CompiledEquations = {}
+        # Exogenous variables read from array-like objects or callables, by variable name.
+        self.ExogenousSources = {}
+        # The (variable, source) pairs used in the current run; set by SetInitialConditions().
+        self.ActiveSources = []
+        # Number of iterations needed to solve each period of the last run (starting with period 1).
+        self.IterationCounts = []
+        # Parameters and exogenous variables for which sensitivities are calculated; see SolveEquation().
+        self.SensitivityVariables = []
+        # Sensitivities from the last run, by input variable: TimeSeriesHolder of derivative series.
+        self.Sensitivities = {}
+        # Globals used to evaluate equations with dual numbers (None if not calculating sensitivities).
+        self._DualGlobals = None
+        # Budgets for a solution (None = no limit): total wall time (seconds), time per
+        # period (seconds), and total number of iterations. See IterSolve().
+        self.MaxWallTime = None
+        self.MaxStepTime = None
+        self.MaxTotalIterations = None
+        # Outcome of the last solution: None (not run), 'ok', 'wall_time', 'step_time',
+        # 'total_iterations', 'no_convergence' or 'error'.
+        self.Status = None
+        # Last period solved in the last solution.
+        self.LastPeriodSolved = 0
+        # Time spent solving the last solution (seconds); None if it did not get started.
+        # Does not include the time spent by the caller of IterSolve() between periods.
+        self.LastSolveTime = None
+        # Variable descriptions, if known (set when loaded from a bundle; see sfc_models.bundle).
+        self.Descriptions = {}
+        # Start time and iterations used in the current solution; None if there are no budgets.
+        self._BudgetStart = None
+        self._BudgetIterations = 0
 
         if len(equation_string) > 0:
             self.ParseString(equation_string)
@@ -78,6 +129,7 @@ class EquationSolver(object):
         if self.RunEquationReduction:
             parser.EquationReduction()
         self.Parser = parser
+        self.ParameterValues = self.GetDefaultParameters()
         if self.MaxTime is not None:
             self.Parser.MaxTime = self.MaxTime
         if len(msg) > 0:
@@ -94,6 +146,36 @@ class EquationSolver(object):
         """
         self.Functions[function_name] = function_object
 
+    def AddExogenousSource(self, var, source):
+        """
+        Set the values of an exogenous variable from an array-like object (indexed by the
+        period), or a callable (called with the period). Values are read as each period is
+        solved; the object is not copied.
+
+        The variable has to be in the exogenous section of the equations; its equation
+        there is ignored.
+
+        :param var: str
+        :param source: object
+        :return: None
+        """
+        self.ExogenousSources[var] = source
+
+    @staticmethod
+    def _ReadSource(source, step):
+        if callable(source):
+            return float(source(step))
+        return float(source[step])
+
+    def AddResultSink(self, sink):
+        """
+        Add a ResultSink (see sfc_models.result_sinks), which is passed the values of
+        all series after each period is solved.
+        :param sink: sfc_models.result_sinks.ResultSink
+        :return: None
+        """
+        self.ResultSinks.append(sink)
+
     def ExtractVariableList(self):
         self.VariableList = []
         endo = [x[0] for x in self.Parser.Endogenous]
@@ -104,12 +186,20 @@ class EquationSolver(object):
         self.VariableList.extend(exo)
         deco = [x[0] for x in self.Parser.Decoration]
         self.VariableList.extend(deco)
+        params = [x[0] for x in self.Parser.Parameters]
+        self.VariableList.extend(params)
         # Sort the variables
         self.VariableList.sort()
 
     def SetInitialConditions(self):
         Logger('Set Initial Conditions')
-        variables = TimeSeriesHolder('k')
+        # All series are stored in a single preallocated block; one row per variable.
+        series_length = self.Parser.MaxTime + 1
+        series_names = self.VariableList[:]
+        if 'k' not in series_names:
+            series_names.append('k')
+        variables = ArrayTimeSeriesHolder('k', series_names, series_length,
+                                          window=self.ParameterMemoryWindow)
         # variables['k'] = list(range(0, self.Parser.MaxTime+1))
         time_zero_constants = dict()
         # First pass: include exogenous
@@ -124,36 +214,65 @@ class EquationSolver(object):
             else:
                 ic = 0.
             variables[var] = [ic, ]
-        if 'k' not in variables:
-            k_series = list(range(0, self.Parser.MaxTime + 1))
+        # The time axis is added to the exogenous variables once (not on every solution).
+        if 'k' not in [x[0] for x in self.Parser.Exogenous]:
+            k_series = list(range(0, series_length))
             k_series = [float(x) for x in k_series]
             self.Parser.Exogenous.append(('k', k_series))
 
         # Second pass: overwrite exogenous
+        self.ActiveSources = []
         for var, eqn in self.Parser.Exogenous:
+            if var in self.ExogenousSources:
+                # Only period 0 is read now; see _SolveStep().
+                source = self.ExogenousSources[var]
+                if (not callable(source)) and len(source) < series_length:
+                    raise ValueError('Exogenous variable list too short: ' + var)
+                try:
+                    val = EquationSolver._ReadSource(source, 0)
+                except Exception:
+                    raise ValueError('Cannot read exogenous variable: ' + var)
+                variables[var] = [val, ]
+                time_zero_constants[var] = val
+                self.ActiveSources.append((var, source))
+                continue
             if type(eqn) == str:
                 try:
                     val = eval(eqn, globals())
                 except:
                     raise ValueError('Cannot parse exogenous variable: ' + var)
                 if type(val) is float:
-                    val = [val, ] * (self.Parser.MaxTime + 1)
+                    # Constants are written straight into the series row.
+                    variables.SetConstant(var, val, series_length)
+                    time_zero_constants[var] = val
+                    continue
                 try:
                     val = list(val)
                 except:  # pragma: no cover     I cannot trigger this error, but I will leave in place
                     raise ValueError('Exogenous must be of the list type: ' + var)
             else:
                 if type(eqn) == float:
-                    val = [eqn, ] * (self.Parser.MaxTime + 1)
+                    variables.SetConstant(var, eqn, series_length)
+                    time_zero_constants[var] = eqn
+                    continue
                 else:
                     try:
                         val = list(eqn)
                     except:  # pragma: no cover   Hard time figuring how to trigger this
                         raise ValueError('Initial conditions must be directly convertible to a list: ' + var)
-            if len(val) < self.Parser.MaxTime + 1:
+            if len(val) < series_length:
                 raise ValueError('Exogenous variable list too short: ' + var)
-            variables[var] = val[0:self.Parser.MaxTime + 1]
+            if self.ParameterMemoryWindow is not None:
+                # Only hold a window of the series; the list is read one period at a time.
+                variables[var] = [val[0], ]
+                self.ActiveSources.append((var, val))
+            else:
+                variables[var] = val[0:series_length]
             time_zero_constants[var] = val[0]
+        # Parameters are constants.
+        for var, val in self.ParameterValues.items():
+            variables.SetConstant(var, val, series_length)
+            time_zero_constants[var] = val
         # Third pass: clean up constant endogenous
         changes_made = True
         while changes_made:
@@ -232,8 +351,10 @@ class EquationSolver(object):
         new_solver.Parser.Err_Tolerance = self.ParameterInitialSteadyStateErrorToler
         # Fix exogenous to be constants
         for var, dummy in new_solver.Parser.Exogenous:
-            val = [new_solver.TimeSeries[var][0], ] * (T + 1)
-            new_solver.TimeSeries[var] = val
+            new_solver.TimeSeries.SetConstant(var, new_solver.TimeSeries[var][0], T + 1)
+        # The parameter series have to cover the steady state periods as well.
+        for var, val in new_solver.ParameterValues.items():
+            new_solver.TimeSeries.SetConstant(var, val, T + 1)
         # Force 'k' to be negative.
         time_axis = list(range(0, T + 1))
         time_axis = [-float(x) for x in time_axis]
@@ -248,7 +369,7 @@ class EquationSolver(object):
             raise
         finally:
             self.TimeSeriesInitialSteadyState = new_solver.TimeSeries
-            Logger(new_solver.GenerateCSVtext(), 'steadystate_0')
+            Logger(new_solver.GenerateCSVtext, 'steadystate_0')
         # Now: look at which variables are not constant.
         bad_variables = []
         excluded = ['k', ] + self.ParameterInitialSteadyStateExcludedVariables
@@ -282,9 +403,27 @@ class EquationSolver(object):
         """
         Get a (deep) copy of this object. This copy may be modified without
         affecting this object.
+
+        The result sinks and exogenous sources are not copied; the copy has none. The
+        copy is not set up for sensitivities (it evaluates with plain numbers), even if
+        this object just calculated them.
         :return: EquationSolver
         """
-        return copy.deepcopy(self)
+        sinks = self.ResultSinks
+        sources = self.ExogenousSources
+        active = self.ActiveSources
+        dual_globals = self._DualGlobals
+        self.ResultSinks = []
+        self.ExogenousSources = {}
+        self.ActiveSources = []
+        self._DualGlobals = None
+        try:
+            return copy.deepcopy(self)
+        finally:
+            self.ResultSinks = sinks
+            self.ExogenousSources = sources
+            self.ActiveSources = active
+            self._DualGlobals = dual_globals
 
     def SolveStep(self, step):
         """
@@ -295,7 +434,7 @@ class EquationSolver(object):
         is_trace_step = step == self.TraceStep
         if is_trace_step:
             Logger('Starting convergence tracing.', log='step')
-            Logger('Step {0}'.format(step), log='step')
+            Logger('Step {0}', log='step', data_to_format=(step,))
             self.TimeSeriesStepTrace = TimeSeriesHolder('iteration')
             self.TimeSeriesStepTrace['iteration'] = []
             self.TimeSeriesStepTrace['iteration_error'] = []
@@ -307,23 +446,71 @@ class EquationSolver(object):
             self._SolveStep(step, is_trace_step)
         finally:
             if is_trace_step:
-                Logger(self.TimeSeriesStepTrace.GenerateCSVtext(), log='step')
+                Logger(self.TimeSeriesStepTrace.GenerateCSVtext, log='step')
 
     def _SolveStep(self, step, is_trace_step):
         # Set up starting condition (for step)
         initial = {}
+        is_dual = self._DualGlobals is not None
+        if is_dual:
+            # Warn if a function drops the derivatives.
+            functions = sfc_models.dual.wrap_functions(self.Functions)
+        else:
+            functions = self.Functions
         # Probably could just do a shallow copy...
-        for key, value in self.Functions.items():
+        for key, value in functions.items():
             initial[key] = value
-        Logger('Step: {0}'.format(step))
+        Logger('Step: {0}', data_to_format=(step,))
+        for var, source in self.ActiveSources:
+            series = self.TimeSeries[var]
+            if len(series) == step:
+                series.append(EquationSolver._ReadSource(source, step))
         # The exogenous and lagged variables are always fixed for a time period
         for var, dummy in self.Parser.Exogenous:
             initial[var] = self.TimeSeries[var][step]
         for lag_var, original_var in self.Parser.Lagged:
             initial[lag_var] = self.TimeSeries[original_var][step - 1]
+        initial.update(self.ParameterValues)
         # This is an initial guess
         for var, dummy in self.Parser.Endogenous:
             initial[var] = self.TimeSeries[var][step - 1]
+        if is_dual:
+            self._SeedDuals(step, initial)
+            eval_globals = self._DualGlobals
+        else:
+            eval_globals = globals()
+        initial, num_tries = self._IterateStep(step, initial, eval_globals, is_dual, is_trace_step)
+        Logger('Number of iterations: {0}', priority=3, data_to_format=(num_tries,))
+        self.IterationCounts.append(num_tries)
+        # Then: append values to the time series
+        varlist = [x[0] for x in self.Parser.Endogenous] + [x[0] for x in self.Parser.Lagged]
+        for var in varlist:
+            assert (len(self.TimeSeries[var]) == step)
+            if is_dual:
+                self.TimeSeries[var].append(self._SplitDual(var, initial[var]))
+            else:
+                self.TimeSeries[var].append(initial[var])
+        # Finally: augment with decorative variables
+        for var in self._EvaluateDecoration(initial, eval_globals):
+            assert (len(self.TimeSeries[var]) == step)
+            val = initial[var]
+            if is_dual:
+                val = self._SplitDual(var, val)
+            self.TimeSeries[var].append(val)
+
+    def _IterateStep(self, step, initial, eval_globals, is_dual, is_trace_step):
+        """
+        Iterate the endogenous equations for a step until they converge, starting from the
+        values in initial.
+
+        Returns the dict of converged values, and the number of iterations.
+        :param step: int
+        :param initial: dict
+        :param eval_globals: dict
+        :param is_dual: bool
+        :param is_trace_step: bool
+        :return: tuple
+        """
         # NOTE:
         # We are missing the decorative variables, but they have no effect on the convergence
         relative_error = 1.
@@ -339,6 +526,8 @@ class EquationSolver(object):
         # was unhappy if they were not set.
         had_evaluation_errors = False
         last_error = False
+        step_start = time.time()
+        endogenous = [(var, self._Compile(eqn)) for var, eqn in self.Parser.Endogenous]
         while relative_error > err_toler:
             if is_trace_step:
                 #Logger('\t'.join([str(num_tries), str(relative_error)] + [str(initial[x]) for x in trace_keys]),
@@ -347,9 +536,12 @@ class EquationSolver(object):
                 self.TimeSeriesStepTrace['iteration_error'].append(relative_error)
                 abs_err = 0.0
                 for k in trace_keys:
+                    val = initial[k]
+                    if is_dual:
+                        val = sfc_models.dual.get_value(val)
                     if num_tries > 0:
-                        abs_err += abs(initial[k] - self.TimeSeriesStepTrace[k][-1])
-                    self.TimeSeriesStepTrace.AppendValue(k, initial[k])
+                        abs_err += abs(val - self.TimeSeriesStepTrace[k][-1])
+                    self.TimeSeriesStepTrace.AppendValue(k, val)
                 self.TimeSeriesStepTrace.AppendValue('iteration_abs_change', abs_err)
 
             # Need to create a copy of the dictionary; saying new_value = initial means that they are
@@ -360,14 +552,16 @@ class EquationSolver(object):
             relative_error = 0.
             had_evaluation_errors = False
             last_error = ''
-            for var, eqn in self.Parser.Endogenous:
+            for var, code in endogenous:
                 # NOTE: We will try to step over some errors. For example, we can get a lot of
                 # divisions by zero in the initial interation. The algorithm just notes the error,
                 # and uses the previous value.
                 # If the condition persists, we throw a ValueError to prevent going forward with the
                 # invalid data.
                 try:
-                    new_value[var] = eval(eqn, globals(), initial)
+                    new_value[var] = eval(code, eval_globals, initial)
+                except sfc_models.dual.DualError as er:
+                    raise ValueError('Cannot calculate sensitivities for variable {0}: {1}'.format(var, str(er)))
                 except ZeroDivisionError as er:
                     # We can add new error types that we are willing to temporarily accept.
                     new_value[var] = initial[var]
@@ -378,6 +572,10 @@ class EquationSolver(object):
                     new_value[var] = initial[var]
                     had_evaluation_errors = True
                     last_error = 'Error evaluating variable {0}. Error message: {1}'.format(var, str(er))
+                if is_dual:
+                    # Iterate until the derivatives converge as well.
+                    relative_error += sfc_models.dual.get_relative_change(new_value[var], initial[var])
+                    continue
                 difference = abs(new_value[var] - initial[var])
                 if difference < 1e-3:
                     relative_error += difference
@@ -397,6 +595,8 @@ class EquationSolver(object):
             # Use new_value as the initial at the next step
             initial = new_value
             num_tries += 1
+            if self._BudgetStart is not None:
+                self._CheckBudget(step, num_tries, step_start)
             if num_tries > self.MaxIterations:
                 if had_evaluation_errors:
                     raise ValueError(last_error)
@@ -404,41 +604,236 @@ class EquationSolver(object):
         if had_evaluation_errors:
             Logger('Had evaluation errors')
             raise ValueError(last_error)
-        Logger('Number of iterations: {0}'.format(num_tries), priority=3)
-        # Then: append values to the time series
-        varlist = [x[0] for x in self.Parser.Endogenous] + [x[0] for x in self.Parser.Lagged]
-        for var in varlist:
-            assert (len(self.TimeSeries[var]) == step)
-            self.TimeSeries[var].append(initial[var])
-        # Finally: augment with decorative variables
+        return initial, num_tries
+
+    def _CheckBudget(self, step, num_tries, step_start):
+        """
+        Raise a BudgetExceededError if a budget has run out.
+        :param step: int
+        :param num_tries: int
+        :param step_start: float
+        :return: None
+        """
+        now = time.time()
+        if self.MaxWallTime is not None and now - self._BudgetStart > self.MaxWallTime:
+            raise BudgetExceededError('wall_time', 'Wall time budget exceeded - step {0}'.format(step))
+        if self.MaxStepTime is not None and now - step_start > self.MaxStepTime:
+            raise BudgetExceededError('step_time', 'Step time budget exceeded - step {0}'.format(step))
+        if self.MaxTotalIterations is not None and self._BudgetIterations + num_tries > self.MaxTotalIterations:
+            raise BudgetExceededError('total_iterations', 'Iteration budget exceeded - step {0}'.format(step))
+
+    def _EvaluateDecoration(self, initial, eval_globals):
+        """
+        Calculate the decorative variables, adding them to initial.
+
+        Returns the variable names, in the order calculated.
+        :param initial: dict
+        :param eval_globals: dict
+        :return: list
+        """
         # This is complicated as decorative variables may depend upon other decorative variables
         # Create a holding variable that lists the equations, and keep iterating through the list
+        out = []
         vars_to_compute = []
         for var, eqn in self.Parser.Decoration:
-            vars_to_compute.append((var, eqn))
+            vars_to_compute.append((var, eqn, self._Compile(eqn)))
         while len(vars_to_compute) > 0:
             failed = []
-            for var, eqn in vars_to_compute:
-                assert (len(self.TimeSeries[var]) == step)
+            for var, eqn, code in vars_to_compute:
                 try:
-                    val = eval(eqn, globals(), initial)
-                    initial[var] = val
-                    self.TimeSeries[var].append(val)
+                    initial[var] = eval(code, eval_globals, initial)
+                    out.append(var)
                 except NameError:
-                    failed.append((var, eqn))
+                    failed.append((var, eqn, code))
+                except sfc_models.dual.DualError as er:
+                    raise ValueError('Cannot calculate sensitivities for variable {0}: {1}'.format(var, str(er)))
             # If we failed on every single decoration variable, something is wrong.
             if len(failed) == len(vars_to_compute):
                 # NOTE: We should not get here; it means that the decoration variables are
                 # created incorrectly. Leave check to break infinite loops.
-                out = ''
+                msg = ''
                 Logger('Failure computing decoration equations!')
-                for var, eqn in vars_to_compute:
-                    out += '{0} = {1}\n'.format(var, eqn)
-                    Logger(out)
-                raise ValueError('Cannot solve decoration equations!\n'+out)
+                for var, eqn, dummy in vars_to_compute:
+                    msg += '{0} = {1}\n'.format(var, eqn)
+                    Logger(msg)
+                raise ValueError('Cannot solve decoration equations!\n'+msg)
             vars_to_compute = failed
+        return out
 
-    def SolveEquation(self):
+    def _SetUpSensitivities(self):
+        """
+        Create the derivative series for the SensitivityVariables, filling in period 0,
+        and the (constant) derivatives of the parameters and exogenous variables.
+        :return: None
+        """
+        self.Sensitivities = {}
+        self._DualGlobals = None
+        if len(self.SensitivityVariables) == 0:
+            return
+        inputs = set([x[0] for x in self.Parser.Exogenous] + list(self.ParameterValues.keys()))
+        for var in self.SensitivityVariables:
+            if var not in inputs:
+                raise KeyError('Not a parameter or exogenous variable: {0}'.format(var))
+        length = self.Parser.MaxTime + 1
+        for input_var in self.SensitivityVariables:
+            holder = TimeSeriesHolder('k')
+            for var in inputs:
+                holder[var] = [float(var == input_var)] * length
+            for var in self.TimeSeries.GetSeriesList():
+                if var not in inputs:
+                    holder[var] = [0., ]
+            self.Sensitivities[input_var] = holder
+        self._DualGlobals = self._GetDualGlobals()
+
+    @staticmethod
+    def _GetDualGlobals():
+        """
+        Globals for evaluating equations on dual numbers: the math functions are
+        replaced by the versions in sfc_models.dual.
+        :return: dict
+        """
+        out = dict(globals())
+        out.update(sfc_models.dual.MATH_FUNCTIONS)
+        return out
+
+    def _SeedDuals(self, step, initial):
+        """
+        Replace the starting values for a step with dual numbers, carrying the derivatives
+        with respect to the SensitivityVariables.
+        :param step: int
+        :param initial: dict
+        :return: None
+        """
+        inputs = self.SensitivityVariables
+        for i, var in enumerate(inputs):
+            deriv = [0., ] * len(inputs)
+            deriv[i] = 1.
+            initial[var] = sfc_models.dual.Dual(initial[var], deriv)
+        for lag_var, original_var in self.Parser.Lagged:
+            initial[lag_var] = sfc_models.dual.Dual(
+                initial[lag_var], [self.Sensitivities[x][original_var][step - 1] for x in inputs])
+        for var, dummy in self.Parser.Endogenous:
+            initial[var] = sfc_models.dual.Dual(initial[var], [self.Sensitivities[x][var][step - 1] for x in inputs])
+
+    def _SplitDual(self, var, value):
+        """
+        Append the derivatives of a solved value to the sensitivity series, and return
+        the value.
+        :param var: str
+        :param value: sfc_models.dual.Dual
+        :return: float
+        """
+        deriv = sfc_models.dual.get_derivatives(value, len(self.SensitivityVariables))
+        for input_var, d in zip(self.SensitivityVariables, deriv):
+            self.Sensitivities[input_var][var].append(d)
+        return sfc_models.dual.get_value(value)
+
+    def _Compile(self, eqn):
+        """
+        Get the compiled code for an equation; each equation string is only compiled once.
+        :param eqn: str
+        :return: code
+        """
+        try:
+            return self.CompiledEquations[eqn]
+        except KeyError:
+            code = compile(eqn, '<equation>', 'eval')
+            self.CompiledEquations[eqn] = code
+            return code
+
+    def GetDefaultParameters(self):
+        """
+        Get the parameter values given in the equations.
+        :return: dict
+        """
+        return dict([(var, float(val)) for var, val in self.Parser.Parameters])
+
+    def Solve(self, params=None):
+        """
+        Convenience alias for SolveEquation()
+        :param params: dict
+        :return: None
+        """
+        self.SolveEquation(params)
+
+    def SolveEquation(self, params=None):
+        """
+        Solve the equations (which have to be parsed already).
+
+        The params dict overrides the values of parameters (the equations in the
+        '# Parameters' section), by variable name. The parsed and compiled equations are
+        reused, so the equations can be solved for many sets of parameters cheaply:
+
+        solver.Solve(params={'HH__AlphaIncome': 0.65})
+
+        If SensitivityVariables (a list of parameters or exogenous variables) is set, the
+        equations are evaluated with dual numbers (see sfc_models.dual), so that the
+        derivatives of every series with respect to those variables are calculated in
+        the same pass. (For an exogenous variable, the derivative is with respect to a
+        shift of the whole series.) The results are in Sensitivities:
+
+        solver.SensitivityVariables = ['HH__AlphaIncome']
+        solver.SolveEquation()
+        solver.Sensitivities['HH__AlphaIncome']['GOOD__SUP_GOOD']
+
+        Period 0 is taken as given; its derivatives are zero. Math functions that do not
+        support dual numbers (see sfc_models.dual.MATH_FUNCTIONS) raise a ValueError;
+        user functions (AddFunction()) that return plain numbers give a warning.
+
+        To get the results as each period is solved, use IterSolve().
+
+        :param params: dict
+        :return: None
+        """
+        for dummy in self.IterSolve(params):
+            pass
+
+    def IterSolve(self, params=None):
+        """
+        Generator version of SolveEquation(): yields after each period is solved
+        (starting with period 1), so that the caller can show progress, stream the
+        results, or stop early (by closing the generator, or just dropping it).
+
+        Each period gives a dict:
+        'step': the period;
+        'values': dict of the values of all series in that period;
+        'iterations': the number of iterations needed to solve the period;
+        'time': the time taken to solve the period, in seconds.
+
+        for result in solver.IterSolve():
+            print(result['step'], result['values']['GOOD__SUP_GOOD'])
+
+        See sfc_models.async_solver for use with asyncio.
+
+        If a budget (MaxWallTime, MaxStepTime, MaxTotalIterations) runs out, the
+        solution stops without an error: Status is set to the budget that ran out, and
+        the time series (and Sensitivities) are truncated after LastPeriodSolved. If a
+        period does not converge (or cannot be evaluated), the series are truncated in
+        the same way and Status is set ('no_convergence' or 'error') before the error is
+        raised, so that the periods already solved can still be used. Otherwise, Status
+        is 'ok' at the end. LastSolveTime is the time spent in the solver, including
+        the setup (initial conditions, steady state), which is set before the result
+        sinks are closed.
+
+        The budgets only cover the periods after period 0 (not the initial steady
+        state calculation).
+
+        :param params: dict
+        :return: generator
+        """
+        solve_start = time.time()
+        self._DualGlobals = None
+        self._BudgetStart = None
+        self.Status = None
+        self.LastPeriodSolved = 0
+        self.LastSolveTime = None
+        values = self.GetDefaultParameters()
+        if params is not None:
+            for var in params:
+                if var not in values:
+                    raise KeyError('Not a parameter: {0}'.format(var))
+                values[var] = float(params[var])
+        self.ParameterValues = values
         if len(self.VariableList) == 0:
             self.ExtractVariableList()
         self.SetInitialConditions()
@@ -446,8 +841,77 @@ class EquationSolver(object):
             self.CalculateInitialSteadyState()
             # Reset the parameter; it needs to be set before every call to SolveEquation()
             Parameters.SolveInitialEquilibrium = False
-        for step in range(1, self.Parser.MaxTime + 1):
-            self.SolveStep(step)
+        self._SetUpSensitivities()
+        self.IterationCounts = []
+        self._BudgetIterations = 0
+        if (self.MaxWallTime, self.MaxStepTime, self.MaxTotalIterations) != (None, None, None):
+            self._BudgetStart = time.time()
+        series_names = self.TimeSeries.GetSeriesList()
+        self.LastSolveTime = time.time() - solve_start
+        for sink in self.ResultSinks:
+            sink.Open(series_names)
+        try:
+            self._WriteToSinks(series_names, 0)
+            for step in range(1, self.Parser.MaxTime + 1):
+                start = time.time()
+                try:
+                    self.SolveStep(step)
+                except BudgetExceededError as e:
+                    self._StopSolution(e.Status)
+                    return
+                except ConvergenceError:
+                    self._StopSolution('no_convergence')
+                    raise
+                except Exception:
+                    self._StopSolution('error')
+                    raise
+                finally:
+                    elapsed = time.time() - start
+                    self.LastSolveTime += elapsed
+                self.LastPeriodSolved = step
+                self._BudgetIterations += self.IterationCounts[-1]
+                self._WriteToSinks(series_names, step)
+                yield {'step': step, 'values': dict([(x, self.TimeSeries[x][step]) for x in series_names]),
+                       'iterations': self.IterationCounts[-1], 'time': elapsed}
+                if self._BudgetStart is not None:
+                    try:
+                        self._CheckBudget(step, 0, time.time())
+                    except BudgetExceededError as e:
+                        # Only stop if there is more to do.
+                        if step < self.Parser.MaxTime:
+                            self._StopSolution(e.Status)
+                            return
+            self.Status = 'ok'
+        finally:
+            self._BudgetStart = None
+            for sink in self.ResultSinks:
+                sink.Close()
+
+    def _StopSolution(self, status):
+        """
+        Stop a solution early: set the Status, and truncate the time series after the
+        last period solved.
+        :param status: str
+        :return: None
+        """
+        Logger('Solution stopped after period {0}: {1}', data_to_format=(self.LastPeriodSolved, status))
+        self.Status = status
+        self.TimeSeries.Truncate(self.LastPeriodSolved + 1)
+        for holder in self.Sensitivities.values():
+            holder.Truncate(self.LastPeriodSolved + 1)
+
+    def _WriteToSinks(self, series_names, step):
+        """
+        Pass the values for a period to the result sinks.
+        :param series_names: list
+        :param step: int
+        :return: None
+        """
+        if len(self.ResultSinks) == 0:
+            return
+        values = [self.TimeSeries[x][step] for x in series_names]
+        for sink in self.ResultSinks:
+            sink.WriteStep(step, values)
 
     def WriteCSV(self, fname):  # pragma: no cover   We should not be writing files as part of unit tests...
         """
@@ -456,8 +920,25 @@ class EquationSolver(object):
         :param fname: str
         :return:
         """
-        f = open(fname, 'w')
-        f.write(self.GenerateCSVtext())
+        with open(fname, 'w') as f:
+            self.TimeSeries.WriteCSV(f)
+
+    def WriteColumnar(self, directory, descriptions=None):
+        """
+        Write the time series to a binary columnar result directory (one .npy file
+        per series plus an index); see sfc_models.columnar.
+
+        The descriptions default to the Descriptions attribute.
+
+        :param directory: str
+        :param descriptions: dict
+        :return: None
+        """
+        # Imported here, as only needed for this output format.
+        import sfc_models.columnar
+        if descriptions is None:
+            descriptions = self.Descriptions
+        sfc_models.columnar.write_columnar(directory, self.TimeSeries, descriptions)
 
     def GenerateCSVtext(self, format_str='%.5g'):
         """
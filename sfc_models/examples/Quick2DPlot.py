@@ -35,11 +35,27 @@ limitations under the License.
 from pprint import pprint
 import os
 
-try:
-    import matplotlib.pyplot as plt
-except ImportError:  # pragma: no cover
-    pprint("Unable to load matplotlib; no graphing output is possible!")
-    plt = None
+# matplotlib is slow to import, so it is only imported when the first plot is made
+# (see get_pyplot()). Setting plt = None disables plotting.
+_NOT_LOADED = object()
+plt = _NOT_LOADED
+
+
+def get_pyplot():
+    """
+    Get the matplotlib.pyplot module, importing it on the first call.
+    Returns None if matplotlib cannot be imported, or plotting is disabled.
+    :return: module
+    """
+    global plt
+    if plt is _NOT_LOADED:
+        try:
+            import matplotlib.pyplot as pyplot
+            plt = pyplot
+        except ImportError:  # pragma: no cover
+            pprint("Unable to load matplotlib; no graphing output is possible!")
+            plt = None
+    return plt
 
 
 class Quick2DPlotParams(object):
@@ -94,7 +110,7 @@ class Quick2DPlot(object):
             self.DoPlot()
 
     def DoPlot(self):  # pragma: no cover
-        if plt is None:
+        if get_pyplot() is None:
             pprint('Attempted to plot the following data; cannot to do because cannot import matplotlib')
             if type(self.X[0]) == list:
                 pprint('Series 1')
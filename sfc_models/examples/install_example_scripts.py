@@ -25,7 +25,6 @@ limitations under the License.
 """
 from __future__ import print_function
 import os
-from pkg_resources import resource_string
 
 
 def install(target_dir):   # pragma: no cover
@@ -37,6 +36,8 @@ def install(target_dir):   # pragma: no cover
     :param target_dir: str
     :return:
     """
+    # pkg_resources is slow to import; only needed here.
+    from pkg_resources import resource_string
     if not os.path.isdir(target_dir):
         raise ValueError('{0} is not a directory'.format(target_dir))
     print('Installing example scripts to: ' + target_dir)
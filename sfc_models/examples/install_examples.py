@@ -28,16 +28,6 @@ limitations under the License.
 from __future__ import print_function
 
 import sys
-if sys.version_info[0] < 3: # pragma: no cover  (Do coverage test in 3.x)
-    # import Tkinter as tk
-    # from Tkinter import *
-    import tkMessageBox as mbox
-    import tkFileDialog as fdog
-else:
-    import tkinter as tk
-    from tkinter import *
-    import tkinter.messagebox as mbox
-    import tkinter.filedialog as fdog
 
 from sfc_models.examples import install_example_scripts
 
@@ -53,9 +43,16 @@ def install_examples(): # pragma: no cover
     Pops up windows to allow the user to choose a directory for installation
     of sfc_models examples.
 
-    Uses tkinter, which is installed in base Python (modern versions).
+    Uses tkinter, which is installed in base Python (modern versions). It is imported
+    here, so that this module can be imported on machines without Tk.
     :return:
     """
+    if sys.version_info[0] < 3:  # (Do coverage test in 3.x)
+        import tkMessageBox as mbox
+        import tkFileDialog as fdog
+    else:
+        import tkinter.messagebox as mbox
+        import tkinter.filedialog as fdog
     if not mbox.askokcancel(title='sfc_models Example Installation',
                             message=validate_str):
         return
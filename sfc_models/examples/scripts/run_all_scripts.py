@@ -1,137 +1,233 @@
 """
-Machine-generated file used to validate that all scripts run without crashing.
-Generated by build_run_all_scripts.py
-Have a nice day!
-"""
-
-
-from __future__ import print_function
-import sfc_models.examples.Quick2DPlot as extras
-extras.plt = None # Prang the plots
-
-
-import build_SIM_model
-if "main" in dir(build_SIM_model):
-    build_SIM_model.main()
-
-
-import ex20161103_SIM_2_country
-if "main" in dir(ex20161103_SIM_2_country):
-    ex20161103_SIM_2_country.main()
-
-
-import ex20161128_tax_cut_comparison
-if "main" in dir(ex20161128_tax_cut_comparison):
-    ex20161128_tax_cut_comparison.main()
-
-
-import ex20161206_SIM_with_deposits
-if "main" in dir(ex20161206_SIM_with_deposits):
-    ex20161206_SIM_with_deposits.main()
-
-
-import ex20170221_Model_PC
-if "main" in dir(ex20170221_Model_PC):
-    ex20170221_Model_PC.main()
-
-
-import ex20170225_Model_REG
-if "main" in dir(ex20170225_Model_REG):
-    ex20170225_Model_REG.main()
-
-
-import ex20170307_Model_REG2
-if "main" in dir(ex20170307_Model_REG2):
-    ex20170307_Model_REG2.main()
-
-
-import ex20171127_equations_state_space_models
-if "main" in dir(ex20171127_equations_state_space_models):
-    ex20171127_equations_state_space_models.main()
-
-
-import intro_3_02_example
-if "main" in dir(intro_3_02_example):
-    intro_3_02_example.main()
+run_all_scripts.py
 
+Run all the example scripts listed in script_list.txt, to validate that they run without
+crashing. (No attempt is made to validate output; that's the job of unit tests.)
 
-import intro_3_03_hello_world_1
-if "main" in dir(intro_3_03_hello_world_1):
-    intro_3_03_hello_world_1.main()
+Each script runs in its own Python process, with a number of scripts running in
+parallel. Plotting is headless (the matplotlib "Agg" backend), so that no windows are
+opened and plt.show() does not block. A script that runs longer than the timeout is
+stopped, and counts as a failure.
 
+Each script runs in its own working directory (with an "output" subdirectory for the
+logs), so that scripts running at the same time do not write to the same files. The
+working directories are created in a temporary directory that is deleted at the end,
+unless --work-dir is given.
 
-import intro_3_03_hello_world_2
-if "main" in dir(intro_3_03_hello_world_2):
-    intro_3_03_hello_world_2.main()
+At the end, prints a table with the wall time, peak memory and status of each script,
+so that the examples can also be used as a regression benchmark.
 
+Usage (in this directory):
 
-import intro_3_03_hello_world_3
-if "main" in dir(intro_3_03_hello_world_3):
-    intro_3_03_hello_world_3.main()
+python run_all_scripts.py [script names] [--jobs N] [--timeout seconds] [--json report.json]
+    [--work-dir directory]
 
+The exit status is 1 if any script failed. The output of failed scripts is printed;
+use --verbose to print the output of all scripts.
 
-import intro_3_03_hello_world_4
-if "main" in dir(intro_3_03_hello_world_4):
-    intro_3_03_hello_world_4.main()
 
+Copyright 2017 Brian Romanchuk
 
-import intro_3_05_variable_names_1
-if "main" in dir(intro_3_05_variable_names_1):
-    intro_3_05_variable_names_1.main()
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
 
+    http://www.apache.org/licenses/LICENSE-2.0
 
-import intro_3_05_variable_names_2
-if "main" in dir(intro_3_05_variable_names_2):
-    intro_3_05_variable_names_2.main()
-
-
-import intro_5_03_no_tax_SIM
-if "main" in dir(intro_5_03_no_tax_SIM):
-    intro_5_03_no_tax_SIM.main()
-
-
-import intro_5_04_SIMEX1
-if "main" in dir(intro_5_04_SIMEX1):
-    intro_5_04_SIMEX1.main()
-
-
-import intro_6_04_externalsector
-if "main" in dir(intro_6_04_externalsector):
-    intro_6_04_externalsector.main()
-
-
-import intro_6_06_gold_standard_G
-if "main" in dir(intro_6_06_gold_standard_G):
-    intro_6_06_gold_standard_G.main()
-
-
-import intro_X_XX_sim_fiscal
-if "main" in dir(intro_X_XX_sim_fiscal):
-    intro_X_XX_sim_fiscal.main()
-
-
-import intro_X_XX_sim_growing_fiscal
-if "main" in dir(intro_X_XX_sim_growing_fiscal):
-    intro_X_XX_sim_growing_fiscal.main()
-
-
-import intro_X_XX_sim_multiplier
-if "main" in dir(intro_X_XX_sim_multiplier):
-    intro_X_XX_sim_multiplier.main()
-
-
-import scratch2
-if "main" in dir(scratch2):
-    scratch2.main()
-
-
-import sfcmod_external_sector
-if "main" in dir(sfcmod_external_sector):
-    sfcmod_external_sector.main()
-
-
-import SIM_Model_With_Capitalists
-if "main" in dir(SIM_Model_With_Capitalists):
-    SIM_Model_With_Capitalists.main()
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
 
+from __future__ import print_function
 
+import argparse
+import json
+import multiprocessing
+import os
+import runpy
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from multiprocessing.pool import ThreadPool
+
+SCRIPT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+# Root of the source tree, if we are running from it (and not an installed copy of the scripts).
+SOURCE_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(SCRIPT_DIRECTORY)))
+DEFAULT_TIMEOUT = 300.
+
+
+def get_script_list(directory=SCRIPT_DIRECTORY):
+    """
+    Read the script names in script_list.txt.
+    :param directory: str
+    :return: list
+    """
+    out = []
+    with open(os.path.join(directory, 'script_list.txt'), 'r') as f:
+        for fname in f:
+            fname = fname.strip()
+            if len(fname) == 0:
+                continue
+            if not fname.endswith('.py'):
+                raise ValueError('Bad file in script_list.txt')
+            out.append(fname)
+    return out
+
+
+def get_peak_memory():
+    """
+    Peak memory (resident set size) of this process, in bytes. None if not available
+    (Windows).
+    :return: int
+    """
+    try:
+        import resource
+    except ImportError:  # pragma: no cover
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':  # pragma: no cover
+        return peak
+    # Kilobytes on Linux.
+    return peak * 1024
+
+
+def run_worker(script_path, result_file):
+    """
+    Run a script in this process (as __main__), and then write the peak memory to
+    the result file.
+    :param script_path: str
+    :param result_file: str
+    :return: None
+    """
+    sys.argv = [script_path]
+    sys.path.insert(0, os.path.dirname(script_path))
+    try:
+        runpy.run_path(script_path, run_name='__main__')
+    finally:
+        with open(result_file, 'w') as f:
+            json.dump({'peak_memory': get_peak_memory()}, f)
+
+
+def run_script(fname, timeout, work_dir, directory=SCRIPT_DIRECTORY):
+    """
+    Run a script in a new process, returning a dict with the results. The script runs
+    in a new subdirectory of work_dir.
+
+    The status is one of 'ok', 'failed', 'timeout' and 'missing'.
+    :param fname: str
+    :param timeout: float
+    :param work_dir: str
+    :param directory: str
+    :return: dict
+    """
+    out = {'script': fname, 'status': 'missing', 'time': 0., 'peak_memory': None, 'output': ''}
+    script_path = os.path.join(directory, fname)
+    if not os.path.isfile(script_path):
+        return out
+    cwd = os.path.join(work_dir, fname[:-3])
+    if not os.path.isdir(os.path.join(cwd, 'output')):
+        os.makedirs(os.path.join(cwd, 'output'))
+    env = dict(os.environ)
+    env['MPLBACKEND'] = 'Agg'
+    if os.path.isfile(os.path.join(SOURCE_ROOT, 'sfc_models', '__init__.py')):
+        env['PYTHONPATH'] = os.pathsep.join([SOURCE_ROOT] + [x for x in [env.get('PYTHONPATH')] if x])
+    handle, result_file = tempfile.mkstemp(suffix='.json')
+    os.close(handle)
+    log = tempfile.TemporaryFile(mode='w+')
+    try:
+        start = time.time()
+        proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--worker', script_path, result_file],
+                                cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT)
+        while proc.poll() is None:
+            if time.time() - start > timeout:
+                proc.kill()
+                proc.wait()
+                break
+            time.sleep(0.02)
+        out['time'] = time.time() - start
+        if proc.returncode == 0:
+            out['status'] = 'ok'
+        elif out['time'] > timeout:
+            out['status'] = 'timeout'
+        else:
+            out['status'] = 'failed'
+        log.seek(0)
+        out['output'] = log.read()
+        try:
+            with open(result_file, 'r') as f:
+                out['peak_memory'] = json.load(f)['peak_memory']
+        except ValueError:
+            # Killed before the result was written.
+            pass
+    finally:
+        log.close()
+        os.remove(result_file)
+    return out
+
+
+def format_table(results):
+    """
+    Format the results as a text table.
+    :param results: list
+    :return: str
+    """
+    width = max([len('Script')] + [len(x['script']) for x in results])
+    row = '{0:<' + str(width) + 's} {1:>8s} {2:>10s}  {3}'
+    lines = [row.format('Script', 'Time', 'Peak Mem', 'Status')]
+    for res in results:
+        if res['peak_memory'] is None:
+            mem = 'n/a'
+        else:
+            mem = '{0:.1f}MB'.format(res['peak_memory'] / 1e6)
+        lines.append(row.format(res['script'], '{0:.2f}s'.format(res['time']), mem, res['status']))
+    num_failed = len([x for x in results if x['status'] != 'ok'])
+    lines.append('{0} scripts, {1} failed, total time {2:.2f}s'.format(
+        len(results), num_failed, sum([x['time'] for x in results])))
+    return '\n'.join(lines)
+
+
+def main(argv):
+    if len(argv) > 0 and argv[0] == '--worker':
+        run_worker(argv[1], argv[2])
+        return 0
+    parser = argparse.ArgumentParser(description='Run the sfc_models example scripts')
+    parser.add_argument('scripts', nargs='*', help='scripts to run (default: all in script_list.txt)')
+    parser.add_argument('--jobs', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT)
+    parser.add_argument('--json', help='file to write the results (JSON)')
+    parser.add_argument('--work-dir', help='directory for the script output (kept)')
+    parser.add_argument('--verbose', action='store_true', help='print the output of all scripts')
+    args = parser.parse_args(argv)
+    script_list = args.scripts
+    if len(script_list) == 0:
+        script_list = get_script_list()
+    work_dir = args.work_dir
+    if work_dir is None:
+        work_dir = tempfile.mkdtemp(prefix='sfc_scripts_')
+    pool = ThreadPool(max(1, args.jobs))
+    try:
+        results = pool.map(lambda x: run_script(x, args.timeout, work_dir), script_list)
+    finally:
+        pool.close()
+        if args.work_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    for res in results:
+        if args.verbose or res['status'] != 'ok':
+            print('=' * 20 + ' {0} [{1}]'.format(res['script'], res['status']))
+            print(res['output'])
+    print(format_table(results))
+    if args.json is not None:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=1)
+    if len([x for x in results if x['status'] != 'ok']) > 0:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,243 @@
+"""
+impulse_response.py
+
+Impulse response functions, by linearising a model around a solved baseline.
+
+For each period k, the solution of the period is a function of the state (the values
+at k-1 of the variables that appear lagged) and the exogenous variables at k. The
+Jacobian of that function is calculated at the baseline solution with dual numbers
+(sfc_models.dual). Changes to the exogenous variables are then pushed through the
+linear system
+
+    dx(k) = A(k) dstate(k-1) + B(k) dexog(k)
+
+so that the responses to any number of shocks come out of one pass, without solving
+the model again. (For a linear model, the responses match a re-solve of the model;
+otherwise, they are accurate for small shocks. Compare() gives the difference.)
+
+Usage:
+
+mod.main()
+irf = ImpulseResponse(mod.EquationSolver)
+# Permanent increase of 1 in government spending, starting in period 5.
+shock = irf.MakeShock('GOV__DEM_GOOD', 5, persistent=True)
+response = irf.Propagate([shock, ])[0]
+response['GOOD__SUP_GOOD']
+
+Period 0 is taken as given; shocks start in period 1 or later. The baseline solver
+has to hold the full time series (ParameterMemoryWindow is None).
+
+Copyright 2017 Brian Romanchuk
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from sfc_models.dual import Dual, get_derivatives, wrap_functions
+from sfc_models.utils import TimeSeriesHolder
+
+
+class ImpulseResponse(object):
+    """
+    Linearisation of a solved EquationSolver around its solution.
+
+    States are the variables that appear lagged, Inputs are the exogenous variables
+    (other than the time axis 'k'). Jacobians[k-1] holds the Jacobian for period k,
+    as a dict: variable name -> list of (input index, derivative) pairs, where the
+    input index runs over States (at k-1), followed by Inputs (at k). Zero entries
+    are dropped.
+    """
+    def __init__(self, solver):
+        """
+        :param solver: sfc_models.equation_solver.EquationSolver
+        """
+        self.Solver = solver
+        self.MaxTime = solver.Parser.MaxTime
+        self.States = sorted(set([x[1] for x in solver.Parser.Lagged]))
+        self.Inputs = sorted([x[0] for x in solver.Parser.Exogenous if x[0] != 'k'])
+        self.Jacobians = []
+
+    def Linearise(self):
+        """
+        Calculate the Jacobians for all periods.
+        :return: None
+        """
+        self.Jacobians = []
+        for step in range(1, self.MaxTime + 1):
+            self.Jacobians.append(self._LineariseStep(step))
+
+    def _LineariseStep(self, step):
+        solver = self.Solver
+        series = solver.TimeSeries
+        n = len(self.States) + len(self.Inputs)
+        initial = wrap_functions(solver.Functions)
+        for var, dummy in solver.Parser.Exogenous:
+            initial[var] = series[var][step]
+        initial.update(solver.ParameterValues)
+        for i, var in enumerate(self.Inputs):
+            initial[var] = Dual(series[var][step], _unit(i + len(self.States), n))
+        for lag_var, original_var in solver.Parser.Lagged:
+            initial[lag_var] = Dual(series[original_var][step - 1], _unit(self.States.index(original_var), n))
+        # Start at the solution; only the derivatives have to converge.
+        for var, dummy in solver.Parser.Endogenous:
+            initial[var] = Dual(series[var][step], (0.,) * n)
+        eval_globals = solver._GetDualGlobals()
+        initial, dummy = solver._IterateStep(step, initial, eval_globals, True, False)
+        solver._EvaluateDecoration(initial, eval_globals)
+        variables = [x[0] for x in solver.Parser.Endogenous] + [x[0] for x in solver.Parser.Lagged]
+        variables += [x[0] for x in solver.Parser.Decoration]
+        out = {}
+        for var in variables:
+            deriv = get_derivatives(initial[var], n)
+            out[var] = [(i, d) for i, d in enumerate(deriv) if d != 0.]
+        return out
+
+    def MakeShock(self, var, period, size=1., persistent=False):
+        """
+        Create a shock to an exogenous variable: a change of size in the given period
+        (and all later periods, if persistent).
+        :param var: str
+        :param period: int
+        :param size: float
+        :param persistent: bool
+        :return: dict
+        """
+        if var not in self.Inputs:
+            raise KeyError('Not an exogenous variable: {0}'.format(var))
+        changes = [0., ] * (self.MaxTime + 1)
+        for k in range(period, self.MaxTime + 1):
+            changes[k] = size
+            if not persistent:
+                break
+        return {var: changes}
+
+    def Propagate(self, shocks):
+        """
+        Calculate the responses to a list of shocks, in one pass.
+
+        Each shock is a dict: exogenous variable -> list of changes (by period, starting
+        at period 0; a short list is padded with zeros). Several variables can be shocked
+        together; see MakeShock().
+
+        Returns a list of TimeSeriesHolder objects (one per shock), with the change of
+        every variable from the baseline.
+        :param shocks: list
+        :return: list
+        """
+        if len(self.Jacobians) == 0:
+            self.Linearise()
+        for shock in shocks:
+            for var in shock:
+                if var not in self.Inputs:
+                    raise KeyError('Not an exogenous variable: {0}'.format(var))
+                if len(shock[var]) > 0 and shock[var][0] != 0.:
+                    raise ValueError('Cannot shock period 0: {0}'.format(var))
+        num_shocks = len(shocks)
+        exog_changes = []
+        for var in self.Inputs:
+            changes = []
+            for shock in shocks:
+                values = list(shock.get(var, ()))
+                values = values + [0., ] * (self.MaxTime + 1 - len(values))
+                changes.append([float(x) for x in values])
+            exog_changes.append(changes)
+        # Changes by variable in the current period; each a list with one entry per shock.
+        zero = [0., ] * num_shocks
+        current = {}
+        out = [TimeSeriesHolder('k') for dummy in shocks]
+        variables = list(self.Jacobians[0].keys()) if len(self.Jacobians) > 0 else []
+        for holder in out:
+            holder['k'] = [float(k) for k in range(0, self.MaxTime + 1)]
+            for var in variables + self.Inputs:
+                holder[var] = [0., ]
+        for step in range(1, self.MaxTime + 1):
+            inputs = [current.get(var, zero) for var in self.States]
+            inputs += [[x[step] for x in changes] for changes in exog_changes]
+            current = {}
+            for var, row in self.Jacobians[step - 1].items():
+                change = [0., ] * num_shocks
+                for i, d in row:
+                    for j, x in enumerate(inputs[i]):
+                        change[j] += d * x
+                current[var] = change
+            for var, changes in zip(self.Inputs, exog_changes):
+                current[var] = [x[step] for x in changes]
+            for var, change in current.items():
+                for holder, x in zip(out, change):
+                    holder[var].append(x)
+        return out
+
+    def GetImpulseResponses(self, variables, period=1, size=1., persistent=False):
+        """
+        Responses to a shock to each of a list of exogenous variables (see MakeShock()).
+        :param variables: list
+        :param period: int
+        :param size: float
+        :param persistent: bool
+        :return: dict
+        """
+        shocks = [self.MakeShock(var, period, size, persistent) for var in variables]
+        return dict(zip(variables, self.Propagate(shocks)))
+
+    def SolveShocked(self, shock):
+        """
+        Solve the full (nonlinear) model with a shock, starting from the baseline values
+        in period 0.
+
+        Returns a TimeSeriesHolder with the change of every variable from the baseline.
+        :param shock: dict
+        :return: TimeSeriesHolder
+        """
+        base = self.Solver.TimeSeries
+        solver = self.Solver._GetCopy()
+        solver.SensitivityVariables = []
+        solver.ParameterSolveInitialSteadyState = False
+        for var in self.Inputs:
+            values = [base[var][k] for k in range(0, self.MaxTime + 1)]
+            for k, x in enumerate(shock.get(var, ())):
+                values[k] += x
+            solver.AddExogenousSource(var, values)
+        solver.SetInitialConditions()
+        for var in base.keys():
+            solver.TimeSeries[var][0] = base[var][0]
+        solver.IterationCounts = []
+        for step in range(1, self.MaxTime + 1):
+            solver.SolveStep(step)
+        out = TimeSeriesHolder('k')
+        for var in base.keys():
+            if var == 'k':
+                out[var] = list(base[var])
+            else:
+                out[var] = [a - b for a, b in zip(solver.TimeSeries[var], base[var])]
+        return out
+
+    def Compare(self, shock):
+        """
+        Compare the linear response to a shock to the response of the full model
+        (SolveShocked()). Returns the largest absolute difference, by variable.
+        :param shock: dict
+        :return: dict
+        """
+        linear = self.Propagate([shock, ])[0]
+        full = self.SolveShocked(shock)
+        out = {}
+        for var in linear:
+            if var == 'k' or var not in full:
+                continue
+            out[var] = max([abs(a - b) for a, b in zip(linear[var], full[var])])
+        return out
+
+
+def _unit(i, n):
+    out = [0., ] * n
+    out[i] = 1.
+    return out
@@ -27,7 +27,20 @@ import traceback
 import sfc_models.equation_solver
 from sfc_models.equation import EquationBlock, Equation
 from sfc_models.equation_parser import EquationParser
-from sfc_models.utils import Logger, LogicError
+from sfc_models.utils import Logger, LogicError, get_parameter_value
+
+
+def _is_number(eqn):
+    """
+    Is the equation a number (such as '20.', '.5' or '-1e3')?
+    :param eqn: str
+    :return: bool
+    """
+    try:
+        float(eqn)
+    except ValueError:
+        return False
+    return True
 
 
 class EconomicObject(object):
@@ -86,6 +99,12 @@ class Model(EconomicObject):
         """
         EconomicObject.__init__(self)
         self.CountryList = []
+        # Indexes: country code -> Country, sector FullCode -> Sector, and sector ID -> Sector.
+        # The FullCode index is built by _GenerateFullSectorCodes().
+        self.CountryIndex = {}
+        self.SectorFullCodeIndex = {}
+        self.SectorIDIndex = {}
+        self.SectorListCache = None
         self.Exogenous = []
         self.InitialConditions = []
         self.FinalEquations = ''
@@ -97,12 +116,19 @@ class Model(EconomicObject):
         self.EquationSolver = sfc_models.equation_solver.EquationSolver()
         self.GlobalVariables = []
         self.IncomeExclusions = []
+        # Index of IncomeExclusions: sector ID -> set of excluded cash flow names.
+        self.IncomeExclusionIndex = {}
         self.CurrencyZoneList = []
         self.State = 'Construction'
         self.DefaultCurrency = 'LOCAL'
         self.RunSteps = None
         self.ExternalSector = None
         self.FinalEquationBlock = EquationBlock()
+        # Set once main() has built and parsed the equations, along with the sector
+        # attribute values at that point (sector ID -> {attribute name: value}).
+        self.IsBuilt = False
+        self.BuiltAttributes = {}
+        self.BuiltInputSizes = None
 
     def main(self, base_file_name=None):  # pragma: no cover
         """
@@ -128,8 +154,15 @@ class Model(EconomicObject):
 
         [4] The equations are passed to self.EquationSolver, and they are solved.
 
+        If main() is called again after a sector parameter is changed (for example,
+        Household.AlphaIncome; see Sector.ParameterAttributes), only the equations of the
+        changed sectors are regenerated, and they are patched into the EquationSolver. See
+        _RebuildDirtySectors(). (To try many values of a parameter, it is cheaper to pass
+        them to EquationSolver.SolveEquation() directly.)
+
         The user can then use GetTimeSeries() to access the output time series (if they can be
-        calculated.)
+        calculated.) To record the results of each solution in a database, call
+        AddResultStore() before main().
 
         :param base_file_name: str
         :return: None
@@ -139,13 +172,7 @@ class Model(EconomicObject):
             if base_file_name is not None:
                 Logger.register_standard_logs(base_file_name)
             Logger('Starting Model main()')
-            self._GenerateFullSectorCodes()
-            self._GenerateEquations()
-            self._FixAliases()
-            self._GenerateRegisteredCashFlows()
-            self._ProcessExogenous()
-            self.FinalEquations = self._CreateFinalEquations()
-            self.EquationSolver.ParseString(self.FinalEquations)
+            self._Build()
             self.EquationSolver.SolveEquation()
             self.LogInfo()
         except Warning as e:
@@ -157,10 +184,135 @@ class Model(EconomicObject):
             raise
         finally:
             self.State = 'Finished Running'
-            Logger(self.EquationSolver.GenerateCSVtext(), 'timeseries')
+            self._WriteTimeSeriesLog()
             Logger.cleanup()
         return self.FinalEquations
 
+    def _Build(self):
+        """
+        Build the equations and pass them to the EquationSolver (steps [1]-[3] of main()),
+        or update them if the Model is already built.
+        :return: None
+        """
+        if self.IsBuilt:
+            self._RebuildDirtySectors()
+        else:
+            self._GenerateFullSectorCodes()
+            self._GenerateEquations()
+            self._FixAliases()
+            self._GenerateRegisteredCashFlows()
+            self._ProcessExogenous()
+            self.FinalEquations = self._CreateFinalEquations()
+            self.EquationSolver.ParseString(self.FinalEquations)
+            self._SetBuilt()
+
+    def _SetBuilt(self):
+        """
+        Called once the equations are built and parsed; from now on, changes to Sector
+        attributes are tracked.
+        :return: None
+        """
+        self.IsBuilt = True
+        self.BuiltInputSizes = self._GetInputSizes()
+        self.BuiltAttributes = dict([(sector.ID, self._GetSectorAttributes(sector))
+                                     for sector in self.GetSectors()])
+
+    def _GetInputSizes(self):
+        return (len(self.Exogenous), len(self.InitialConditions), len(self.GlobalVariables),
+                len(self.RegisteredCashFlows), len(self.IncomeExclusions), len(self.SectorIDIndex))
+
+    @staticmethod
+    def _GetSectorAttributes(sector):
+        """
+        Get the public attributes of a sector that hold plain values (numbers, strings).
+        :param sector: Sector
+        :return: dict
+        """
+        out = {}
+        for name, value in sector.__dict__.items():
+            if not name.startswith('_') and (value is None or isinstance(value, (bool, int, float, str))):
+                out[name] = value
+        return out
+
+    def GetDirtySectors(self):
+        """
+        Get the sectors whose attributes have changed since main() built the Model, as a
+        list of (sector, sorted list of changed attribute names).
+
+        The attributes are compared when this is called, so that setting attributes
+        costs nothing extra.
+        :return: list
+        """
+        out = []
+        for sector in self.GetSectors():
+            built = self.BuiltAttributes.get(sector.ID, {})
+            current = self._GetSectorAttributes(sector)
+            changed = sorted([x for x in set(built) | set(current)
+                              if x not in built or x not in current or built[x] != current[x]])
+            if len(changed) > 0:
+                out.append((sector, changed))
+        return out
+
+    def _RebuildDirtySectors(self):
+        """
+        Update a built Model after sector parameters have changed.
+
+        Only the parameter equations of the changed sectors are regenerated (by
+        Sector._GenerateParameterEquations()), and the equations that changed are
+        replaced in the EquationSolver's parser, instead of generating and parsing all
+        of the equations again.
+
+        Other changes cannot be handled this way, and raise a LogicError; create a new
+        Model instead. This includes changes to attributes that are not in the sector's
+        ParameterAttributes, new sectors, and new exogenous variables, initial conditions,
+        global equations or cash flows. (Direct changes to sector equations after main()
+        are not tracked.) Every parameter in the equations (including the ones set by
+        ParameterAttributes) can also be changed without rebuilding, through the params
+        argument of EquationSolver.SolveEquation().
+
+        :return: None
+        """
+        if self._GetInputSizes() != self.BuiltInputSizes:
+            raise LogicError('Cannot update Model after adding sectors, exogenous variables, initial conditions, ' +
+                             'global equations or cash flows; create a new Model')
+        dirty = self.GetDirtySectors()
+        for sector, attribute_names in dirty:
+            unsupported = [x for x in attribute_names if x not in sector.ParameterAttributes]
+            if len(unsupported) > 0:
+                raise LogicError('Cannot update Model after main(): sector {0} changed ({1}); create a new Model, '
+                                 'or pass parameters to EquationSolver.SolveEquation()'.format(
+                                     sector.Code, ', '.join(unsupported)))
+        Logger('Rebuilding {0} sectors', priority=3, data_to_format=(len(dirty),))
+        for sector, dummy in dirty:
+            old_equations = dict([(row[0], row[1]) for row in sector._CreateFinalEquations()])
+            # Exogenous settings take priority over the generated equations.
+            exogenous = [(var, sector.EquationBlock[var].RHS()) for var in sector.EquationBlock.GetEquationList()
+                         if sector.EquationBlock[var].RHS().startswith('EXOGENOUS')]
+            sector._GenerateParameterEquations()
+            for var, rhs in exogenous:
+                sector.SetEquationRightHandSide(var, rhs)
+            for var, rhs, dummy2 in sector._CreateFinalEquations():
+                if old_equations.get(var) != rhs:
+                    if rhs.startswith('PARAMETER'):
+                        rhs = get_parameter_value(rhs)
+                    self.EquationSolver.Parser.ReplaceEquation(var, rhs)
+        for sector, dummy in dirty:
+            self.BuiltAttributes[sector.ID] = self._GetSectorAttributes(sector)
+        if self.EquationSolver.MaxTime is None:
+            self.EquationSolver.Parser.MaxTime = self.MaxTime
+        self.FinalEquations = self._CreateFinalEquations()
+
+    def _WriteTimeSeriesLog(self):
+        """
+        Stream the solved time series to the 'timeseries' log, if it is registered.
+        :return: None
+        """
+        try:
+            f = Logger.get_handle('timeseries')
+        except KeyError:
+            return
+        self.EquationSolver.TimeSeries.WriteCSV(f)
+
     def _GetSteps(self): # pragma: no cover
         """
         This is experimental, for GUI use. Will integrate with main() later...
@@ -198,7 +350,7 @@ class Model(EconomicObject):
         self.EquationSolver.SolveEquation()
         self.LogInfo()
         self.State = 'Finished Running'
-        Logger(self.EquationSolver.GenerateCSVtext(), 'timeseries')
+        self._WriteTimeSeriesLog()
         Logger.cleanup()
 
     def _RunStep(self, command): # pragma: no cover
@@ -234,8 +386,12 @@ class Model(EconomicObject):
         as a list object. The list object will be converted into a string representation using repr(), which
         means that it may be much longer than using something like '[20,] * 100'.
 
-        At present, does not support the usage of specifying a constant value. For example value='20.' does
-        not work, you need '[20.]*100.'
+        A number is a constant value.
+
+        Other objects are passed to the EquationSolver as is (see EquationSolver.AddExogenousSource()),
+        and are read one period at a time: either array-like objects (NumPy arrays, array.array, ...),
+        indexed by the period, or callables, which are called with the period. They are not
+        copied or converted to lists, and appear as "EXTERNAL" in the equations.
 
         :param sector_fullcode: str
         :param varname: str
@@ -247,6 +403,8 @@ class Model(EconomicObject):
         # If the user passes in a list or tuple, convert it to a string representation.
         if type(value) in (list, tuple):
             value = repr(value)
+        elif not (isinstance(value, str) or callable(value) or hasattr(value, '__getitem__')):
+            value = repr(float(value))
         self.Exogenous.append((sector_fullcode, varname, value))
 
     def AddInitialCondition(self, sector_fullcode, varname, value):
@@ -287,6 +445,17 @@ class Model(EconomicObject):
         Logger('Registering cash flow exclusion: {0} for ID={1}', priority=5,
                data_to_format=(cash_flow_name, sector.ID))
         self.IncomeExclusions.append((sector, cash_flow_name))
+        self.IncomeExclusionIndex.setdefault(sector.ID, set()).add(cash_flow_name)
+
+    def IsIncomeExcluded(self, sector, cash_flow_name):
+        """
+        Has the cash flow been excluded from the income of the sector (by
+        AddCashFlowIncomeExclusion())?
+        :param sector: Sector
+        :param cash_flow_name: str
+        :return: bool
+        """
+        return cash_flow_name in self.IncomeExclusionIndex.get(sector.ID, ())
 
     def _RegisterAlias(self, alias, sector, local_variable_name):
         """
@@ -320,11 +489,21 @@ class Model(EconomicObject):
 
         :return: list
         """
-        out = []
-        for cntry in self.CountryList:
-            for sector in cntry.SectorList:
-                out.append(sector)
-        return out
+        if self.SectorListCache is None:
+            out = []
+            for cntry in self.CountryList:
+                out.extend(cntry.SectorList)
+            self.SectorListCache = out
+        return list(self.SectorListCache)
+
+    def _RegisterSector(self, sector):
+        """
+        Called by Country._AddSector(), to update the indexes.
+        :param sector: Sector
+        :return: None
+        """
+        self.SectorIDIndex[sector.ID] = sector
+        self.SectorListCache = None
 
     def GetTimeSeries(self, series, cutoff=None, group_of_series='main'):
         """
@@ -335,6 +514,8 @@ class Model(EconomicObject):
         If self.TimeSeriesSupressZero is True, the first point is removed (the initial
         conditions period).
 
+        Returns a new list; modifying it does not affect the solver's time series.
+
         :param group_of_series:
         :param series: str
         :param cutoff: int
@@ -349,15 +530,58 @@ class Model(EconomicObject):
             elif group_of_series == 'initial': # pragma: no cover
                 series_holder = self.EquationSolver.TimeSeriesInitialSteadyState
             if cutoff is None:
-                val = series_holder[series]
+                val = list(series_holder[series])
             else:
-                val = series_holder[series][0:(cutoff + 1)]
+                val = list(series_holder[series][0:(cutoff + 1)])
         except KeyError:
             raise KeyError('Time series "{0}" does not exist'.format(series))
         if self.TimeSeriesSupressTimeZero:
             val.pop(0)
         return val
 
+    def WriteColumnar(self, directory):
+        """
+        Write the solved time series to a binary columnar result directory, with the
+        equation descriptions and sector codes in the index.
+
+        Load the results with sfc_models.columnar.ColumnarResults.
+
+        :param directory: str
+        :return: None
+        """
+        descriptions = {}
+        for var in self.FinalEquationBlock.GetEquationList():
+            descriptions[var] = self.FinalEquationBlock[var].Description
+        self.EquationSolver.WriteColumnar(directory, descriptions)
+
+    def SaveBundle(self, file_name):
+        """
+        Save a compiled model bundle (see sfc_models.bundle), which can be loaded and
+        solved without building the Model again. The equations are built if needed;
+        the Model does not have to be solved.
+
+        :param file_name: str
+        :return: None
+        """
+        import sfc_models.bundle
+        self._Build()
+        descriptions = {}
+        for var in self.FinalEquationBlock.GetEquationList():
+            descriptions[var] = self.FinalEquationBlock[var].Description
+        sfc_models.bundle.save_bundle(self.EquationSolver, file_name, descriptions)
+
+    def AddResultStore(self, store, name=''):
+        """
+        Record every solution of the model (main(), and later calls to
+        EquationSolver.Solve() with other parameters) in a ResultStore
+        (see sfc_models.result_store), under the run name.
+
+        :param store: sfc_models.result_store.ResultStore
+        :param name: str
+        :return: sfc_models.result_store.ResultStoreSink
+        """
+        return store.AddSink(self.EquationSolver, name)
+
     def _FixAliases(self):
         """
         Assign the proper names to variables in Sector objects (that were perviously aliases).
@@ -368,6 +592,9 @@ class Model(EconomicObject):
         for alias in self.Aliases:
             sector, varname = self.Aliases[alias]
             lookup[alias] = sector.GetVariableName(varname)
+        if len(lookup) == 0:
+            return
+        # Only terms that contain an alias are modified.
         for sector in self.GetSectors():
             sector._ReplaceAliases(lookup)
 
@@ -398,15 +625,16 @@ class Model(EconomicObject):
                 Logger('Country: Code= "%s" %s\n' % (c.Code, c.LongName))
                 Logger('=' * 60 + '\n\n')
                 for s in c.SectorList:
-                    Logger(s.Dump() + '\n')
+                    Logger(lambda sec=s: sec.Dump() + '\n')
         Logger('Writing LogInfo to log="eqn"')
-        Logger('\n\nFinal Equations:\n', log='eqn')
-        Logger(self.FinalEquations + '\n', log='eqn')
-        parser = EquationParser()
-        parser.ParseString(self.FinalEquations)
-        parser.EquationReduction()
-        Logger('\n\nReduced Equations', log='eqn')
-        Logger(parser.DumpEquations(), log='eqn')
+        if Logger.is_enabled(log='eqn'):
+            Logger('\n\nFinal Equations:\n', log='eqn')
+            Logger(self.FinalEquations + '\n', log='eqn')
+            parser = EquationParser()
+            parser.ParseString(self.FinalEquations)
+            parser.EquationReduction()
+            Logger('\n\nReduced Equations', log='eqn')
+            Logger(parser.DumpEquations(), log='eqn')
         if ex is not None:
             Logger('\n\nError raised:\n')
             traceback.print_exc(file=Logger.get_handle())
@@ -423,6 +651,8 @@ class Model(EconomicObject):
         if country.Code in self:
             raise LogicError('Country with Code {0} already in Model'.format(country.Code))
         self.CountryList.append(country)
+        self.CountryIndex[country.Code] = country
+        self.SectorListCache = None
         self.DefaultCurrency = country.Currency
         czone = self._FitIntoCurrencyZone(country)
         country.CurrencyZone = czone
@@ -462,6 +692,7 @@ class Model(EconomicObject):
                     sector.FullCode = cntry.Code + '_' + sector.Code
                 else:
                     sector.FullCode = sector.Code
+        self._IndexFullCodes()
 
     @staticmethod
     def GetSectorCodeWithCountry(sector):
@@ -537,16 +768,35 @@ class Model(EconomicObject):
     def LookupSector(self, fullcode):
         """
         Find a sector based on its FullCode.
+
+        An int is looked up as a sector ID instead: Sector.AddInitialCondition() records
+        the sector by ID, since the FullCode is only known once the Model is built.
         :param fullcode: str
         :return: Sector
         """
-        for cntry in self.CountryList:
+        if type(fullcode) is int:
             try:
-                s = cntry.LookupSector(fullcode, is_full_code=True)
-                return s
+                return self.SectorIDIndex[fullcode]
             except KeyError:
-                pass
-        raise KeyError('Sector with FullCode does not exist: ' + fullcode)
+                raise KeyError('Sector does not exist - ' + str(fullcode))
+        sector = self.SectorFullCodeIndex.get(fullcode, None)
+        if sector is None or sector.FullCode != fullcode:
+            # Not in the index (or FullCode changed since it was built); reindex.
+            self._IndexFullCodes()
+            sector = self.SectorFullCodeIndex.get(fullcode, None)
+            if sector is None:
+                raise KeyError('Sector with FullCode does not exist: ' + str(fullcode))
+        return sector
+
+    def _IndexFullCodes(self):
+        """
+        Rebuild SectorFullCodeIndex from the current FullCode of the sectors.
+        :return: None
+        """
+        self.SectorFullCodeIndex = {}
+        for sector in self.GetSectors():
+            if sector.FullCode != '':
+                self.SectorFullCodeIndex[sector.FullCode] = sector
 
     def _ProcessExogenous(self):
         """
@@ -560,8 +810,15 @@ class Model(EconomicObject):
                 sector = self.LookupSector(sector_code)
             else:
                 sector = sector_code
-            if varname not in sector.EquationBlock.Equations:
+            if varname not in sector.EquationBlock:
                 raise KeyError('Sector %s does not have variable %s' % (sector_code, varname))
+            if not isinstance(eqn, str):
+                # Array-like or callable; held by the solver.
+                self.EquationSolver.AddExogenousSource(sector.GetVariableName(varname), eqn)
+                eqn = 'EXTERNAL'
+            elif _is_number(eqn):
+                # Otherwise, the number is merged into the EXOGENOUS marker when tokenised ('20 .5').
+                eqn = '(' + eqn + ')'
             # Need to mark exogenous variables
             sector.SetEquationRightHandSide(varname, 'EXOGENOUS ' + eqn)
 
@@ -577,7 +834,7 @@ class Model(EconomicObject):
         out = []
         for sector_code, varname, value in self.InitialConditions:
             sector = self.LookupSector(sector_code)
-            if varname not in sector.EquationBlock.Equations:
+            if varname not in sector.EquationBlock:
                 raise KeyError('Sector %s does not have variable %s' % (sector_code, varname))
             out.append(('%s(0)' % (sector.GetVariableName(varname),), value, 'Initial Condition'))
         return out
@@ -634,6 +891,8 @@ class Model(EconomicObject):
         for row in out:
             if 'EXOGENOUS' in row[1]:
                 eq = Equation(row[0], desc=row[2], rhs=row[1].replace('EXOGENOUS', ''))
+            elif row[1].startswith('PARAMETER'):
+                eq = Equation(row[0], desc=row[2], rhs=get_parameter_value(row[1]))
             else:
                 eq = Equation(row[0], desc=row[2], rhs=row[1])
             self.FinalEquationBlock.AddEquation(eq)
@@ -651,10 +910,13 @@ class Model(EconomicObject):
         Logger('_FinalEquationFormatting()', priority=5)
         endo = []
         exo = []
+        params = []
         for row in out:
             if 'EXOGENOUS' in row[1]:
                 new_eqn = row[1].replace('EXOGENOUS', '')
                 exo.append((row[0], new_eqn, row[2]))
+            elif row[1].startswith('PARAMETER'):
+                params.append((row[0], get_parameter_value(row[1]), row[2]))
             else:
                 endo.append(row)
         max0 = max([len(x[0]) for x in out])
@@ -665,6 +927,9 @@ class Model(EconomicObject):
         endo = [formatter % x for x in endo]
         exo = [formatter % x for x in exo]
         s = '\n'.join(endo) + '\n\n# Exogenous Variables\n\n' + '\n'.join(exo)
+        if len(params) > 0:
+            params = [formatter % x for x in params]
+            s += '\n\n# Parameters\n\n' + '\n'.join(params)
         s += '\n\nMaxTime = {0}\nErr_Tolerance=1e-6'.format(self.MaxTime)
         return s
 
@@ -674,10 +939,10 @@ class Model(EconomicObject):
         :param item: str
         :return: Country
         """
-        for obj in self.CountryList:
-            if item == obj.Code:
-                return obj
-        raise KeyError('Country {0} not in Model'.format(item))
+        try:
+            return self.CountryIndex[item]
+        except KeyError:
+            raise KeyError('Country {0} not in Model'.format(item))
 
     def __contains__(self, item):
         """
@@ -686,11 +951,7 @@ class Model(EconomicObject):
         :return:
         """
         if type(item) is str:
-            try:
-                a = self[item]
-                return True
-            except KeyError:
-                return False
+            return item in self.CountryIndex
         return item in self.CountryList
 
 
@@ -720,6 +981,9 @@ class Country(EconomicObject):
             long_name = 'Country ' + code
         self.LongName = long_name
         self.SectorList = []
+        # Indexes: sector code -> Sector, sector ID -> Sector
+        self.SectorIndex = {}
+        self.SectorIDIndex = {}
         self.CurrencyZone = None
         if currency is None:
             self.Currency = code
@@ -742,6 +1006,9 @@ class Country(EconomicObject):
             raise LogicError('Sector with Code {0} already in Country {1}'.format(
                 sector.Code, self.Code))
         self.SectorList.append(sector)
+        self.SectorIndex[sector.Code] = sector
+        self.SectorIDIndex[sector.ID] = sector
+        self.Parent._RegisterSector(sector)
 
     def LookupSector(self, code, is_full_code=False):
         """
@@ -751,17 +1018,17 @@ class Country(EconomicObject):
         :return: Sector
         """
         if type(code) is int:
-            for s in self.SectorList:
-                if code == s.ID:
-                    return s
+            if code in self.SectorIDIndex:
+                return self.SectorIDIndex[code]
         elif is_full_code:
-            for s in self.SectorList:
-                if s.FullCode == code:
-                    return s
-        else:
-            for s in self.SectorList:
-                if s.Code == code:
-                    return s
+            try:
+                sector = self.GetModel().LookupSector(code)
+            except KeyError:
+                sector = None
+            if sector is not None and sector.Parent is self:
+                return sector
+        elif code in self.SectorIndex:
+            return self.SectorIndex[code]
         raise KeyError('Sector does not exist - ' + str(code))
 
     def GetSectors(self):
@@ -777,10 +1044,10 @@ class Country(EconomicObject):
         :param item: str
         :return:
         """
-        for obj in self.SectorList:
-            if obj.Code == item:
-                return obj
-        raise KeyError('Sector {0} does not exist in Country {1}'.format(item, self.Code))
+        try:
+            return self.SectorIndex[item]
+        except KeyError:
+            raise KeyError('Sector {0} does not exist in Country {1}'.format(item, self.Code))
 
     def __contains__(self, item):
         """
@@ -789,11 +1056,7 @@ class Country(EconomicObject):
         :return:
         """
         if type(item) == str:
-            try:
-                dummy = self[item]
-                return True
-            except KeyError:
-                return False
+            return item in self.SectorIndex
         return item in self.SectorList
 
 
@@ -838,8 +1101,9 @@ class CurrencyZone(EconomicObject):
 
     def LookupSector(self, short_code):
         out = None
-        for s in self.GetSectors():
-            if s.Code == short_code:
+        for c in self.CountryList:
+            if short_code in c.SectorIndex:
+                s = c.SectorIndex[short_code]
                 if out is not None:
                     raise LogicError("""Multiple sectors with same short code ({0})
     in CurrencyZone {1}""".format(short_code, self.Code))
@@ -0,0 +1,257 @@
+"""
+result_sinks.py
+
+Result sinks: objects that receive the solution of each time period as soon as it is
+solved, so that output can be written to disk as the solver runs.
+
+Usage:
+
+solver.AddResultSink(TabDelimitedSink('output/model_out.txt'))
+
+(For a Model object, use model.EquationSolver.AddResultSink().)
+
+Combined with EquationSolver.ParameterMemoryWindow, this allows very long simulations
+to be run without holding every period in memory. Since each period is flushed to disk
+once it is solved, the output written so far survives if the run crashes.
+
+Copyright 2017 Brian Romanchuk
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import ast
+import json
+import struct
+import sys
+from array import array
+
+from sfc_models.utils import TimeSeriesHolder
+
+# Size of the .npy header written by BinarySink. It is fixed, so that the header
+# (which contains the number of rows) can be rewritten in place after every period.
+NPY_HEADER_SIZE = 128
+NPY_MAGIC = b'\x93NUMPY'
+
+
+def create_npy_header(shape, header_size=NPY_HEADER_SIZE):
+    """
+    Create a version 1.0 .npy file header for a C-ordered array of little-endian
+    doubles. The header is padded with spaces to header_size bytes.
+
+    >>> hdr = create_npy_header((2, 3))
+    >>> len(hdr)
+    128
+    >>> read_npy_header(hdr)
+    ((2, 3), 128)
+
+    :param shape: tuple
+    :param header_size: int
+    :return: bytes
+    """
+    txt = "{'descr': '<f8', 'fortran_order': False, 'shape': %s, }" % (repr(tuple(shape)),)
+    pad = header_size - len(NPY_MAGIC) - 4 - len(txt) - 1
+    if pad < 0:  # pragma: no cover
+        raise ValueError('Array shape too large for .npy header')
+    txt = txt + ' ' * pad + '\n'
+    return NPY_MAGIC + b'\x01\x00' + struct.pack('<H', len(txt)) + txt.encode('latin1')
+
+
+def read_npy_header(raw):
+    """
+    Parse a .npy header (version 1.0 or 2.0). Only supports arrays of little-endian
+    doubles in C order, which is what the sfc_models writers create.
+
+    Returns the shape and the offset of the start of the data.
+
+    :param raw: bytes
+    :return: tuple
+    """
+    if raw[0:6] != NPY_MAGIC:
+        raise ValueError('Not a .npy file')
+    major = bytearray(raw[6:7])[0]
+    if major == 1:
+        hlen = struct.unpack('<H', raw[8:10])[0]
+        start = 10
+    else:
+        hlen = struct.unpack('<I', raw[8:12])[0]
+        start = 12
+    info = ast.literal_eval(raw[start:start + hlen].decode('latin1'))
+    if info['descr'] not in ('<f8', 'f8', '=f8') or info['fortran_order']:
+        raise ValueError('Only C-ordered float64 .npy files are supported')
+    return tuple(info['shape']), start + hlen
+
+
+def float_bytes(values):
+    """
+    Convert a sequence of floats to little-endian float64 bytes.
+    :param values: list
+    :return: bytes
+    """
+    arr = array('d', values)
+    if sys.byteorder != 'little':  # pragma: no cover
+        arr.byteswap()
+    if sys.version_info[0] >= 3:
+        return arr.tobytes()
+    else:  # pragma: no cover
+        return arr.tostring()
+
+
+class ResultSink(object):
+    """
+    Base class for result sinks.
+
+    The EquationSolver calls:
+    - Open() once the initial conditions are set, with the list of series names (in
+      the order given by TimeSeriesHolder.GetSeriesList()).
+    - WriteStep() for period 0, and then after each period is solved. The values are
+      in the same order as the series names.
+    - Close() at the end of the run, even if the solver fails.
+    """
+    def Open(self, series_names):
+        """
+        Start of run.
+        :param series_names: list
+        :return: None
+        """
+        self.SeriesNames = list(series_names)
+
+    def WriteStep(self, step, values):  # pragma: no cover   Virtual base class
+        """
+        Receive the values for one period.
+        :param step: int
+        :param values: list
+        :return: None
+        """
+        pass
+
+    def Close(self):
+        """
+        End of run.
+        :return: None
+        """
+        pass
+
+
+class TabDelimitedSink(ResultSink):
+    """
+    Writes a tab-delimited text file, in the same format as EquationSolver.WriteCSV(),
+    one row per period. Each row is flushed to disk as it is written.
+
+    The target may be a file name or an open file object (which is not closed).
+    """
+    def __init__(self, target, format_str='%.5g'):
+        self.Target = target
+        self.FormatStr = format_str
+        self.Handle = None
+        self.RowFormat = ''
+        self.SeriesNames = []
+
+    def Open(self, series_names):
+        ResultSink.Open(self, series_names)
+        if hasattr(self.Target, 'write'):
+            self.Handle = self.Target
+        else:
+            self.Handle = open(self.Target, 'w')
+        self.RowFormat = '\t'.join([self.FormatStr] * len(self.SeriesNames)) + '\n'
+        self.Handle.write('\t'.join(self.SeriesNames) + '\n')
+
+    def WriteStep(self, step, values):
+        self.Handle.write(self.RowFormat % tuple(values))
+        if hasattr(self.Handle, 'flush'):
+            self.Handle.flush()
+
+    def Close(self):
+        if self.Handle is not None and self.Handle is not self.Target:
+            self.Handle.close()
+        self.Handle = None
+
+
+class BinarySink(ResultSink):
+    """
+    Writes the results as a two dimensional .npy file (one row per period, one column
+    per series) of float64 values, with the series names in a JSON file alongside.
+
+    For base name "out", the files are "out.npy" and "out.columns.json".
+
+    The .npy header is rewritten after every period, so the file is always valid
+    (and readable by numpy.load(), if NumPy is available). Values are not rounded,
+    unlike the tab-delimited output.
+
+    Use BinarySink.Read() to load the file back into a TimeSeriesHolder.
+    """
+    def __init__(self, base_file_name):
+        self.BaseFileName = base_file_name
+        self.Handle = None
+        self.NumRows = 0
+        self.SeriesNames = []
+
+    @staticmethod
+    def GetFileNames(base_file_name):
+        """
+        Get the file names used for a base file name.
+        :param base_file_name: str
+        :return: tuple
+        """
+        return base_file_name + '.npy', base_file_name + '.columns.json'
+
+    def Open(self, series_names):
+        ResultSink.Open(self, series_names)
+        data_file, column_file = BinarySink.GetFileNames(self.BaseFileName)
+        with open(column_file, 'w') as f:
+            json.dump({'series': self.SeriesNames}, f)
+        self.NumRows = 0
+        self.Handle = open(data_file, 'wb')
+        self.Handle.write(create_npy_header((0, len(self.SeriesNames))))
+
+    def WriteStep(self, step, values):
+        self.Handle.write(float_bytes(values))
+        self.NumRows += 1
+        # Update the row count in the header.
+        self.Handle.seek(0)
+        self.Handle.write(create_npy_header((self.NumRows, len(self.SeriesNames))))
+        self.Handle.seek(0, 2)
+        self.Handle.flush()
+
+    def Close(self):
+        if self.Handle is not None:
+            self.Handle.close()
+        self.Handle = None
+
+    @staticmethod
+    def Read(base_file_name, time_series_name='k'):
+        """
+        Read the output of a BinarySink into a TimeSeriesHolder.
+
+        If the run did not finish, returns the periods that were written.
+        :param base_file_name: str
+        :param time_series_name: str
+        :return: TimeSeriesHolder
+        """
+        data_file, column_file = BinarySink.GetFileNames(base_file_name)
+        with open(column_file, 'r') as f:
+            series_names = json.load(f)['series']
+        with open(data_file, 'rb') as f:
+            raw = f.read()
+        shape, offset = read_npy_header(raw[0:NPY_HEADER_SIZE])
+        num_rows, num_cols = shape
+        data = array('d')
+        if sys.version_info[0] >= 3:
+            data.frombytes(raw[offset:offset + 8 * num_rows * num_cols])
+        else:  # pragma: no cover
+            data.fromstring(raw[offset:offset + 8 * num_rows * num_cols])
+        if sys.byteorder != 'little':  # pragma: no cover
+            data.byteswap()
+        out = TimeSeriesHolder(time_series_name)
+        for i, name in enumerate(series_names):
+            out[name] = data[i::num_cols].tolist()
+        return out
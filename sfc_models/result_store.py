@@ -0,0 +1,370 @@
+"""
+result_store.py
+
+Store the results of many runs in one SQLite database (with the standard library
+sqlite3 module), instead of one text file per run.
+
+For each run, the store records the metadata (name, model fingerprint, parameter
+values, solver settings, status, timing) and the values of all series. Values are
+stored one row per (series, run, period), indexed by series and run, so that
+reading one series for many runs does not read the others.
+
+Runs are added either after solving:
+
+store = ResultStore('runs.db')
+mod.main()
+store.AddRun(mod.EquationSolver, 'base case')
+
+or as the solver runs, with a ResultSink. The sink stays attached, and records every
+run of the solver (main(), or Solve() with different parameters):
+
+mod.AddResultStore(store, 'sweep')
+mod.main()
+for alpha in (.5, .6, .7):
+    mod.EquationSolver.Solve(params={'HH__AlphaIncome': alpha})
+
+(Model.AddResultStore() calls store.AddSink(mod.EquationSolver, 'sweep').) The sink
+records every period, even if the solver only holds a window of recent periods
+(ParameterMemoryWindow); AddRun() can only store the periods still held in memory.
+
+Each run is written in a single transaction.
+
+Queries:
+
+run_ids = store.FindRuns([('HH__AlphaIncome', '>', .5)])
+series = store.GetSeries('GOOD__SUP_GOOD', run_ids)
+
+Copyright 2017 Brian Romanchuk
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import hashlib
+import json
+import sqlite3
+import time
+
+from sfc_models.result_sinks import ResultSink
+from sfc_models.utils import TimeSeriesHolder
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    name TEXT,
+    fingerprint TEXT,
+    status TEXT,
+    start_time REAL,
+    solve_time REAL,
+    max_time INTEGER,
+    iterations INTEGER,
+    settings TEXT
+);
+CREATE TABLE IF NOT EXISTS parameters (
+    run_id INTEGER,
+    name TEXT,
+    value REAL,
+    PRIMARY KEY (run_id, name)
+);
+CREATE INDEX IF NOT EXISTS parameters_by_value ON parameters (name, value);
+CREATE TABLE IF NOT EXISTS series (
+    series_id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE
+);
+CREATE TABLE IF NOT EXISTS data (
+    series_id INTEGER,
+    run_id INTEGER,
+    period INTEGER,
+    value REAL,
+    PRIMARY KEY (series_id, run_id, period)
+) WITHOUT ROWID;
+"""
+
+# Solver settings recorded with each run.
+SETTINGS = ('MaxIterations', 'ParameterErrorTolerance', 'ParameterSolveInitialSteadyState', 'MaxWallTime',
+            'MaxStepTime', 'MaxTotalIterations')
+
+OPERATORS = ('<', '<=', '=', '>=', '>', '!=')
+
+
+def get_fingerprint(solver):
+    """
+    Fingerprint of a model: a hash of the parsed equations. Parameter values are not
+    included (they are stored separately), so runs of the same model with different
+    parameters have the same fingerprint.
+    :param solver: sfc_models.equation_solver.EquationSolver
+    :return: str
+    """
+    parser = solver.Parser
+    exogenous = [(var, eqn) for var, eqn in parser.Exogenous
+                 if var != 'k' and var not in solver.ExogenousSources]
+    txt = repr((sorted(parser.Endogenous), sorted(parser.Lagged), sorted(parser.Decoration),
+                sorted([x[0] for x in parser.Parameters]), sorted(exogenous),
+                sorted(solver.ExogenousSources.keys()), sorted(parser.InitialConditions.items())))
+    return hashlib.sha1(txt.encode('utf-8')).hexdigest()
+
+
+class ResultStore(object):
+    """
+    SQLite database of run results.
+    """
+    def __init__(self, file_name=':memory:'):
+        """
+        :param file_name: str
+        """
+        self.FileName = file_name
+        self.Connection = sqlite3.connect(file_name)
+        self.Connection.executescript(SCHEMA)
+        self.Connection.commit()
+        self._SeriesIDs = dict(self.Connection.execute('SELECT name, series_id FROM series'))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.Close()
+
+    def Close(self):
+        """
+        Close the database.
+        :return: None
+        """
+        self.Connection.close()
+
+    def _GetSeriesIDs(self, series_names):
+        """
+        Get the series_id for each series name, adding new names.
+        :param series_names: list
+        :return: list
+        """
+        new_names = [x for x in series_names if x not in self._SeriesIDs]
+        if len(new_names) > 0:
+            self.Connection.executemany('INSERT OR IGNORE INTO series (name) VALUES (?)',
+                                        [(x,) for x in new_names])
+            self._SeriesIDs = dict(self.Connection.execute('SELECT name, series_id FROM series'))
+        return [self._SeriesIDs[x] for x in series_names]
+
+    def _StartRun(self, solver, name):
+        """
+        Insert the run metadata (without committing); returns the run_id.
+        :param solver: sfc_models.equation_solver.EquationSolver
+        :param name: str
+        :return: int
+        """
+        settings = dict([(x, getattr(solver, x)) for x in SETTINGS])
+        cursor = self.Connection.execute(
+            'INSERT INTO runs (name, fingerprint, status, start_time, max_time, settings) VALUES (?, ?, ?, ?, ?, ?)',
+            (name, get_fingerprint(solver), 'running', time.time(), solver.Parser.MaxTime,
+             json.dumps(settings, sort_keys=True)))
+        run_id = cursor.lastrowid
+        self.Connection.executemany('INSERT INTO parameters (run_id, name, value) VALUES (?, ?, ?)',
+                                    [(run_id, var, val) for var, val in sorted(solver.ParameterValues.items())])
+        return run_id
+
+    def _EndRun(self, run_id, solver, solve_time):
+        """
+        Record the outcome of a run, and commit.
+        :param run_id: int
+        :param solver: sfc_models.equation_solver.EquationSolver
+        :param solve_time: float
+        :return: None
+        """
+        status = solver.Status
+        if status is None:
+            # The solution was stopped by the caller (see EquationSolver.IterSolve()).
+            status = 'stopped'
+        self.Connection.execute('UPDATE runs SET status=?, solve_time=?, iterations=? WHERE run_id=?',
+                                (status, solve_time, sum(solver.IterationCounts), run_id))
+        self.Connection.commit()
+
+    def AddRun(self, solver, name=''):
+        """
+        Add the results of a solved EquationSolver. Returns the run_id.
+
+        If the solver only holds a window of recent periods (ParameterMemoryWindow), only
+        those periods are stored (under their period numbers), for every series
+        (including constants); use AddSink() to store every period.
+        :param solver: sfc_models.equation_solver.EquationSolver
+        :param name: str
+        :return: int
+        """
+        try:
+            run_id = self._StartRun(solver, name)
+            series_names = solver.TimeSeries.GetSeriesList()
+            series_ids = self._GetSeriesIDs(series_names)
+            rows = []
+            # Iteration starts at the first period held in memory; constants hold every period.
+            all_series = [solver.TimeSeries[var] for var in series_names]
+            start = max([0, ] + [getattr(series, 'FirstIndex', 0) for series in all_series])
+            for series, series_id in zip(all_series, series_ids):
+                first = getattr(series, 'FirstIndex', 0)
+                rows.extend([(series_id, run_id, k, val) for k, val in enumerate(series, first) if k >= start])
+            self.Connection.executemany('INSERT INTO data (series_id, run_id, period, value) VALUES (?, ?, ?, ?)',
+                                        rows)
+            self._EndRun(run_id, solver, solver.LastSolveTime)
+        except Exception:
+            self.Connection.rollback()
+            self._SeriesIDs = dict(self.Connection.execute('SELECT name, series_id FROM series'))
+            raise
+        return run_id
+
+    def AddSink(self, solver, name=''):
+        """
+        Create a ResultStoreSink, and add it to the solver, so that every run of the
+        solver is recorded.
+        :param solver: sfc_models.equation_solver.EquationSolver
+        :param name: str
+        :return: ResultStoreSink
+        """
+        sink = ResultStoreSink(self, solver, name)
+        solver.AddResultSink(sink)
+        return sink
+
+    def GetRuns(self, run_ids=None):
+        """
+        Get the run metadata, as a list of dicts (with the parameter values under
+        'parameters').
+        :param run_ids: list
+        :return: list
+        """
+        query = 'SELECT run_id, name, fingerprint, status, start_time, solve_time, max_time, iterations, ' \
+                'settings FROM runs'
+        args = ()
+        if run_ids is not None:
+            run_ids = list(run_ids)
+            query += ' WHERE run_id IN ({0})'.format(', '.join(['?'] * len(run_ids)))
+            args = run_ids
+        out = []
+        for row in self.Connection.execute(query + ' ORDER BY run_id', args):
+            info = dict(zip(('run_id', 'name', 'fingerprint', 'status', 'start_time', 'solve_time', 'max_time',
+                             'iterations'), row[0:8]))
+            info['settings'] = json.loads(row[8])
+            info['parameters'] = self.GetParameters(info['run_id'])
+            out.append(info)
+        return out
+
+    def GetParameters(self, run_id):
+        """
+        Get the parameter values of a run.
+        :param run_id: int
+        :return: dict
+        """
+        return dict(self.Connection.execute('SELECT name, value FROM parameters WHERE run_id=?', (run_id,)))
+
+    def FindRuns(self, conditions=(), name=None, fingerprint=None, status=None):
+        """
+        Find the runs that meet all the conditions; returns the sorted list of run_ids.
+
+        Each condition is a (parameter name, operator, value) tuple; the operators are
+        '<', '<=', '=', '>=', '>' and '!='.
+
+        store.FindRuns([('HH__AlphaIncome', '>', .5)], status='ok')
+
+        :param conditions: list
+        :param name: str
+        :param fingerprint: str
+        :param status: str
+        :return: list
+        """
+        clauses = []
+        args = []
+        for param, operator, value in conditions:
+            if operator not in OPERATORS:
+                raise ValueError('Unknown operator: {0}'.format(operator))
+            clauses.append('run_id IN (SELECT run_id FROM parameters WHERE name=? AND value {0} ?)'.format(operator))
+            args.extend([param, value])
+        for column, value in (('name', name), ('fingerprint', fingerprint), ('status', status)):
+            if value is not None:
+                clauses.append('{0}=?'.format(column))
+                args.append(value)
+        query = 'SELECT run_id FROM runs'
+        if len(clauses) > 0:
+            query += ' WHERE ' + ' AND '.join(clauses)
+        return [x[0] for x in self.Connection.execute(query + ' ORDER BY run_id', args)]
+
+    def GetSeries(self, series_name, run_ids=None):
+        """
+        Get a series for a list of runs (or all runs); returns a dict, run_id -> list
+        of values by period, starting at period 0. Periods that were not stored (the
+        periods before the window of a run added by AddRun() with ParameterMemoryWindow
+        set) are None, so that the lists of all runs line up by period.
+        :param series_name: str
+        :param run_ids: list
+        :return: dict
+        """
+        if series_name not in self._SeriesIDs:
+            raise KeyError('Unknown series: {0}'.format(series_name))
+        query = 'SELECT run_id, period, value FROM data WHERE series_id=?'
+        args = [self._SeriesIDs[series_name]]
+        if run_ids is not None:
+            run_ids = list(run_ids)
+            query += ' AND run_id IN ({0})'.format(', '.join(['?'] * len(run_ids)))
+            args.extend(run_ids)
+        out = {}
+        for run_id, period, value in self.Connection.execute(query + ' ORDER BY run_id, period', args):
+            try:
+                values = out[run_id]
+            except KeyError:
+                values = []
+                out[run_id] = values
+            if period > len(values):
+                values.extend([None, ] * (period - len(values)))
+            values.append(value)
+        return out
+
+    def GetRunSeries(self, run_id):
+        """
+        Get all the series of a run. For a run added by AddRun() with a memory window,
+        the series only cover the window; the 'k' series gives the periods.
+        :param run_id: int
+        :return: TimeSeriesHolder
+        """
+        out = TimeSeriesHolder('k')
+        query = 'SELECT series.name, data.value FROM data JOIN series ON data.series_id = series.series_id ' \
+                'WHERE data.run_id=? ORDER BY data.series_id, data.period'
+        for name, value in self.Connection.execute(query, (run_id,)):
+            out.AppendValue(name, value)
+        return out
+
+
+class ResultStoreSink(ResultSink):
+    """
+    ResultSink that records each run of an EquationSolver in a ResultStore. See
+    ResultStore.AddSink().
+
+    RunIDs is the list of the run_ids recorded.
+    """
+    def __init__(self, store, solver, name=''):
+        """
+        :param store: ResultStore
+        :param solver: sfc_models.equation_solver.EquationSolver
+        :param name: str
+        """
+        self.Store = store
+        self.Solver = solver
+        self.Name = name
+        self.RunIDs = []
+        self.SeriesIDs = []
+
+    def Open(self, series_names):
+        ResultSink.Open(self, series_names)
+        self.RunIDs.append(self.Store._StartRun(self.Solver, self.Name))
+        self.SeriesIDs = self.Store._GetSeriesIDs(self.SeriesNames)
+
+    def WriteStep(self, step, values):
+        run_id = self.RunIDs[-1]
+        self.Store.Connection.executemany('INSERT INTO data (series_id, run_id, period, value) VALUES (?, ?, ?, ?)',
+                                          [(series_id, run_id, step, val)
+                                           for series_id, val in zip(self.SeriesIDs, values)])
+
+    def Close(self):
+        self.Store._EndRun(self.RunIDs[-1], self.Solver, self.Solver.LastSolveTime)
@@ -6,7 +6,13 @@ from sfc_models.utils import Logger, replace_token_from_lookup, LogicError, crea
 class Sector(EconomicObject):
     """
     All sectors derive from this class.
+
+    ParameterAttributes lists the attributes whose equations are regenerated by
+    _GenerateParameterEquations(); if only these attributes are changed after
+    Model.main(), calling main() again updates the model without rebuilding it.
+    (Other parameters can be changed when solving; see EquationSolver.SolveEquation().)
     """
+    ParameterAttributes = ()
 
     def __init__(self, country, code, long_name='', has_F=True):
         if long_name == '':
@@ -51,7 +57,7 @@ class Sector(EconomicObject):
             equation = eqn
         else:
             equation = Equation(varname, desc, [Term(eqn, is_blob=True),])
-        if varname in self.GetVariables():
+        if varname in self.EquationBlock:
             Logger('[ID={0}] Variable Overwritten: {1}', priority=3,
                    data_to_format=(self.ID, varname))
         self.EquationBlock.AddEquation(equation)
@@ -109,6 +115,8 @@ class Sector(EconomicObject):
     def SetExogenous(self, varname, val):
         """
         Set an exogenous variable for a sector. The variable must already be defined (by AddVariable()).
+
+        See Model.AddExogenous() for the types of values that are supported.
         :param varname: str
         :param val: str
         :return: None
@@ -142,7 +150,7 @@ class Sector(EconomicObject):
         :param varname: str
         :return: str
         """
-        if varname not in self.EquationBlock.GetEquationList():
+        if varname not in self.EquationBlock:
             raise KeyError('Variable %s not in sector %s' % (varname, self.FullCode))
         if self.FullCode == '':
             alias = '_{0}__{1}'.format(self.ID, varname)
@@ -203,19 +211,14 @@ class Sector(EconomicObject):
         self.EquationBlock['F'].AddTerm(term)
         if is_income:
             # Need to see whether it is excluded
-            mod = self.GetModel()
-            for obj, excluded in mod.IncomeExclusions:
-                if obj.ID == self.ID:
-                    if term_obj.Term == excluded:
-                        is_income = False
-                        break
+            is_income = not self.GetModel().IsIncomeExcluded(self, term_obj.Term)
         if is_income:
             self.EquationBlock['INC'].AddTerm(term)
         if eqn is None:
             return
         # Remove the +/- from the term
         term = term_obj.Term
-        if term in self.GetVariables():
+        if term in self.EquationBlock:
             rhs = self.EquationBlock[term].RHS()
             if rhs == '' or rhs == '0.0':
                 self.SetEquationRightHandSide(term, eqn)
@@ -248,6 +251,16 @@ class Sector(EconomicObject):
         """
         return
 
+    def _GenerateParameterEquations(self):
+        """
+        (Re)set the equations that only depend upon the attributes in ParameterAttributes.
+        Must not affect any other equations, or other sectors.
+
+        Work is done in derived classes.
+        :return: None
+        """
+        return
+
     def Dump(self):
         """
         Create a string with information about this object. This is for debugging
@@ -269,14 +282,15 @@ class Sector(EconomicObject):
         """
         out = []
         lookup = {}
-        for varname in self.EquationBlock.GetEquationList():
+        variable_list = self.EquationBlock.GetEquationList()
+        for varname in variable_list:
             lookup[varname] = self.GetVariableName(varname)
-        for varname in self.EquationBlock.GetEquationList():
+        for varname in variable_list:
             eq = self.EquationBlock[varname]
             rhs = eq.GetRightHandSide()
             if len(rhs.strip()) == 0:   # pragma: no cover  [Does not happen any more; leave in just in case.]
                 continue
-            out.append((self.GetVariableName(varname),
+            out.append((lookup[varname],
                         replace_token_from_lookup(rhs, lookup),
                         '[%s] %s' % (varname, eq.Description)))
         return out
@@ -350,7 +364,7 @@ class Market(Sector):
         for sector in self.Parent.GetSectors():
             if sector.ID == self.ID:
                 continue
-            if 'SUP_' + self.Code in sector.EquationBlock.Equations:
+            if 'SUP_' + self.Code in sector.EquationBlock:
                 if ret_value is None:
                     ret_value = sector
                 else:
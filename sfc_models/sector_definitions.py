@@ -22,13 +22,14 @@ limitations under the License.
 from sfc_models.sector import Sector, Market, FinancialAssetMarket
 from sfc_models.utils import Logger
 import sfc_models.utils as utils
-from sfc_models.utils import LogicError
+from sfc_models.utils import LogicError, create_parameter_equation
 
 
 class BaseHousehold(Sector):
     """
     Base class for all household sectors
     """
+    ParameterAttributes = ('AlphaIncome', 'AlphaFin')
 
     def __init__(self, country, code, long_name='', alpha_income=.6, alpha_fin=.4,
                  consumption_good_name='GOOD'):
@@ -47,8 +48,10 @@ class BaseHousehold(Sector):
         self.AlphaFin = alpha_fin
         self.IsTaxable = True
         self.GetModel().AddCashFlowIncomeExclusion(self, 'DEM_' + consumption_good_name)
-        self.AddVariable('AlphaIncome', 'Parameter for consumption out of income', '%0.4f' % (self.AlphaIncome,))
-        self.AddVariable('AlphaFin', 'Parameter for consumption out of financial assets', '%0.4f' % (self.AlphaFin,))
+        self.AddVariable('AlphaIncome', 'Parameter for consumption out of income',
+                         create_parameter_equation(self.AlphaIncome))
+        self.AddVariable('AlphaFin', 'Parameter for consumption out of financial assets',
+                         create_parameter_equation(self.AlphaFin))
         self.AddVariable('DEM_' + consumption_good_name, 'Expenditure on goods consumption',
                          'AlphaIncome * AfterTax + AlphaFin * LAG_F')
         # self.AddVariable('PreTax', 'Pretax income', 'SET IN DERIVED CLASSES')
@@ -61,8 +64,16 @@ class BaseHousehold(Sector):
         is called.
         :return:
         """
-        self.SetEquationRightHandSide('AlphaIncome',  '%0.4f' % (self.AlphaIncome,))
-        self.SetEquationRightHandSide('AlphaFin', '%0.4f' % (self.AlphaFin,))
+        self._GenerateParameterEquations()
+
+    def _GenerateParameterEquations(self):
+        """
+        Set the Alpha variables. They are parameters, so that their values can be changed
+        when the equations are solved (see EquationSolver.SolveEquation()).
+        :return:
+        """
+        self.SetEquationRightHandSide('AlphaIncome',  create_parameter_equation(self.AlphaIncome))
+        self.SetEquationRightHandSide('AlphaFin', create_parameter_equation(self.AlphaFin))
 
 
 class Household(BaseHousehold):
@@ -203,7 +214,7 @@ class FixedMarginBusiness(Sector):
                              '%0.3f * %s' % (wage_share, market_sup_good))
             self.SetEquationRightHandSide('PROF', '%0.3f * %s' % (self.ProfitMargin, market_sup_good))
         for s in self.Parent.SectorList:
-            if 'DIV' in s.EquationBlock.Equations:
+            if 'DIV' in s.EquationBlock:
                 Logger('Adding dividend flow', priority=5)
                 self.AddCashFlow('-DIV', 'PROF', 'Dividends paid', is_income=False)
                 s.AddCashFlow('DIV', self.GetVariableName('PROF'), 'Dividends received', is_income=True)
@@ -255,7 +266,7 @@ class FixedMarginBusinessMultiOutput(Sector):
             self.SetEquationRightHandSide(demand_labour, '%0.3f * SUP' % (wage_share,))
             # self.Equations['PROF'] = '%0.3f * %s' % (self.ProfitMargin, market_sup_good)
         for s in self.Parent.SectorList:
-            if 'DIV' in s.EquationBlock.Equations:  # pragma: no cover
+            if 'DIV' in s.EquationBlock:  # pragma: no cover
                 raise NotImplementedError('Not tested yet')
                 self.AddCashFlow('-DIV', 'PROF', 'Dividends paid', is_income=False)
                 s.AddCashFlow('DIV', self.GetVariableName('PROF'), 'Dividends received',
@@ -269,19 +280,23 @@ class TaxFlow(Sector):
 
     Uses the TaxRate of this object, or the TaxRate of the sector (if it is defined).
     """
+    ParameterAttributes = ('TaxRate',)
 
     def __init__(self, country, code, long_name='', taxrate=0.0, taxes_paid_to='GOV'):
         if long_name == '':
             long_name = 'TaxFlow Object {0} in Country {1}'.format(code, country.Code)
         Sector.__init__(self, country, code, long_name, has_F=False)
-        self.AddVariable('TaxRate', 'Tax rate', '%0.4f' % (taxrate,))
+        self.AddVariable('TaxRate', 'Tax rate', create_parameter_equation(taxrate))
         self.AddVariable('T', 'Taxes Paid', '')
         self.TaxingSector = taxes_paid_to
         self.TaxRate = taxrate
 
+    def _GenerateParameterEquations(self):
+        self.SetEquationRightHandSide('TaxRate', create_parameter_equation(self.TaxRate))
+
     def _GenerateEquations(self):
         # Overwrite the tax rate, in case the user sets self.TaxRate directly.
-        self.SetEquationRightHandSide('TaxRate', '%0.4f' % (self.TaxRate,))
+        self._GenerateParameterEquations()
         terms = []
         # Find all sector that are taxable
         taxrate_name = self.GetVariableName('TaxRate')
@@ -291,7 +306,7 @@ class TaxFlow(Sector):
             if s.IsTaxable:
                 # If the sector has a tax rate defined for it, use that tax rate instead of this object's rate.
                 # Need to add support for fdiffering rates for each type of income?
-                if 'TaxRate' in s.EquationBlock.Equations:
+                if 'TaxRate' in s.EquationBlock:
                     tax_name_used = s.GetVariableName('TaxRate')
                 else:
                     tax_name_used = taxrate_name
@@ -18,23 +18,38 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
+import atexit
+import copy
 import keyword
 import math
 import os
+import re
 import sys
+import threading
 import tokenize
+from array import array
 from io import BytesIO
-from tokenize import untokenize, NAME
+from tokenize import untokenize, NAME, NUMBER, OP
+
+# The ENCODING token only exists in Python 3.
+ENCODING = getattr(tokenize, 'ENCODING', -1)
 
 
 is_python_3 = sys.version_info[0] == 3
 
 if is_python_3:
     import builtins
+    import queue
 else:  # pragma: no cover
     # noinspection PyUnresolvedReferences
     import __builtin__
+    # noinspection PyUnresolvedReferences
+    import Queue as queue
 
+# Number of rows formatted at a time when writing tab-delimited output.
+CSV_CHUNK_SIZE = 500
+# Number of characters buffered before log text is passed to the writer thread.
+LOG_BUFFER_SIZE = 64 * 1024
 
 class LogicError(ValueError):
     """
@@ -74,24 +89,455 @@ class TimeSeriesHolder(dict):
         except KeyError:
             self[series_name] = [val,]
 
-    def GenerateCSVtext(self, format_str='%.5g'):
+    def SetConstant(self, series_name, val, length):
+        """
+        Set a series equal to a constant value over length periods.
+        :param series_name: str
+        :param val: float
+        :param length: int
+        :return: None
+        """
+        self[series_name] = [val, ] * length
+
+    def Truncate(self, length):
+        """
+        Drop the points after the first length points of all series.
+        :param length: int
+        :return: None
+        """
+        for series_name in self.keys():
+            del self[series_name][length:]
+
+    def GenerateCSVtext(self, format_str='%.5g', columns=None):
         """
         Generate the text for a tab-delimited file.
+
+        Use WriteCSV() to write directly to a file, which avoids building the whole
+        text in memory.
         :param format_str: str
+        :param columns: list
         :return: str
         """
+        return ''.join(self._GenerateCSVChunks(format_str, columns))
+
+    def WriteCSV(self, f, format_str='%.5g', columns=None, chunk_size=CSV_CHUNK_SIZE):
+        """
+        Write a tab-delimited file to the file object f, chunk_size rows at a time.
+
+        If columns is given, only those series are written. Columns are always in the
+        order of GetSeriesList().
+
+        :param f: file
+        :param format_str: str
+        :param columns: list
+        :param chunk_size: int
+        :return: None
+        """
+        for chunk in self._GenerateCSVChunks(format_str, columns, chunk_size):
+            f.write(chunk)
+
+    def _GenerateCSVChunks(self, format_str, columns=None, chunk_size=CSV_CHUNK_SIZE):
+        """
+        Generator for the text of a tab-delimited file: the header row, followed by
+        blocks of up to chunk_size rows.
+        :param format_str: str
+        :param columns: list
+        :param chunk_size: int
+        :return:
+        """
         varz = self.GetSeriesList()
+        if columns is not None:
+            for col in columns:
+                if col not in self:
+                    raise KeyError('Time series "{0}" does not exist'.format(col))
+            wanted = set(columns)
+            varz = [x for x in varz if x in wanted]
         if len(varz) == 0:
-            return ''
-        out = '\t'.join(varz) + '\n'
-        lengths = [len(x) for x in self.values()]
-        N = min(lengths)
-        for i in range(0, N):
-            row = []
-            for v in varz:
-                row.append(self[v][i], )
-            row = [format_str % (x,) for x in row]
-            out += '\t'.join(row) + '\n'
+            return
+        yield '\t'.join(varz) + '\n'
+        N = min([len(x) for x in self.values()])
+        # If the series only hold a window of recent points, start at the first
+        # period that every series still has.
+        first = max([getattr(x, 'FirstIndex', 0) for x in self.values()])
+        row_format = '\t'.join([format_str] * len(varz)) + '\n'
+        for start in range(first, N, chunk_size):
+            end = min(start + chunk_size, N)
+            rows = zip(*[self[v][start:end] for v in varz])
+            yield ''.join([row_format % row for row in rows])
+
+
+class TimeSeriesView(object):
+    """
+    A single time series that lives inside a block of floats (array('d')) owned by an
+    ArrayTimeSeriesHolder.
+
+    Behaves like a list for the operations the solver uses: indexing, assignment,
+    append(), len(), iteration and slicing. Slices return new lists, so that callers
+    cannot accidentally modify the underlying storage through them.
+
+    If the series outgrows its preallocated row, it moves itself into its own array;
+    other series in the block are unaffected.
+
+    >>> obj = ArrayTimeSeriesHolder('k', ['x'], 3)
+    >>> obj['x'] = [1., 2.]
+    >>> obj['x'].append(3.)
+    >>> obj['x']
+    [1.0, 2.0, 3.0]
+    >>> obj['x'][-1]
+    3.0
+
+    If IsRing is True, the row is a ring buffer: appending past the end of the row
+    overwrites the oldest point instead of growing. Indices still refer to the time
+    period; periods that have been overwritten raise an IndexError.
+
+    >>> obj = ArrayTimeSeriesHolder('k', ['x'], 3, window=2)
+    >>> obj['x'] = [1., 2.]
+    >>> obj['x'].append(3.)
+    >>> obj['x'][2], obj['x'].FirstIndex, len(obj['x'])
+    (3.0, 1, 3)
+    """
+    __slots__ = ('Data', 'Offset', 'Capacity', 'Length', 'IsRing')
+
+    def __init__(self, data, offset, capacity, is_ring=False):
+        self.Data = data
+        self.Offset = offset
+        self.Capacity = capacity
+        self.Length = 0
+        self.IsRing = is_ring
+
+    def __len__(self):
+        return self.Length
+
+    @property
+    def FirstIndex(self):
+        """
+        The first time period that is still held in memory.
+        :return: int
+        """
+        if self.IsRing and self.Length > self.Capacity:
+            return self.Length - self.Capacity
+        return 0
+
+    def _GetIndex(self, i):
+        if i < 0:
+            i += self.Length
+        if i < 0 or i >= self.Length:
+            raise IndexError('Time series index out of range')
+        if self.IsRing:
+            if i < self.Length - self.Capacity:
+                raise IndexError('Period {0} is no longer held in memory'.format(i))
+            return self.Offset + i % self.Capacity
+        return self.Offset + i
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, stride = i.indices(self.Length)
+            if stride == 1 and not self.IsRing:
+                if stop <= start:
+                    return []
+                return self.Data[self.Offset + start:self.Offset + stop].tolist()
+            return [self.Data[self._GetIndex(j)] for j in range(start, stop, stride)]
+        return self.Data[self._GetIndex(i)]
+
+    def __setitem__(self, i, val):
+        self.Data[self._GetIndex(i)] = val
+
+    def __iter__(self):
+        data = self.Data
+        for i in range(self.FirstIndex, self.Length):
+            yield data[self._GetIndex(i)]
+
+    def __eq__(self, other):
+        try:
+            return self.tolist() == list(other)
+        except TypeError:
+            return False
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self.tolist())
+
+    def tolist(self):
+        """
+        Copy of the series (the part held in memory) as a list of floats.
+        :return: list
+        """
+        if self.IsRing:
+            return list(self)
+        return self.Data[self.Offset:self.Offset + self.Length].tolist()
+
+    def append(self, val):
+        """
+        Append a value to the end of the series.
+        :param val: float
+        :return: None
+        """
+        if self.IsRing:
+            self.Data[self.Offset + self.Length % self.Capacity] = val
+            self.Length += 1
+            return
+        if self.Length >= self.Capacity:
+            self._Reserve(max(2 * self.Capacity, self.Length + 1, 8))
+        self.Data[self.Offset + self.Length] = val
+        self.Length += 1
+
+    def SetValues(self, values):
+        """
+        Overwrite the contents of the series.
+
+        If the values do not fit in a ring buffer row, the series is moved into its own
+        (ordinary) array, and is held in full.
+        :param values: list
+        :return: None
+        """
+        values = array('d', values)
+        if len(values) > self.Capacity:
+            self._Reserve(len(values))
+        self.Data[self.Offset:self.Offset + len(values)] = values
+        self.Length = len(values)
+
+    def Truncate(self, length):
+        """
+        Drop the points after the first length points.
+        :param length: int
+        :return: None
+        """
+        self.Length = min(self.Length, length)
+
+    def SetConstant(self, val, length):
+        """
+        Fill the series with a constant value, without building an intermediate list.
+        :param val: float
+        :param length: int
+        :return: None
+        """
+        if length > self.Capacity:
+            self._Reserve(length)
+        self.Data[self.Offset:self.Offset + length] = array('d', [val]) * length
+        self.Length = length
+
+    def _Reserve(self, capacity):
+        """
+        Move the series into its own array, with room for capacity points.
+        :param capacity: int
+        :return: None
+        """
+        new_data = array('d', [0.]) * capacity
+        new_data[0:self.Length] = array('d', self.tolist())
+        self.Data = new_data
+        self.Offset = 0
+        self.Capacity = capacity
+        self.IsRing = False
+
+
+class ConstantTimeSeriesView(object):
+    """
+    A time series with the same value in every period, held as a single float.
+
+    ArrayTimeSeriesHolder uses these for constants (SetConstant()) if it only holds a
+    window of recent points, so that constants do not use memory in proportion to
+    the number of periods. All periods can be read; the value cannot be changed.
+
+    >>> obj = ArrayTimeSeriesHolder('k', ['x'], 3, window=2)
+    >>> obj.SetConstant('x', 2., 5)
+    >>> obj['x'][4], obj['x'].FirstIndex, len(obj['x'])
+    (2.0, 0, 5)
+    """
+    __slots__ = ('Value', 'Length')
+
+    def __init__(self, val, length):
+        self.Value = float(val)
+        self.Length = length
+
+    def __len__(self):
+        return self.Length
+
+    @property
+    def FirstIndex(self):
+        """
+        The first time period that is held (always 0).
+        :return: int
+        """
+        return 0
+
+    def _CheckIndex(self, i):
+        if i < 0:
+            i += self.Length
+        if i < 0 or i >= self.Length:
+            raise IndexError('Time series index out of range')
+
+    def _CheckValue(self, val):
+        if val != self.Value:
+            raise ValueError('Cannot change the value of a constant time series')
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.Value] * len(range(*i.indices(self.Length)))
+        self._CheckIndex(i)
+        return self.Value
+
+    def __setitem__(self, i, val):
+        self._CheckIndex(i)
+        self._CheckValue(val)
+
+    def __iter__(self):
+        for dummy in range(0, self.Length):
+            yield self.Value
+
+    def __eq__(self, other):
+        try:
+            return self.tolist() == list(other)
+        except TypeError:
+            return False
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self.tolist())
+
+    def tolist(self):
+        """
+        Copy of the series as a list of floats.
+        :return: list
+        """
+        return [self.Value] * self.Length
+
+    def append(self, val):
+        """
+        Extend the series by a period (the value has to equal the constant).
+        :param val: float
+        :return: None
+        """
+        self._CheckValue(val)
+        self.Length += 1
+
+    def Truncate(self, length):
+        """
+        Drop the points after the first length points.
+        :param length: int
+        :return: None
+        """
+        self.Length = min(self.Length, length)
+
+    def SetConstant(self, val, length):
+        """
+        Set the value and length of the series.
+        :param val: float
+        :param length: int
+        :return: None
+        """
+        self.Value = float(val)
+        self.Length = length
+
+
+class ArrayTimeSeriesHolder(TimeSeriesHolder):
+    """
+    TimeSeriesHolder that stores the series in a single preallocated block of floats,
+    instead of a list of Python floats per series.
+
+    The block has one row of length "length" for each name in series_names; the
+    dictionary values are TimeSeriesView objects pointing into the block. Series that
+    are not declared up front are given their own row when first assigned.
+
+    Assigning a list to a series copies the values into the row:
+
+    >>> obj = ArrayTimeSeriesHolder('k', ['k', 'x'], 3)
+    >>> obj['x'] = [1, 2]
+    >>> obj['x']
+    [1.0, 2.0]
+    >>> obj.SetConstant('k', 5., 3)
+    >>> obj['k'][0:2]
+    [5.0, 5.0]
+
+    If window is not None, the rows only hold the last "window" points (ring buffers).
+    Constants are held as a single value (ConstantTimeSeriesView). Series that are
+    assigned more than "window" points at once are still held in full.
+    """
+    def __init__(self, time_series, series_names=(), length=0, window=None):
+        TimeSeriesHolder.__init__(self, time_series)
+        if window is not None:
+            if window < 2:
+                raise ValueError('Time series window must hold at least 2 points')
+            length = window
+        self.Window = window
+        self.RowLength = length
+        self.Data = array('d', [0.]) * (len(series_names) * length)
+        self.FreeRows = {}
+        for i, name in enumerate(series_names):
+            self.FreeRows[name] = i * length
+
+    def _GetView(self, series_name):
+        """
+        Get the view for a series, creating it (with a row in the block if one was
+        reserved) if needed.
+        :param series_name: str
+        :return: TimeSeriesView
+        """
+        try:
+            return dict.__getitem__(self, series_name)
+        except KeyError:
+            pass
+        is_ring = self.Window is not None
+        if series_name in self.FreeRows:
+            view = TimeSeriesView(self.Data, self.FreeRows.pop(series_name), self.RowLength, is_ring)
+        else:
+            view = TimeSeriesView(array('d', [0.]) * self.RowLength, 0, self.RowLength, is_ring)
+        dict.__setitem__(self, series_name, view)
+        return view
+
+    def __setitem__(self, series_name, values):
+        if isinstance(dict.get(self, series_name), ConstantTimeSeriesView):
+            # No longer a constant; the series gets a row.
+            dict.__delitem__(self, series_name)
+        self._GetView(series_name).SetValues(values)
+
+    def SetConstant(self, series_name, val, length):
+        """
+        Set a series equal to a constant value over length periods.
+        :param series_name: str
+        :param val: float
+        :param length: int
+        :return: None
+        """
+        if self.Window is not None:
+            dict.__setitem__(self, series_name, ConstantTimeSeriesView(val, length))
+            return
+        self._GetView(series_name).SetConstant(val, length)
+
+    def Truncate(self, length):
+        """
+        Drop the points after the first length points of all series.
+        :param length: int
+        :return: None
+        """
+        for view in self.values():
+            view.Truncate(length)
+
+    def __deepcopy__(self, memo):
+        out = ArrayTimeSeriesHolder(self.TimeSeriesName)
+        for k, v in self.__dict__.items():
+            if k != 'Data':
+                out.__dict__[k] = copy.deepcopy(v, memo)
+        # Copy the block in one shot, then point new views at the copy.
+        out.Data = array('d', self.Data)
+        for series_name, view in self.items():
+            if isinstance(view, ConstantTimeSeriesView):
+                dict.__setitem__(out, series_name, ConstantTimeSeriesView(view.Value, view.Length))
+                continue
+            if view.Data is self.Data:
+                data = out.Data
+            else:
+                data = array('d', view.Data)
+            new_view = TimeSeriesView(data, view.Offset, view.Capacity, view.IsRing)
+            new_view.Length = view.Length
+            dict.__setitem__(out, series_name, new_view)
         return out
 
 
@@ -110,6 +556,121 @@ def is_local_variable(variable_name):
     return '__' not in variable_name
 
 
+# Regular expression for the tokens that appear in equations: names, numbers and
+# operators. Anything else (strings, comments, line breaks, non-ASCII names, ...) is
+# handed to the tokenize module.
+_FAST_TOKEN_RE = re.compile(r"""
+    [ \t\f]*
+    (?:
+      (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+     |(?P<number>(?:[0-9]+\.[0-9]*|\.[0-9]+)(?:[eE][-+]?[0-9]+)?[jJ]?
+                |[0-9]+[eE][-+]?[0-9]+[jJ]?
+                |(?:0+|[1-9][0-9]*)[jJ]?)
+     |(?P<op>\*\*=?|//=?|>>=?|<<=?|->|:=|\.\.\.|[-+*/%&|^@=<>!]=|[-+*/%&|^~@<>=()\[\]{},:;.])
+    )""", re.VERBOSE)
+
+# Tokens that do not contain any text (other than whitespace).
+_WHITESPACE_TOKENS = set([ENCODING, tokenize.NEWLINE, tokenize.NL, tokenize.ENDMARKER,
+                          tokenize.INDENT, tokenize.DEDENT])
+
+# Cache of tokenised strings (source string -> tuple of tokens). Cleared when full.
+TOKEN_CACHE_SIZE = 20000
+_token_cache = {}
+
+
+def _fast_tokenize(s):
+    """
+    Tokenise a one-line expression that only contains names, numbers and operators.
+    Returns None if the string contains anything else (or unbalanced brackets), in which
+    case the tokenize module has to be used.
+
+    >>> [tok for toknum, tok in _fast_tokenize('x=2.5*y[1]')]
+    ['x', '=', '2.5', '*', 'y', '[', '1', ']']
+    >>> _fast_tokenize('x = "text"') is None
+    True
+
+    :param s: str
+    :return: list
+    """
+    out = []
+    pos = 0
+    depth = 0
+    length = len(s)
+    match = _FAST_TOKEN_RE.match
+    while True:
+        m = match(s, pos)
+        if m is None:
+            break
+        kind = m.lastgroup
+        tok = m.group(kind)
+        pos = m.end()
+        if kind == 'name':
+            out.append((NAME, tok))
+        elif kind == 'number':
+            # Things like "1_000", "0x10" or "2abc" are left to tokenize.
+            if pos < length and (s[pos].isalnum() or s[pos] in '_.'):
+                return None
+            out.append((NUMBER, tok))
+        else:
+            if tok in '([{':
+                depth += 1
+            elif tok in ')]}':
+                depth -= 1
+                if depth < 0:
+                    return None
+            out.append((OP, tok))
+    if s[pos:].strip(' \t\f') or depth != 0:
+        return None
+    return out
+
+
+def _tokenize_slow(s):
+    if is_python_3:
+        g = tokenize.tokenize(BytesIO(s.encode('utf-8')).readline)  # tokenize the string
+    else:  # pragma: no cover   [Do my coverage on Python 3]
+        g = tokenize.generate_tokens(BytesIO(s.encode('utf-8')).readline)  # tokenize the string
+    return [(toknum, tokval) for toknum, tokval, _, _, _ in g if toknum != ENCODING]
+
+
+def _get_tokens(s):
+    """
+    Get the (token type, token string) pairs for a string, from the cache if possible.
+    :param s: str
+    :return: tuple
+    """
+    try:
+        return _token_cache[s]
+    except KeyError:
+        pass
+    tokens = _fast_tokenize(s)
+    if tokens is None:
+        tokens = _tokenize_slow(s)
+    tokens = tuple(tokens)
+    if len(_token_cache) >= TOKEN_CACHE_SIZE:
+        _token_cache.clear()
+    _token_cache[s] = tokens
+    return tokens
+
+
+def _untokenize(tokens):
+    """
+    Convert tokens back to a string, in the same format as tokenize.untokenize() (a
+    space after each name and number).
+    :param tokens: list
+    :return: str
+    """
+    out = []
+    for toknum, tokval in tokens:
+        if toknum == NAME or toknum == NUMBER:
+            out.append(tokval + ' ')
+        elif toknum == OP:
+            out.append(tokval)
+        else:
+            # Strings and other unusual tokens: let untokenize() deal with spacing.
+            return str(untokenize(tokens))
+    return ''.join(out)
+
+
 def list_tokens(s):
     """
     Return a list of all NAME tokens (which can be variables, or function names) in a string.
@@ -122,18 +683,24 @@ def list_tokens(s):
     :param s: str
     :return: list
     """
-    result = []
-    if is_python_3:
-        g = tokenize.tokenize(BytesIO(s.encode('utf-8')).readline)  # tokenize the string
-        for toknum, tokval, _, _, _ in g:
-            if toknum == NAME:  # find NAME tokens
-                result.append(tokval)
-    else:  # pragma: no cover   [Do my coverage on Python 3]
-        g = tokenize.generate_tokens(BytesIO(s.encode('utf-8')).readline)  # tokenize the string
-        for toknum, tokval, _, _, _ in g:
-            if toknum == NAME:  # find NAME tokens
-                result.append(tokval)
-    return result
+    return [tokval for toknum, tokval in _get_tokens(s) if toknum == NAME]
+
+
+def list_equation_tokens(s):
+    """
+    Split a string into a list of (token type, token string) pairs, as generated by the
+    Python tokenizer. The token strings (in order) make up the original string, less
+    whitespace.
+
+    >>> [tok for toknum, tok in list_equation_tokens('x = y+ 2*z')]
+    ['x', '=', 'y', '+', '2', '*', 'z']
+    >>> list_equation_tokens('x')[0] == (NAME, 'x')
+    True
+
+    :param s: str
+    :return: list
+    """
+    return [tok for tok in _get_tokens(s) if tok[0] not in _WHITESPACE_TOKENS]
 
 
 def replace_token(s, target, replacement):
@@ -164,23 +731,7 @@ def replace_token(s, target, replacement):
     :param replacement: str
     :return: str
     """
-    result = []
-    if is_python_3:
-        g = tokenize.tokenize(BytesIO(s.encode('utf-8')).readline)  # tokenize the string
-        for toknum, tokval, _, _, _ in g:
-            if toknum == NAME and tokval == target:  # replace NAME tokens
-                result.append((NAME, replacement))
-            else:
-                result.append((toknum, tokval))
-        return untokenize(result).decode('utf-8')
-    else:  # pragma: no cover   [Do my coverage on Python 3]
-        g = tokenize.generate_tokens(BytesIO(s.encode('utf-8')).readline)  # tokenize the string
-        for toknum, tokval, _, _, _ in g:
-            if toknum == NAME and tokval == target:  # replace NAME tokens
-                result.append((NAME, replacement))
-            else:
-                result.append((toknum, tokval))
-        return str(untokenize(result).decode('utf-8'))
+    return replace_token_from_lookup(s, {target: replacement})
 
 
 def replace_token_from_lookup(s, lookup):
@@ -195,22 +746,12 @@ def replace_token_from_lookup(s, lookup):
     :return: str
     """
     result = []
-    if is_python_3:
-        g = tokenize.tokenize(BytesIO(s.encode('utf-8')).readline)  # tokenize the string
-        for toknum, tokval, _, _, _ in g:
-            if toknum == NAME and tokval in lookup:  # replace NAME tokens
-                result.append((NAME, lookup[tokval]))
-            else:
-                result.append((toknum, tokval))
-        return untokenize(result).decode('utf-8')
-    else:  # pragma: no cover   [Do my coverage on Python 3]
-        g = tokenize.generate_tokens(BytesIO(s.encode('utf-8')).readline)  # tokenize the string
-        for toknum, tokval, _, _, _ in g:
-            if toknum == NAME and tokval in lookup:  # replace NAME tokens
-                result.append((NAME, lookup[tokval]))
-            else:
-                result.append((toknum, tokval))
-        return str(untokenize(result).decode('utf-8'))
+    for toknum, tokval in _get_tokens(s):
+        if toknum == NAME and tokval in lookup:  # replace NAME tokens
+            result.append((NAME, lookup[tokval]))
+        else:
+            result.append((toknum, tokval))
+    return _untokenize(result)
 
 
 def create_equation_from_terms(terms):
@@ -238,6 +779,39 @@ def create_equation_from_terms(terms):
     return eqn
 
 
+def create_parameter_equation(value):
+    """
+    Create the right hand side of a sector equation for a parameter. The value is
+    not rounded.
+
+    >>> create_parameter_equation(0.6)
+    'PARAMETER(0.6)'
+
+    :param value: float
+    :return: str
+    """
+    return 'PARAMETER({0})'.format(repr(float(value)))
+
+
+def get_parameter_value(rhs):
+    """
+    Get the value (as a string) from a parameter equation created by
+    create_parameter_equation(); returns None if rhs is not a parameter equation.
+
+    >>> get_parameter_value('PARAMETER (1e-05)')
+    '1e-05'
+    >>> get_parameter_value('x+1') is None
+    True
+
+    :param rhs: str
+    :return: str
+    """
+    rhs = rhs.replace(' ', '')
+    if not rhs.startswith('PARAMETER('):
+        return None
+    return rhs[len('PARAMETER('):-1]
+
+
 def get_invalid_variable_names():
     """
     Get a list of invalid variable names for use in sfc_model equations.
@@ -277,6 +851,83 @@ def get_invalid_tokens():
     return list(out)
 
 
+class BufferedLogWriter(object):
+    """
+    Wraps a log file handle, so that writes are buffered and the actual file writes
+    happen on a background thread.
+
+    Text is accumulated until buffer_size characters are pending, and then handed to
+    the writer thread. flush() blocks until everything written so far is on disk.
+    """
+    def __init__(self, handle, buffer_size=LOG_BUFFER_SIZE):
+        self.Handle = handle
+        self.BufferSize = buffer_size
+        self.Pending = []
+        self.PendingSize = 0
+        self.Error = None
+        self.Queue = queue.Queue()
+        self.Thread = threading.Thread(target=self._Run)
+        self.Thread.daemon = True
+        self.Thread.start()
+
+    def _Run(self):
+        while True:
+            txt = self.Queue.get()
+            try:
+                if txt is None:
+                    return
+                self.Handle.write(txt)
+            except Exception as e:  # pragma: no cover
+                self.Error = e
+            finally:
+                self.Queue.task_done()
+
+    def _CheckError(self):
+        if self.Error is not None:  # pragma: no cover
+            err = self.Error
+            self.Error = None
+            raise err
+
+    def write(self, txt):
+        self.Pending.append(txt)
+        self.PendingSize += len(txt)
+        if self.PendingSize >= self.BufferSize:
+            self._Send()
+
+    def _Send(self):
+        if len(self.Pending) > 0:
+            self.Queue.put(''.join(self.Pending))
+            self.Pending = []
+            self.PendingSize = 0
+
+    def flush(self):
+        """
+        Wait until all text has been written to the underlying handle.
+        :return: None
+        """
+        if self.Thread is None:
+            return
+        self._Send()
+        self.Queue.join()
+        if hasattr(self.Handle, 'flush'):
+            self.Handle.flush()
+        self._CheckError()
+
+    def close(self):
+        """
+        Flush, stop the writer thread, and close the underlying handle.
+        :return: None
+        """
+        if self.Thread is None:
+            return
+        self._Send()
+        self.Queue.put(None)
+        self.Thread.join()
+        self.Thread = None
+        self.Handle.close()
+        self._CheckError()
+
+
 class Logger(object):
     """
     Class to handle logging.
@@ -294,11 +945,20 @@ class Logger(object):
     'log' (main log).
 
     This allows us to centralise logging and file handling at a high level.
+
+    If building the message is expensive, pass a function that returns the text;
+    it is only called if the message is actually written:
+
+    Logger(solver.GenerateCSVtext, log='steadystate_0')
+
+    Files opened by the Logger are written to by a background thread (see
+    BufferedLogWriter), unless Logger.use_background_writer is False.
     """
 
     # Have a single file handle for all Logger objects
     log_file_handles = {}
     priority_cutoff = 10
+    use_background_writer = True
 
     def __init__(self, txt, log='log', priority=1, data_to_format=None, endline=True):
         """
@@ -322,19 +982,22 @@ class Logger(object):
         To start logging, need to use Logger.register_log() call. If
         a log is not registered, the Logger() call will do nothing.
 
+        The txt may be a function (with no arguments) that returns the message; it is
+        not called if the log is not registered or the priority is too low. Likewise,
+        data_to_format is only applied if the message is written.
+
         :param txt: str
         :param log: str
         :param priority: int
         :param data_to_format: tuple
         :param endline: bool
         """
-        try:
-            f = Logger.get_handle(log)
-        except KeyError:
-            # Was not registered, so just eat the message.
-            return
-        if priority > Logger.priority_cutoff:
+        if priority > Logger.priority_cutoff or log not in Logger.log_file_handles:
+            # Was not registered (or too low priority), so just eat the message.
             return
+        f = Logger.get_handle(log)
+        if callable(txt):
+            txt = txt()
         if data_to_format is not None:
             txt = txt.format(*data_to_format)
         if priority < 1:
@@ -351,6 +1014,18 @@ class Logger(object):
             txt += '\n'
         f.write(txt)
 
+    @staticmethod
+    def is_enabled(log='log', priority=1):
+        """
+        Would a message to the log with this priority be written? Use this to skip
+        work that only produces log output.
+
+        :param log: str
+        :param priority: int
+        :return: bool
+        """
+        return priority <= Logger.priority_cutoff and log in Logger.log_file_handles
+
     @staticmethod
     def register_log(fname, log='log'):
         """
@@ -399,9 +1074,21 @@ class Logger(object):
         f = Logger.log_file_handles[log]
         if type(f) is str:
             f = open(f, 'w')
+            if Logger.use_background_writer:
+                f = BufferedLogWriter(f)
             Logger.log_file_handles[log] = f
         return f
 
+    @staticmethod
+    def flush():
+        """
+        Flush all open logs.
+        :return: None
+        """
+        for f in Logger.log_file_handles.values():
+            if type(f) is not str and hasattr(f, 'flush'):
+                f.flush()
+
     @staticmethod
     def cleanup():
         for k, f in Logger.log_file_handles.items():
@@ -411,6 +1098,10 @@ class Logger(object):
         Logger.log_file_handles = {}
 
 
+# Scripts do not always call Logger.cleanup(); make sure buffered log text is written.
+atexit.register(Logger.flush)
+
+
 def get_file_base(fullfile):
     """
     Get the base name of a file
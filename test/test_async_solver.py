@@ -0,0 +1,84 @@
+import asyncio
+from unittest import TestCase
+
+from sfc_models.async_solver import solve_async, solve
+from sfc_models.equation_solver import EquationSolver
+
+
+def get_solver(max_time=5):
+    return EquationSolver("""
+      x = a*t + LAG_x
+      LAG_x = x(k-1)
+      # Parameters
+      a = 0.5
+      exogenous
+      t = [1.]*200
+      MaxTime={0}""".format(max_time))
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+class TestAsyncSolver(TestCase):
+    def test_solve_async(self):
+        obj = get_solver()
+
+        async def collect():
+            return [res async for res in solve_async(obj, chunk_size=2)]
+
+        out = run(collect())
+        self.assertEqual([1, 2, 3, 4, 5], [x['step'] for x in out])
+        self.assertEqual([.5, 1., 1.5, 2., 2.5], [x['values']['x'] for x in out])
+
+    def test_solve_params(self):
+        obj = get_solver()
+        self.assertEqual(5, run(solve(obj, params={'a': 1.})))
+        self.assertEqual([0., 1., 2., 3., 4., 5.], obj.TimeSeries['x'])
+
+    def test_stop(self):
+        obj = get_solver(max_time=50)
+
+        async def stop_early():
+            agen = solve_async(obj, chunk_size=3)
+            steps = []
+            async for res in agen:
+                steps.append(res['step'])
+                if res['step'] == 4:
+                    break
+            await agen.aclose()
+            return steps
+
+        self.assertEqual([1, 2, 3, 4], run(stop_early()))
+        # The chunk that was running is finished, and then the solution stops.
+        self.assertEqual(6, len(obj.IterationCounts))
+
+    def test_cancel(self):
+        obj = get_solver(max_time=100)
+
+        async def cancel():
+            async def consume():
+                async for dummy in solve_async(obj, chunk_size=1):
+                    await asyncio.sleep(0)
+            task = asyncio.ensure_future(consume())
+            await asyncio.sleep(0.01)
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                return True
+            return False
+
+        self.assertTrue(run(cancel()))
+        self.assertLess(len(obj.IterationCounts), 101)
+
+    def test_bad_chunk(self):
+        async def bad():
+            async for dummy in solve_async(get_solver(), chunk_size=0):
+                pass
+        with self.assertRaises(ValueError):
+            run(bad())
@@ -0,0 +1,107 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from array import array
+from unittest import TestCase
+
+import sfc_models.bundle as bundle
+from sfc_models.bundle import create_bundle, load_bundle_contents, save_bundle, load_bundle
+from sfc_models.equation_solver import EquationSolver
+import sfc_models.gl_book.chapter3
+
+
+def double(x):
+    return 2. * x
+
+
+def get_solver():
+    obj = EquationSolver("""
+      x = a*t + LAG_x
+      LAG_x = x(k-1)
+      y = double(x) + z
+      # Parameters
+      a = 0.5
+      exogenous
+      t = [1.]*10
+      z = EXTERNAL
+      MaxTime=3""")
+    obj.AddFunction('double', double)
+    obj.AddExogenousSource('z', array('d', [0., 1., 2., 3.]))
+    obj.MaxIterations = 50
+    return obj
+
+
+class TestBundle(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        obj = get_solver()
+        obj.SolveEquation()
+        new = load_bundle_contents(create_bundle(obj, {'x': 'The x'}))
+        self.assertEqual(50, new.MaxIterations)
+        self.assertEqual({'x': 'The x'}, new.Descriptions)
+        self.assertEqual({}, new.ExogenousSources)
+        self.assertEqual(obj.CompiledEquations.keys(), new.CompiledEquations.keys())
+        new.Solve(params={'a': 1.})
+        self.assertEqual([0., 1., 2., 3.], new.TimeSeries['x'])
+        self.assertEqual([0., 3., 6., 9.], new.TimeSeries['y'])
+        new.Solve()
+        self.assertEqual(obj.TimeSeries['y'], new.TimeSeries['y'])
+
+    def test_code_version(self):
+        contents = create_bundle(get_solver())
+        contents['code_version'] = (1, 0, '')
+        new = load_bundle_contents(contents)
+        self.assertEqual({}, new.CompiledEquations)
+        new.SolveEquation()
+        self.assertEqual([0., .5, 1., 1.5], new.TimeSeries['x'])
+
+    def test_bad_function(self):
+        obj = get_solver()
+        obj.AddFunction('double', lambda x: 2. * x)
+        with self.assertRaises(ValueError):
+            create_bundle(obj)
+
+    def test_bad_format(self):
+        with self.assertRaises(ValueError):
+            load_bundle_contents({'format': 'foo'})
+        contents = create_bundle(get_solver())
+        contents['version'] = bundle.FORMAT_VERSION + 1
+        with self.assertRaises(ValueError):
+            load_bundle_contents(contents)
+
+    def test_file(self):
+        fname = os.path.join(self.directory, 'test.bundle')
+        save_bundle(get_solver(), fname)
+        new = load_bundle(fname)
+        new.SolveEquation()
+        self.assertEqual([0., 1., 2., 3.], new.TimeSeries['z'])
+
+    def test_model(self):
+        fname = os.path.join(self.directory, 'sim.bundle')
+        mod = sfc_models.gl_book.chapter3.SIM('C', use_book_exogenous=True).build_model()
+        mod.MaxTime = 10
+        mod.SaveBundle(fname)
+        mod.main()
+        # Load in a new process; the sector classes are not imported.
+        code = """
+import sys
+from sfc_models.bundle import load_bundle
+solver = load_bundle(sys.argv[1])
+solver.SolveEquation()
+assert 'sfc_models.sector' not in sys.modules
+assert 'sfc_models.models' not in sys.modules
+print(repr(solver.TimeSeries['GOOD__SUP_GOOD'][10]))
+"""
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join([root] + [x for x in [env.get('PYTHONPATH')] if x])
+        out = subprocess.check_output([sys.executable, '-c', code, fname], env=env)
+        self.assertAlmostEqual(mod.GetTimeSeries('GOOD__SUP_GOOD')[10], float(out.decode('utf-8').strip()))
+        self.assertIn('GOOD__SUP_GOOD', load_bundle(fname).Descriptions)
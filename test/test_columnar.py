@@ -0,0 +1,130 @@
+import doctest
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import sfc_models.columnar as columnar
+from sfc_models.columnar import ColumnarResults, ColumnarSink, write_columnar
+from sfc_models.equation_solver import EquationSolver
+from sfc_models.models import Model, Country
+from sfc_models.utils import TimeSeriesHolder
+from sfc_models.sector_definitions import ConsolidatedGovernment
+
+
+def load_tests(loader, tests, ignore):
+    """
+    Load doctests, so unittest discovery can find them.
+    """
+    tests.addTests(doctest.DocTestSuite(columnar))
+    return tests
+
+
+def get_solver():
+    obj = EquationSolver()
+    obj.ParseString("""
+    x = t
+    z = x + 1
+    exogenous
+    t = [10., 11., 12., 13.]
+    MaxTime = 3""")
+    return obj
+
+
+class TestColumnar(TestCase):
+    def setUp(self):
+        self.Dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.Dir)
+
+    def test_round_trip(self):
+        obj = get_solver()
+        obj.SolveEquation()
+        obj.WriteColumnar(self.Dir, {'x': 'Variable x'})
+        with ColumnarResults(self.Dir) as res:
+            self.assertEqual(['k', 't', 'x', 'z'], res.keys())
+            self.assertEqual([11., 12., 13., 14.], res.GetSeries('z'))
+            self.assertEqual([12., 13.], res.GetSeries('z', 1, 3))
+            self.assertEqual([], res.GetSeries('z', 5))
+            self.assertEqual('Variable x', res.GetDescription('x'))
+            self.assertEqual('', res.GetDescription('z'))
+            self.assertTrue('x' in res)
+            self.assertFalse('y' in res)
+            with self.assertRaises(KeyError):
+                res.GetSeries('y')
+            holder = res.GetTimeSeriesHolder()
+            self.assertEqual(obj.TimeSeries['t'], holder['t'])
+            view = res['x']
+            self.assertEqual(4, len(view))
+            self.assertEqual(13., view[3])
+            del view
+
+    def test_lazy(self):
+        holder = TimeSeriesHolder('k')
+        holder['k'] = [0., 1.]
+        holder['a'] = [1., 2.]
+        holder['b'] = [3., 4.]
+        write_columnar(self.Dir, holder)
+        with ColumnarResults(self.Dir) as res:
+            self.assertEqual([3., 4.], res.GetSeries('b'))
+            self.assertEqual(['b'], list(res.Maps.keys()))
+
+    def test_window(self):
+        obj = get_solver()
+        obj.ParameterMemoryWindow = 2
+        obj.SolveEquation()
+        with self.assertRaises(ValueError):
+            obj.WriteColumnar(self.Dir)
+        self.assertFalse(os.path.exists(os.path.join(self.Dir, columnar.INDEX_FILE_NAME)))
+        # Nothing was overwritten yet.
+        obj = get_solver()
+        obj.ParameterMemoryWindow = 4
+        obj.SolveEquation()
+        obj.WriteColumnar(self.Dir)
+        with ColumnarResults(self.Dir) as res:
+            self.assertEqual([11., 12., 13., 14.], res.GetSeries('z'))
+
+    def test_bad_directory(self):
+        with open(os.path.join(self.Dir, columnar.INDEX_FILE_NAME), 'w') as f:
+            json.dump({'format': 'other'}, f)
+        with self.assertRaises(ValueError):
+            ColumnarResults(self.Dir)
+
+    def test_sink(self):
+        obj = get_solver()
+        sink = ColumnarSink(self.Dir, chunk_size=3)
+        obj.AddResultSink(sink)
+        obj.SolveEquation()
+        with ColumnarResults(self.Dir) as res:
+            self.assertEqual(4, res.Length)
+            for name in obj.TimeSeries:
+                self.assertEqual(obj.TimeSeries[name], res.GetSeries(name))
+
+    def test_sink_partial(self):
+        sink = ColumnarSink(self.Dir, chunk_size=2)
+        sink.Open(['k', 'x'])
+        sink.WriteStep(0, [0., 1.])
+        sink.WriteStep(1, [1., 2.])
+        sink.WriteStep(2, [2., 3.])
+        # Only the first chunk has been written.
+        with ColumnarResults(self.Dir) as res:
+            self.assertEqual([1., 2.], res.GetSeries('x'))
+        sink.Close()
+        with ColumnarResults(self.Dir) as res:
+            self.assertEqual([1., 2., 3.], res.GetSeries('x'))
+
+    def test_model(self):
+        mod = Model()
+        can = Country(mod, 'CA')
+        ConsolidatedGovernment(can, 'GOV')
+        mod.EquationSolver.MaxTime = 1
+        mod.main()
+        mod.WriteColumnar(self.Dir)
+        with ColumnarResults(self.Dir) as res:
+            self.assertEqual('GOV', res.GetSector('GOV__F'))
+            self.assertEqual('', res.GetSector('t'))
+            self.assertEqual(mod.FinalEquationBlock['GOV__F'].Description,
+                             res.GetDescription('GOV__F'))
+            self.assertNotEqual('', res.GetDescription('GOV__F'))
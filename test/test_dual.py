@@ -0,0 +1,125 @@
+import doctest
+import math
+from unittest import TestCase
+
+import sfc_models.dual as dual
+import warnings
+from sfc_models.dual import Dual, DualError, MATH_FUNCTIONS, get_value, get_derivatives, get_distance
+import sfc_models.gl_book.chapter3
+
+
+def load_tests(loader, tests, ignore):
+    """
+    Load doctests, so unittest discovery can find them.
+    """
+    tests.addTests(doctest.DocTestSuite(dual))
+    return tests
+
+
+class TestDual(TestCase):
+    def check(self, value, deriv, x):
+        self.assertAlmostEqual(value, x.Value)
+        self.assertEqual(len(deriv), len(x.Deriv))
+        for a, b in zip(deriv, x.Deriv):
+            self.assertAlmostEqual(a, b)
+
+    def test_arithmetic(self):
+        x = Dual(2., (1., 0.))
+        y = Dual(4., (0., 1.))
+        self.check(6., (1., 1.), x + y)
+        self.check(3., (1., 0.), 1 + x)
+        self.check(-2., (1., -1.), x - y)
+        self.check(-1., (-1., 0.), 1 - x)
+        self.check(8., (4., 2.), x * y)
+        self.check(.5, (.25, -.125), x / y)
+        self.check(.5, (-.25, 0.), 1. / x)
+        self.check(-2., (-1., 0.), -x)
+        self.check(2., (1., 0.), abs(-x))
+        self.check(4., (4., 0.), x ** 2)
+        self.check(16., (16. * 2., 16. * math.log(2.)), x ** y)
+        self.check(4., (4. * math.log(2.), 0.), 2. ** x)
+
+    def test_rounding(self):
+        x = Dual(7.5, (1., 0.))
+        y = Dual(2., (0., 1.))
+        self.check(3., (0., 0.), x // y)
+        self.check(3., (0., 0.), x // 2.)
+        self.check(0., (0., 0.), 1. // x)
+        self.check(1.5, (1., -3.), x % y)
+        self.check(1.5, (1., 0.), x % 2.)
+        self.check(1., (0., -4.), 9. % y)
+        self.check(8., (0., 0.), round(x))
+        self.check(7.5, (0., 0.), round(x, 1))
+        self.assertEqual(7, int(x))
+        for name in ('floor', 'ceil', 'trunc'):
+            self.check(getattr(math, name)(7.5), (0., 0.), MATH_FUNCTIONS[name](x))
+
+    def test_float(self):
+        x = Dual(.5, (1.,))
+        with self.assertRaises(DualError):
+            float(x)
+        # Unsupported math functions convert to float.
+        with self.assertRaises(DualError):
+            math.erf(x)
+        self.assertIs(x, MATH_FUNCTIONS['float'](x))
+        self.assertEqual(2., MATH_FUNCTIONS['float'](2))
+
+    def test_wrap_function(self):
+        func = dual.wrap_function('f', lambda x: get_value(x) * 2.)
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter('always')
+            self.assertEqual(4., func(2.))
+            self.assertEqual(0, len(w))
+            self.assertEqual(4., func(Dual(2., (1.,))))
+            self.assertEqual(1, len(w))
+            self.assertIn('f()', str(w[0].message))
+
+    def test_comparison(self):
+        x = Dual(2., (1.,))
+        self.assertTrue(x < 3.)
+        self.assertTrue(x == 2.)
+        self.assertFalse(Dual(0., (1.,)))
+        self.check(2., (1.,), max(x, 1.))
+        self.assertEqual(1., min(x, 1.))
+        with self.assertRaises(TypeError):
+            hash(x)
+
+    def test_functions(self):
+        x = Dual(.5, (1.,))
+        for name in ('sqrt', 'exp', 'log', 'log10', 'sin', 'cos', 'tan', 'atan', 'tanh', 'asin', 'acos',
+                     'sinh', 'cosh', 'log1p', 'expm1', 'degrees', 'radians'):
+            func = getattr(math, name)
+            out = MATH_FUNCTIONS[name](x)
+            self.assertAlmostEqual(func(.5), out.Value)
+            diff = (func(.5 + 1e-7) - func(.5)) / 1e-7
+            self.assertAlmostEqual(diff, out.Deriv[0], places=5)
+            # Plain numbers pass through.
+            self.assertEqual(func(.5), MATH_FUNCTIONS[name](.5))
+        self.check(math.log(.5, 2.), (1. / (.5 * math.log(2.)),), MATH_FUNCTIONS['log'](x, 2.))
+        self.check(.25, (1.,), MATH_FUNCTIONS['pow'](x, 2))
+
+    def test_helpers(self):
+        self.assertEqual(1., get_value(1))
+        self.assertEqual((1., 2.), get_derivatives(Dual(0., (1., 2.)), 2))
+        self.assertEqual(0.5, get_distance(1., 1.5))
+        self.assertEqual(3., get_distance(1., Dual(1., (1., 2.))))
+
+
+class TestSensitivity(TestCase):
+    def test_SIM(self):
+        # Compare the sensitivities to finite differences.
+        mod = sfc_models.gl_book.chapter3.SIM('C', use_book_exogenous=True).build_model()
+        mod.MaxTime = 5
+        mod.main()
+        solver = mod.EquationSolver
+        solver.SensitivityVariables = ['HH__AlphaIncome', 'GOV__DEM_GOOD']
+        solver.SolveEquation()
+        base = list(solver.TimeSeries['GOOD__SUP_GOOD'])
+        sens = solver.Sensitivities
+        solver.SensitivityVariables = []
+        solver.Solve(params={'HH__AlphaIncome': .601})
+        for k in range(0, 6):
+            diff = (solver.TimeSeries['GOOD__SUP_GOOD'][k] - base[k]) / .001
+            self.assertAlmostEqual(1., (diff + 1.) / (sens['HH__AlphaIncome']['GOOD__SUP_GOOD'][k] + 1.), places=1)
+        # Multiplier for government spending: 1/(1 - alpha_income*(1-tax)) in the first period.
+        self.assertAlmostEqual(1. / (1. - .6 * .8), sens['GOV__DEM_GOOD']['GOOD__SUP_GOOD'][1], places=4)
@@ -1,3 +1,5 @@
+import copy
+import pickle
 from unittest import TestCase
 import doctest
 
@@ -100,6 +102,37 @@ class TestTerm(TestCase):
         # with self.assertRaises(NotImplementedError):
         #     str(t)
 
+    def test_cache(self):
+        sfc_models.equation._term_cache.clear()
+        t = Term(' - x')
+        self.assertEqual((-1.0, 'x'), sfc_models.equation._term_cache['-x'])
+        t2 = Term('-x')
+        self.assertEqual('-x', str(t2))
+        # Terms do not share state through the cache.
+        t2.Constant = 2.
+        self.assertEqual(-1.0, Term('-x').Constant)
+        # Failures are cached, and raise every time.
+        for i in range(0, 2):
+            with self.assertRaises(NotImplementedError):
+                Term('f(x)')
+        self.assertIn('f(x)', sfc_models.equation._term_cache)
+        with self.assertRaises(LogicError):
+            Term('x+y')
+        with self.assertRaises(LogicError):
+            Term('x+ y')
+
+    def test_cache_size(self):
+        sfc_models.equation._term_cache.clear()
+        old_size = sfc_models.equation.TERM_CACHE_SIZE
+        sfc_models.equation.TERM_CACHE_SIZE = 2
+        try:
+            Term('x')
+            Term('y')
+            Term('z')
+            self.assertEqual(['z'], list(sfc_models.equation._term_cache.keys()))
+        finally:
+            sfc_models.equation.TERM_CACHE_SIZE = old_size
+
 
 class TestEquation(TestCase):
     def test_str_1(self):
@@ -156,6 +189,64 @@ class TestEquation(TestCase):
         # There's a syntax error, but ParseString eats it.
         self.assertEqual('(y)+1', str(eq.TermList[0]))
 
+    def test_rhs_cache(self):
+        eq = Equation('x', 'desc', 'y')
+        self.assertEqual('y', eq.RHS())
+        # Changes to a term reset the cached string.
+        eq.TermList[0].Constant = -1.
+        self.assertEqual('-y', eq.RHS())
+        eq.ReplaceTokensFromLookup({'y': 'z'})
+        self.assertEqual('-z', eq.RHS().strip())
+        eq.TermList[0].Constant = 0.
+        self.assertEqual('0.0', eq.RHS())
+        eq.TermList = [Term('w', is_blob=True)]
+        self.assertEqual('w', eq.RHS())
+        # Reading the terms does not reset the cache.
+        self.assertEqual(1, len(eq.TermList))
+        self.assertIsNotNone(eq._RHS)
+        # Changes to the list in place reset the cache.
+        eq.TermList.append(Term('+v'))
+        self.assertEqual('w+v', eq.RHS())
+        # Terms added in place are owned by the equation.
+        eq.TermList[1].Constant = -1.
+        self.assertEqual('w-v', eq.RHS())
+        eq.TermList[1] = Term('+u')
+        self.assertEqual('w+u', eq.RHS())
+        del eq.TermList[0]
+        self.assertEqual('u', eq.RHS())
+        eq.TermList += [Term('-v')]
+        self.assertEqual('u-v', eq.RHS())
+        # The term index follows the list.
+        eq.AddTerm('v')
+        self.assertEqual('u', eq.RHS())
+
+    def test_copy(self):
+        eq = Equation('x', 'desc', 'y')
+        eq.AddTerm('z')
+        for out in (copy.deepcopy(eq), pickle.loads(pickle.dumps(eq, 2))):
+            self.assertEqual('y+z', out.RHS())
+            out.TermList.append(Term('w'))
+            self.assertEqual('y+z+w', out.RHS())
+            self.assertIs(out, out.TermList[2].Owner)
+            self.assertEqual('y+z', eq.RHS())
+
+    def test_term_index(self):
+        eq = Equation('x', 'desc', 'y')
+        eq.AddTerm('-z')
+        eq.TermList[0].Term = 'w'
+        # The index follows the renamed term.
+        eq.AddTerm('w')
+        eq.AddTerm('y')
+        self.assertEqual('2.0*w-z+y', eq.RHS())
+        self.assertEqual(3, len(eq.TermList))
+
+    def test_slots(self):
+        eq = Equation('x', 'desc', 'y')
+        with self.assertRaises(AttributeError):
+            eq.Foo = 1
+        with self.assertRaises(AttributeError):
+            eq.TermList[0].Foo = 1
+
 class TestEquationBlock(TestCase):
     def test_access(self):
         block = EquationBlock()
@@ -171,3 +262,16 @@ class TestEquationBlock(TestCase):
         block.AddEquation(Equation('a'))
         # Always sorted
         self.assertEqual(['a', 'x'], block.GetEquationList())
+        out = block.GetEquationList()
+        out.append('z')
+        block.AddEquation(Equation('b'))
+        self.assertEqual(['a', 'b', 'x'], block.GetEquationList())
+        block.Equations['c'] = Equation('c')
+        self.assertEqual(['a', 'b', 'c', 'x'], block.GetEquationList())
+        # Reading the dict does not reset the cache.
+        self.assertIn('c', block.Equations)
+        self.assertIsNotNone(block._SortedKeys)
+        del block.Equations['a']
+        self.assertEqual(['b', 'c', 'x'], block.GetEquationList())
+        block.Equations.pop('b')
+        self.assertEqual(['c', 'x'], block.GetEquationList())
@@ -1,6 +1,8 @@
 from unittest import TestCase
 import warnings
 import math
+import time
+from array import array
 import sys
 
 from sfc_models.equation_solver import EquationSolver, ConvergenceError, NoEquilibriumError
@@ -546,3 +548,300 @@ class TestEquationSolver(TestCase):
         # Note that equation does not hold at t=0
         self.assertEqual([0., 100.], obj.TimeSeries['z'])
         obj.SolveStep(2)
+
+    def test_Parameters(self):
+        obj = EquationSolver()
+        obj.ParseString("""
+          x = a*t + LAG_x
+          LAG_x = x(k-1)
+          y = 2*x
+          # Parameters
+          a = 0.5
+          MaxTime=3""")
+        self.assertEqual([('a', '0.5')], obj.Parser.Parameters)
+        self.assertEqual({'a': 0.5}, obj.ParameterValues)
+        obj.SolveEquation()
+        self.assertEqual([0., .5, 1.5, 3.], obj.TimeSeries['x'])
+        self.assertEqual([.5, .5, .5, .5], obj.TimeSeries['a'])
+        self.assertEqual(3, len(obj.IterationCounts))
+        num_compiled = len(obj.CompiledEquations)
+        # The equations are not parsed or compiled again.
+        parser = obj.Parser
+        obj.Solve(params={'a': 1.})
+        self.assertIs(parser, obj.Parser)
+        self.assertEqual(num_compiled, len(obj.CompiledEquations))
+        self.assertEqual([0., 1., 3., 6.], obj.TimeSeries['x'])
+        self.assertEqual([0., 2., 6., 12.], obj.TimeSeries['y'])
+        # Overrides do not persist.
+        obj.Solve()
+        self.assertEqual([0., .5, 1.5, 3.], obj.TimeSeries['x'])
+        with self.assertRaises(KeyError):
+            obj.Solve(params={'x': 1.})
+
+    def test_Solve_repeated(self):
+        obj = EquationSolver()
+        obj.ParseString("""
+          x = a*t
+          # Parameters
+          a = 0.5
+          MaxTime=3""")
+        obj.Solve()
+        num_exogenous = len(obj.Parser.Exogenous)
+        for a in (1., 2., 3.):
+            obj.Solve(params={'a': a})
+            self.assertEqual(num_exogenous, len(obj.Parser.Exogenous))
+        self.assertEqual([0., 3., 6., 9.], obj.TimeSeries['x'])
+        self.assertEqual([0., 1., 2., 3.], obj.TimeSeries['k'])
+
+    def test_LastSolveTime(self):
+        obj = EquationSolver("""
+          x = t
+          MaxTime=3""")
+        self.assertIsNone(obj.LastSolveTime)
+        gen = obj.IterSolve()
+        next(gen)
+        solve_time = obj.LastSolveTime
+        self.assertTrue(solve_time >= 0.)
+        # Time spent between periods is not counted.
+        time.sleep(.05)
+        for dummy in gen:
+            pass
+        self.assertTrue(solve_time <= obj.LastSolveTime < solve_time + .05)
+
+    def test_ExogenousSource(self):
+        obj = EquationSolver()
+        obj.ParseString("""
+          x = a + b
+          exogenous
+          a = EXTERNAL
+          b = EXTERNAL
+          MaxTime=3""")
+        a = array('d', [1., 2., 3., 4., 5.])
+        obj.AddExogenousSource('a', a)
+        obj.AddExogenousSource('b', lambda k: 10. * k)
+        obj.SolveEquation()
+        self.assertEqual([1., 2., 3., 4.], obj.TimeSeries['a'])
+        self.assertEqual([1., 12., 23., 34.], obj.TimeSeries['x'])
+        # The source is not copied.
+        a[2] = 0.
+        obj.SolveEquation()
+        self.assertEqual([1., 12., 20., 34.], obj.TimeSeries['x'])
+
+    def test_ExogenousSource_short(self):
+        obj = EquationSolver()
+        obj.ParseString("""
+          x = a
+          exogenous
+          a = EXTERNAL
+          MaxTime=3""")
+        obj.AddExogenousSource('a', array('d', [1., 2.]))
+        with self.assertRaises(ValueError):
+            obj.SolveEquation()
+
+    def test_Parameters_steady_state(self):
+        obj = EquationSolver("""
+          x = .5*a + .5*LAG_x
+          LAG_x = x(k-1)
+          # Parameters
+          a = 2.
+          MaxTime=3""")
+        obj.ParameterSolveInitialSteadyState = True
+        obj.ParameterInitialSteadyStateMaxTime = 20
+        obj.SolveEquation()
+        steady = obj.TimeSeriesInitialSteadyState
+        self.assertEqual(21, len(steady['x']))
+        self.assertEqual(21, len(steady['a']))
+        self.assertEqual(22, len(obj.TimeSeriesInitialSteadyState.GenerateCSVtext().split('\n')) - 1)
+        self.assertAlmostEqual(2., obj.TimeSeries['x'][0], places=3)
+
+    def test_ExogenousSource_steady_state(self):
+        obj = EquationSolver()
+        obj.ParseString("""
+          x = .5*a + .5*LAG_x
+          LAG_x = x(k-1)
+          exogenous
+          a = EXTERNAL
+          MaxTime=3""")
+        obj.AddExogenousSource('a', lambda k: 2.)
+        obj.ParameterSolveInitialSteadyState = True
+        obj.SolveEquation()
+        self.assertAlmostEqual(2., obj.TimeSeries['x'][0], places=3)
+        self.assertIn('a', obj.ExogenousSources)
+
+    def test_Parameters_bad_value(self):
+        obj = EquationSolver()
+        with self.assertRaises(ValueError):
+            obj.ParseString("""
+              x = a*t
+              # Parameters
+              a = t""")
+
+    def test_Sensitivities(self):
+        eqns = """
+          x = a*t + b*LAG_x
+          LAG_x = x(k-1)
+          y = 2*x
+          # Parameters
+          a = 0.5
+          b = 0.8
+          exogenous
+          t = [1., 2., 3., 4.]
+          MaxTime=3"""
+        obj = EquationSolver(eqns)
+        obj.SensitivityVariables = ['a', 't']
+        obj.SolveEquation()
+        # Values are not affected.
+        self.assertAlmostEqual(3.84, obj.TimeSeries['x'][3], places=4)
+        self.assertEqual(3, len(obj.IterationCounts))
+        expected_a = [0., 2., 4.6, 7.68]
+        for k in range(0, 4):
+            self.assertAlmostEqual(expected_a[k], obj.Sensitivities['a']['x'][k], places=4)
+            self.assertAlmostEqual(2. * expected_a[k], obj.Sensitivities['a']['y'][k], places=4)
+        expected = [0., .5, .9, 1.22]
+        for k in range(0, 4):
+            self.assertAlmostEqual(expected[k], obj.Sensitivities['t']['x'][k], places=4)
+        self.assertEqual([1., 1., 1., 1.], obj.Sensitivities['t']['t'])
+        self.assertEqual([0., 0., 0., 0.], obj.Sensitivities['t']['a'])
+        # Compare to a finite difference.
+        base = list(obj.TimeSeries['y'])
+        obj.SensitivityVariables = []
+        obj.Solve(params={'a': 0.5001})
+        self.assertEqual({}, obj.Sensitivities)
+        for k in range(0, 4):
+            diff = (obj.TimeSeries['y'][k] - base[k]) / .0001
+            self.assertAlmostEqual(2. * expected_a[k], diff, places=3)
+
+    def test_Sensitivities_bad(self):
+        obj = EquationSolver("""
+          x = a*t
+          # Parameters
+          a = 0.5
+          MaxTime=3""")
+        obj.SensitivityVariables = ['x']
+        with self.assertRaises(KeyError):
+            obj.SolveEquation()
+
+    def test_Sensitivities_functions(self):
+        obj = EquationSolver("""
+          x = float(a)*t + (a*t) % 1. + asin(a/t)
+          y = f(x)
+          # Parameters
+          a = 0.5
+          MaxTime=2""")
+        obj.AddFunction('f', lambda z: 2. * z)
+        obj.SensitivityVariables = ['a']
+        obj.SolveEquation()
+        expected = 2. + 2. + 1. / math.sqrt(1. - .25 ** 2) / 2.
+        self.assertAlmostEqual(expected, obj.Sensitivities['a']['x'][2])
+        self.assertAlmostEqual(2. * expected, obj.Sensitivities['a']['y'][2])
+        # A function that returns plain numbers gives a warning.
+        obj.AddFunction('f', lambda z: 1.)
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter('always')
+            obj.SolveEquation()
+            self.assertIn('f()', str(w[-1].message))
+        self.assertEqual([0., 0., 0.], obj.Sensitivities['a']['y'])
+
+    def test_Sensitivities_unsupported(self):
+        # Endogenous and decorative equations.
+        for eqns in ('x = erf(a*t) + .5*LAG_x\nLAG_x = x(k-1)', 'x = y\ny = erf(a*t)'):
+            obj = EquationSolver(eqns + """
+              # Parameters
+              a = 0.5
+              MaxTime=2""")
+            obj.SensitivityVariables = ['a']
+            with self.assertRaises(ValueError) as cm:
+                obj.SolveEquation()
+            self.assertIn('sensitivities', str(cm.exception))
+            # Fine without sensitivities.
+            obj.SensitivityVariables = []
+            obj.SolveEquation()
+
+    def test_IterSolve(self):
+        obj = EquationSolver("""
+          x = a*t + LAG_x
+          LAG_x = x(k-1)
+          # Parameters
+          a = 0.5
+          exogenous
+          t = [1.]*10
+          MaxTime=3""")
+        out = list(obj.IterSolve())
+        self.assertEqual([1, 2, 3], [x['step'] for x in out])
+        self.assertEqual([.5, 1., 1.5], [x['values']['x'] for x in out])
+        self.assertEqual(obj.IterationCounts, [x['iterations'] for x in out])
+        self.assertIn('time', out[0])
+        # Stop early
+        gen = obj.IterSolve(params={'a': 1.})
+        self.assertEqual(1., next(gen)['values']['x'])
+        gen.close()
+        self.assertEqual(1, len(obj.IterationCounts))
+
+    def get_budget_solver(self):
+        obj = EquationSolver("""
+          x = a*t + LAG_x
+          LAG_x = x(k-1)
+          y = 2*x
+          # Parameters
+          a = 0.5
+          exogenous
+          t = [1.]*10
+          MaxTime=5""")
+        return obj
+
+    def test_Status(self):
+        obj = self.get_budget_solver()
+        self.assertIsNone(obj.Status)
+        obj.SolveEquation()
+        self.assertEqual('ok', obj.Status)
+        self.assertEqual(5, obj.LastPeriodSolved)
+        self.assertEqual(6, len(obj.TimeSeries['x']))
+
+    def test_MaxTotalIterations(self):
+        obj = self.get_budget_solver()
+        obj.SolveEquation()
+        per_step = obj.IterationCounts[0]
+        obj.MaxTotalIterations = 2 * per_step + 1
+        obj.SolveEquation()
+        self.assertEqual('total_iterations', obj.Status)
+        self.assertEqual(2, obj.LastPeriodSolved)
+        self.assertEqual([0., .5, 1.], obj.TimeSeries['x'])
+        self.assertEqual([0., 1., 2.], obj.TimeSeries['y'])
+        self.assertEqual([0., 1., 2.], obj.TimeSeries['k'])
+        # Exactly enough
+        obj.MaxTotalIterations = 5 * per_step
+        obj.SolveEquation()
+        self.assertEqual('ok', obj.Status)
+
+    def test_MaxWallTime(self):
+        obj = self.get_budget_solver()
+        obj.MaxWallTime = 0.
+        obj.SensitivityVariables = ['a']
+        obj.SolveEquation()
+        self.assertEqual('wall_time', obj.Status)
+        self.assertEqual(0, obj.LastPeriodSolved)
+        self.assertEqual([0.], obj.TimeSeries['x'])
+        self.assertEqual([0.], obj.Sensitivities['a']['x'])
+
+    def test_MaxStepTime(self):
+        obj = self.get_budget_solver()
+        obj.MaxStepTime = 0.
+        results = list(obj.IterSolve())
+        self.assertEqual([], results)
+        self.assertEqual('step_time', obj.Status)
+        # Budgets do not apply once cleared.
+        obj.MaxStepTime = None
+        obj.SolveEquation()
+        self.assertEqual('ok', obj.Status)
+
+    def test_Status_no_convergence(self):
+        obj = EquationSolver("""
+          x = LAG_x + 1. - 2.*x
+          LAG_x = x(k-1)
+          MaxTime=3""")
+        obj.MaxIterations = 5
+        with self.assertRaises(ConvergenceError):
+            obj.SolveEquation()
+        self.assertEqual('no_convergence', obj.Status)
+        self.assertEqual(0, obj.LastPeriodSolved)
+        self.assertEqual([0.], obj.TimeSeries['x'])
@@ -2,6 +2,7 @@ import doctest
 from unittest import TestCase
 
 import sfc_models.equation_parser
+from sfc_models.utils import LogicError
 
 
 def load_tests(loader, tests, ignore):
@@ -53,10 +54,72 @@ class TestEquationParser(TestCase):
         self.assertEqual('-x', obj.CleanupRightHandSide('-x'))
 
     def test_FindExactMatches(self):
-        pass
+        obj = sfc_models.equation_parser.EquationParser()
+        obj.ParseString('w = x + 1\nx = y\ny = z\nz = 2 * t')
+        obj.GenerateTokenList()
+        obj.FindExactMatches()
+        # The chain x -> y -> z is collapsed in one pass.
+        self.assertEqual([('w', 'z+1'), ('x', 'z'), ('y', 'z'), ('z', '2*t'), ('t', 'k')],
+                         obj.Endogenous)
+        self.assertEqual(['z'], obj.Tokens['w'])
+        self.assertEqual(set(['w', 'x', 'y']), obj.References['z'])
+        self.assertEqual(set(), obj.References['x'])
+
+    def test_FindExactMatches_loop(self):
+        obj = sfc_models.equation_parser.EquationParser()
+        obj.ParseString('x = y\ny = z\nz = x\nw = x')
+        obj.GenerateTokenList()
+        with self.assertRaises(ValueError):
+            obj.FindExactMatches()
+
+    def test_FindExactMatches_lagged(self):
+        obj = sfc_models.equation_parser.EquationParser()
+        obj.ParseString('x = y\ny = 2*t\nlag_x = x(k-1)')
+        obj.GenerateTokenList()
+        obj.FindExactMatches()
+        self.assertEqual('y(k-1)', obj.AllEquations['lag_x'])
 
     def test_RebuildEquations(self):
         pass
 
     def test_MoveDecorative(self):
-        pass
+        obj = sfc_models.equation_parser.EquationParser()
+        # x and y depend upon each other, z refers to itself, and w is needed by a lagged variable.
+        obj.ParseString('x = y + v\ny = 0.5*x + 1\nz = 0.5*z + 1\nw = 2*t\nv = 3*t\nlag_w = w(k-1)')
+        obj.GenerateTokenList()
+        self.assertEqual(0, obj.MoveDecorative())
+        self.assertEqual(['x', 'y', 'z', 'w', 'v', 't'], [x[0] for x in obj.Endogenous])
+
+    def test_MoveDecorative_cascade(self):
+        obj = sfc_models.equation_parser.EquationParser()
+        obj.ParseString('a = b + c\nb = 2*c\nc = 3*d\nd = 0.5*d + t')
+        obj.GenerateTokenList()
+        self.assertEqual(3, obj.MoveDecorative())
+        self.assertEqual(['a', 'b', 'c'], [x[0] for x in obj.Decoration])
+        self.assertEqual(['d', 't'], [x[0] for x in obj.Endogenous])
+        # Nothing left to move.
+        self.assertEqual(0, obj.MoveDecorative())
+
+    def test_MoveDecorative_no_tokens(self):
+        # Model.LogInfo() reduces equations without generating tokens; nothing refers to anything.
+        obj = sfc_models.equation_parser.EquationParser()
+        obj.ParseString('a = b + c\nb = 2\nc = 3')
+        obj.EquationReduction()
+        self.assertEqual(['a', 'b', 'c', 't'], [x[0] for x in obj.Decoration])
+        self.assertEqual([], obj.Endogenous)
+
+    def test_ReplaceEquation(self):
+        obj = sfc_models.equation_parser.EquationParser()
+        obj.ParseString('x = a*y + LAG_x\nLAG_x = x(k-1)\ny = 2*x\n# Parameters\na = 0.5')
+        obj.ValidateInputs()
+        obj.EquationReduction()
+        obj.ReplaceEquation('a', '0.25')
+        self.assertEqual([('a', '0.25')], obj.Parameters)
+        obj.ReplaceEquation('y', '3*x')
+        self.assertIn(('y', '3*x'), obj.Endogenous + obj.Decoration)
+        with self.assertRaises(ValueError):
+            obj.ReplaceEquation('a', 'bad')
+        with self.assertRaises(LogicError):
+            obj.ReplaceEquation('y', '3*a')
+        with self.assertRaises(LogicError):
+            obj.ReplaceEquation('nothere', '1.')
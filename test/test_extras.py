@@ -1,4 +1,7 @@
 from unittest import TestCase
+import os
+import subprocess
+import sys
 
 import sfc_models.examples.Quick2DPlot as extras
 
@@ -16,3 +19,17 @@ class TestQuick2DPlot(TestCase):
 
 
 
+
+    def test_get_pyplot_disabled(self):
+        extras.plt = None
+        self.assertIsNone(extras.get_pyplot())
+
+
+class TestLazyImports(TestCase):
+    def test_objects(self):
+        # Importing the standard objects does not load the example installer (tkinter).
+        code = 'import sys, sfc_models.objects; print(sorted(set(sys.modules) & {0!r}))'.format(
+            set(['tkinter', 'Tkinter', 'pkg_resources', 'matplotlib', 'sfc_models.examples.install_examples']))
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        out = subprocess.check_output([sys.executable, '-c', code], cwd=root)
+        self.assertEqual('[]', out.decode('utf-8').strip())
@@ -0,0 +1,105 @@
+from unittest import TestCase
+
+from sfc_models.equation_solver import EquationSolver
+from sfc_models.impulse_response import ImpulseResponse
+import sfc_models.gl_book.chapter3
+
+
+def get_solver():
+    obj = EquationSolver("""
+      x = a*g + b*LAG_x
+      LAG_x = x(k-1)
+      y = x*x
+      # Parameters
+      a = 0.5
+      b = 0.8
+      exogenous
+      g = [1.]*10
+      MaxTime=5""")
+    obj.SolveEquation()
+    return obj
+
+
+class TestImpulseResponse(TestCase):
+    def test_init(self):
+        irf = ImpulseResponse(get_solver())
+        self.assertEqual(['x'], irf.States)
+        self.assertEqual(['g'], irf.Inputs)
+        self.assertEqual(5, irf.MaxTime)
+
+    def test_Linearise(self):
+        irf = ImpulseResponse(get_solver())
+        irf.Linearise()
+        self.assertEqual(5, len(irf.Jacobians))
+        row = dict(irf.Jacobians[0]['x'])
+        self.assertAlmostEqual(0.8, row[0], places=4)
+        self.assertAlmostEqual(0.5, row[1], places=4)
+        self.assertEqual([(0, 1.)], irf.Jacobians[0]['LAG_x'])
+
+    def test_MakeShock(self):
+        irf = ImpulseResponse(get_solver())
+        self.assertEqual({'g': [0., 0., 2., 0., 0., 0.]}, irf.MakeShock('g', 2, size=2.))
+        self.assertEqual({'g': [0., 0., 1., 1., 1., 1.]}, irf.MakeShock('g', 2, persistent=True))
+        with self.assertRaises(KeyError):
+            irf.MakeShock('x', 1)
+
+    def test_Propagate(self):
+        irf = ImpulseResponse(get_solver())
+        out = irf.Propagate([irf.MakeShock('g', 1), irf.MakeShock('g', 2, persistent=True)])
+        self.assertEqual(2, len(out))
+        expected = [0., .5, .4, .32, .256, .2048]
+        for k in range(0, 6):
+            self.assertAlmostEqual(expected[k], out[0]['x'][k], places=4)
+        self.assertEqual([0., 1., 0., 0., 0., 0.], out[0]['g'])
+        expected = [0., 0., .5, .9, 1.22, 1.476]
+        for k in range(0, 6):
+            self.assertAlmostEqual(expected[k], out[1]['x'][k], places=4)
+        self.assertEqual([0., 1., 2., 3., 4., 5.], out[1]['k'])
+
+    def test_Propagate_bad(self):
+        irf = ImpulseResponse(get_solver())
+        with self.assertRaises(KeyError):
+            irf.Propagate([{'x': [0., 1.]}])
+        with self.assertRaises(ValueError):
+            irf.Propagate([{'g': [1., ]}])
+
+    def test_Compare(self):
+        irf = ImpulseResponse(get_solver())
+        shock = irf.MakeShock('g', 1, size=.001)
+        full = irf.SolveShocked(shock)
+        self.assertAlmostEqual(.0005, full['x'][1], places=6)
+        diff = irf.Compare(shock)
+        self.assertLess(diff['x'], 1e-6)
+        # y is nonlinear; the error is second order.
+        self.assertLess(diff['y'], 1e-5)
+        # The baseline is unchanged.
+        self.assertEqual(1., irf.Solver.TimeSeries['g'][1])
+
+    def test_after_sensitivities(self):
+        # The shocked run must not inherit the dual number set up of a sensitivity run.
+        solver = get_solver()
+        solver.SensitivityVariables = ['a']
+        solver.SolveEquation()
+        irf = ImpulseResponse(solver)
+        full = irf.SolveShocked(irf.MakeShock('g', 1, size=.001))
+        for k in range(0, 6):
+            self.assertIs(float, type(full['x'][k]))
+            self.assertIs(float, type(full['y'][k]))
+        self.assertAlmostEqual(.0005, full['x'][1], places=6)
+        diff = irf.Compare(irf.MakeShock('g', 1, size=.001))
+        self.assertLess(diff['x'], 1e-6)
+        # The sensitivities of the baseline are unaffected.
+        self.assertAlmostEqual(1., solver.Sensitivities['a']['x'][1], places=6)
+
+    def test_SIM(self):
+        mod = sfc_models.gl_book.chapter3.SIM('C', use_book_exogenous=True).build_model()
+        mod.MaxTime = 10
+        mod.main()
+        irf = ImpulseResponse(mod.EquationSolver)
+        out = irf.GetImpulseResponses(['GOV__DEM_GOOD'], period=3, persistent=True)
+        response = out['GOV__DEM_GOOD']['GOOD__SUP_GOOD']
+        self.assertEqual(0., response[2])
+        # Impact multiplier: 1/(1 - alpha_income*(1-tax))
+        self.assertAlmostEqual(1. / (1. - .6 * .8), response[3], places=3)
+        diff = irf.Compare(irf.MakeShock('GOV__DEM_GOOD', 3, persistent=True))
+        self.assertLess(diff['GOOD__SUP_GOOD'], 1e-3)
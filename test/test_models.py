@@ -1,4 +1,8 @@
+import os
+import shutil
+import tempfile
 from unittest import TestCase
+from array import array
 
 from sfc_models.models import *
 from sfc_models.sector import Sector
@@ -81,6 +85,31 @@ class TestModel(TestCase):
         with self.assertRaises(KeyError):
             mod.LookupSector('HH')
 
+    def test_LookupSector_index(self):
+        mod = Model()
+        us = Country(mod, 'US', 'USA')
+        household = Sector(us, 'HH', 'Household')
+        mod._GenerateFullSectorCodes()
+        self.assertEqual(household, mod.LookupSector('HH'))
+        # Sector IDs are used by Sector.AddInitialCondition().
+        self.assertEqual(household, mod.LookupSector(household.ID))
+        with self.assertRaises(KeyError):
+            mod.LookupSector(-1)
+        # Adding a country changes the FullCode; the stale index entry is not used.
+        can = Country(mod, 'CA', 'Canada')
+        can_hh = Sector(can, 'HH', 'Household')
+        self.assertEqual(mod.SectorFullCodeIndex['HH'], household)
+        household.FullCode = 'US_HH'
+        with self.assertRaises(KeyError):
+            mod.LookupSector('HH')
+        self.assertEqual(household, mod.LookupSector('US_HH'))
+        self.assertEqual(household, us.LookupSector('US_HH', is_full_code=True))
+        with self.assertRaises(KeyError):
+            can.LookupSector('US_HH', is_full_code=True)
+        mod._GenerateFullSectorCodes()
+        self.assertEqual(can_hh, mod.LookupSector('CA_HH'))
+        self.assertNotIn('HH', mod.SectorFullCodeIndex)
+
     def test_AddExogenous(self):
         mod = Model()
         # Does not validate that the sector exists (until we call ProcessExogenous)
@@ -100,6 +129,20 @@ class TestModel(TestCase):
         mod.AddExogenous('code', 'varname', val)
         self.assertEqual([('code', 'varname', repr(val))], mod.Exogenous)
 
+    def test_AddExogenous_number(self):
+        mod = Model()
+        mod.AddExogenous('code', 'varname', 2)
+        self.assertEqual([('code', 'varname', '2.0')], mod.Exogenous)
+
+    def test_AddExogenous_object(self):
+        mod = Model()
+        val = array('d', [0., 1., 2.])
+        fn = lambda k: 2. * k
+        mod.AddExogenous('code', 'varname', val)
+        mod.AddExogenous('code', 'varname2', fn)
+        self.assertIs(val, mod.Exogenous[0][2])
+        self.assertIs(fn, mod.Exogenous[1][2])
+
     def test_AddInitialCondition(self):
         mod = Model()
         # Does not validate that the sector exists until processing
@@ -137,6 +180,45 @@ class TestModel(TestCase):
         mod._ProcessExogenous()
         self.assertEqual('EXOGENOUSTEST', household.EquationBlock['foo'].RHS())
 
+    def test_ProcessExogenous_source(self):
+        mod = Model()
+        us = Country(mod, 'US', 'USA')
+        household = Sector(us, 'HH', 'Household')
+        household.AddVariable('foo', 'desc', 'x')
+        mod._GenerateFullSectorCodes()
+        val = array('d', [0., 1., 2.])
+        mod.Exogenous = [('HH', 'foo', val)]
+        mod._ProcessExogenous()
+        self.assertEqual('EXOGENOUSEXTERNAL', household.EquationBlock['foo'].RHS())
+        self.assertIs(val, mod.EquationSolver.ExogenousSources['HH__foo'])
+
+    def test_ProcessExogenous_number(self):
+        mod = Model()
+        us = Country(mod, 'US', 'USA')
+        household = Sector(us, 'HH', 'Household')
+        household.AddVariable('foo', 'desc', 'x')
+        household.AddVariable('bar', 'desc', 'x')
+        household.AddVariable('baz', 'desc', 'x')
+        mod._GenerateFullSectorCodes()
+        mod.AddExogenous('HH', 'foo', 20.5)
+        mod.AddExogenous('HH', 'bar', '-20.5')
+        mod.AddExogenous('HH', 'baz', '.5')
+        mod._ProcessExogenous()
+        self.assertEqual('EXOGENOUS(20.5)', household.EquationBlock['foo'].RHS())
+        self.assertEqual('EXOGENOUS(-20.5)', household.EquationBlock['bar'].RHS())
+        self.assertEqual('EXOGENOUS(.5)', household.EquationBlock['baz'].RHS())
+
+    def test_Main_exogenous_number(self):
+        mod = Model()
+        can = Country(mod, 'CA')
+        ConsolidatedGovernment(can, 'GOV')
+        mod.EquationSolver.MaxTime = 2
+        mod.AddExogenous('GOV', 'DEM_GOOD', 20.)
+        mod.AddExogenous('GOV', 'T', -20.5)
+        mod.main()
+        self.assertEqual([20., 20., 20.], mod.GetTimeSeries('GOV__DEM_GOOD'))
+        self.assertEqual([-20.5, -20.5, -20.5], mod.GetTimeSeries('GOV__T'))
+
     def test_GetSectors(self):
         mod = Model()
         self.assertEqual(0, len(mod.GetSectors()))
@@ -153,6 +235,12 @@ class TestModel(TestCase):
         self.assertIn(household, secs)
         self.assertIn(hh2, secs)
         self.assertIn(hh3, secs)
+        # Modifying the returned list does not affect the Model.
+        secs.pop()
+        self.assertEqual([household, hh2, hh3], mod.GetSectors())
+        # Order follows the country list, not creation order.
+        hh4 = Sector(us, 'HH4', 'Household4')
+        self.assertEqual([household, hh2, hh4, hh3], mod.GetSectors())
 
     def test_Fixaliases(self):
         mod = Model()
@@ -187,6 +275,34 @@ class TestModel(TestCase):
         self.assertIn('-sec1__x', sec1.EquationBlock['F'].RHS())
         self.assertEqual('LAG_F+sec1__x', kill_spaces(sec2.EquationBlock['F'].RHS()))
 
+    def test_fix_aliases_untouched(self):
+        mod = Model()
+        c = Country(mod, 'co', 'co')
+        sec1 = Sector(c, 'sec1', 'sec1')
+        sec1.AddVariable('x', 'eqn x', '')
+        varname = sec1.GetVariableName('x')
+        sec1.AddVariable('y', 'eqn y', 'x*2')
+        sec1.AddVariable('z', 'eqn z', 'y + ' + varname)
+        mod._GenerateFullSectorCodes()
+        mod._FixAliases()
+        # Terms without aliases are not modified.
+        self.assertEqual('x*2', sec1.EquationBlock['y'].RHS())
+        self.assertEqual('y+sec1__x', kill_spaces(sec1.EquationBlock['z'].RHS()))
+
+    def test_income_exclusion(self):
+        mod = Model()
+        c = Country(mod, 'co', 'co')
+        sec1 = Sector(c, 'sec1', 'sec1')
+        sec2 = Sector(c, 'sec2', 'sec2')
+        mod.AddCashFlowIncomeExclusion(sec1, 'x')
+        self.assertTrue(mod.IsIncomeExcluded(sec1, 'x'))
+        self.assertFalse(mod.IsIncomeExcluded(sec1, 'y'))
+        self.assertFalse(mod.IsIncomeExcluded(sec2, 'x'))
+        sec1.AddCashFlow('-x')
+        sec1.AddCashFlow('y')
+        self.assertEqual('LAG_F-x+y', sec1.EquationBlock['F'].RHS())
+        self.assertEqual('y', sec1.EquationBlock['INC'].RHS())
+
     def test_ForceExogenous2(self):
         mod = Model()
         us = Country(mod, 'US', 'USA')
@@ -232,6 +348,23 @@ class TestModel(TestCase):
         mod.main()
         self.assertEqual('Finished Running', mod.State)
 
+    def test_Main_logs(self):
+        # LogInfo() dumps the equations without generating the parser tokens.
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            mod = Model()
+            can = Country(mod, 'CA')
+            ConsolidatedGovernment(can, 'GOV')
+            mod.EquationSolver.MaxTime = 1
+            mod.main(base_file_name=os.path.join(tmp_dir, 'test'))
+            Logger.cleanup()
+            self.assertEqual('Finished Running', mod.State)
+            with open(os.path.join(tmp_dir, 'test_eqn.txt')) as f:
+                self.assertIn('GOV__F', f.read())
+        finally:
+            Logger.cleanup()
+            shutil.rmtree(tmp_dir)
+
     def test_FinalEquationFormating(self):
         eq = [('x', 'y + 1', 'comment_x'),
               ('y', 'EXOGENOUS 20', 'comment_y'),
@@ -274,6 +407,8 @@ class TestModel(TestCase):
         mod.EquationSolver.TimeSeries = {'t': [0, 1, 2]}
         mod.TimeSeriesSupressTimeZero = True
         self.assertEqual([1, 2], mod.GetTimeSeries('t'))
+        # The solver's copy is untouched, so repeated calls give the same answer.
+        self.assertEqual([1, 2], mod.GetTimeSeries('t'))
 
     def test_GetItem(self):
         mod = Model()
@@ -333,6 +468,11 @@ class TestCountry(TestCase):
         can = Country(mod, 'CA', 'Can')
         gov = ConsolidatedGovernment(can, 'GOV', 'Gov')
         self.assertIn(gov, can)
+        self.assertIn('GOV', can)
+        self.assertNotIn('HH', can)
+        self.assertIn('CA', mod)
+        self.assertNotIn('US', mod)
+        self.assertIn(can, mod)
 
     def test_AddCountryFail(self):
         mod = Model()
@@ -424,3 +564,98 @@ class TestCurrencyZone(TestCase):
 
 
 
+
+
+class TestIncrementalRebuild(TestCase):
+    def build_sim(self, alpha_income=.6, taxrate=.2):
+        from sfc_models.sector import Market
+        from sfc_models.sector_definitions import FixedMarginBusiness, TaxFlow
+        mod = Model()
+        country = Country(mod, 'CA', 'Canada')
+        gov = ConsolidatedGovernment(country, 'GOV', 'Government')
+        hh = Household(country, 'HH', 'Household', alpha_income=alpha_income, alpha_fin=.4)
+        bus = FixedMarginBusiness(country, 'BUS', 'Business Sector')
+        tf = TaxFlow(country, 'TF', 'TaxFlow', taxrate=taxrate)
+        Market(country, 'LAB', 'Labour market')
+        Market(country, 'GOOD', 'Goods market')
+        gov.SetExogenous('DEM_GOOD', '[20.,] * 105')
+        mod.MaxTime = 10
+        return mod, hh, bus, tf
+
+    def test_parameter_change(self):
+        mod, hh, bus, tf = self.build_sim()
+        mod.main()
+        self.assertTrue(mod.IsBuilt)
+        parser = mod.EquationSolver.Parser
+        hh.AlphaIncome = .7
+        tf.TaxRate = .25
+        self.assertEqual([(hh, ['AlphaIncome']), (tf, ['TaxRate'])], mod.GetDirtySectors())
+        mod.main()
+        # The parser object is patched, not replaced.
+        self.assertIs(parser, mod.EquationSolver.Parser)
+        self.assertEqual([], mod.GetDirtySectors())
+        self.assertIn('HH__AlphaIncome = 0.7 ', mod.FinalEquations)
+        mod2, dummy, dummy2, dummy3 = self.build_sim(alpha_income=.7, taxrate=.25)
+        mod2.main()
+        self.assertEqual(mod2.FinalEquations, mod.FinalEquations)
+        for series in ('GOOD__SUP_GOOD', 'HH__F', 'TF__T'):
+            self.assertEqual(mod2.GetTimeSeries(series), mod.GetTimeSeries(series))
+
+    def test_exogenous_kept(self):
+        mod, hh, bus, tf = self.build_sim()
+        mod.AddExogenous('HH', 'AlphaIncome', '[0.5,] * 105')
+        mod.main()
+        hh.AlphaIncome = .7
+        hh.AlphaFin = .3
+        mod.main()
+        self.assertEqual(0.5, mod.GetTimeSeries('HH__AlphaIncome')[3])
+        self.assertEqual(0.3, mod.GetTimeSeries('HH__AlphaFin')[3])
+
+    def test_exogenous_source(self):
+        mod, hh, bus, tf = self.build_sim()
+        mod.AddExogenous('HH', 'AlphaIncome', array('d', [0.5, ] * 105))
+        mod.AddExogenous('HH', 'AlphaFin', lambda k: 0.2 if k < 10 else 0.3)
+        mod.main()
+        self.assertIn('HH__AlphaIncome = EXTERNAL', mod.FinalEquations)
+        mod2, dummy, dummy2, dummy3 = self.build_sim()
+        mod2.AddExogenous('HH', 'AlphaIncome', '[0.5,] * 105')
+        mod2.AddExogenous('HH', 'AlphaFin', '[0.2,]*10 + [0.3,]*95')
+        mod2.main()
+        for series in ('GOOD__SUP_GOOD', 'HH__F', 'HH__AlphaFin'):
+            self.assertEqual(mod2.GetTimeSeries(series), mod.GetTimeSeries(series))
+
+    def test_unsupported(self):
+        mod, hh, bus, tf = self.build_sim()
+        mod.main()
+        bus.ProfitMargin = .1
+        with self.assertRaises(LogicError):
+            mod.main()
+        mod, hh, bus, tf = self.build_sim()
+        mod.main()
+        Sector(hh.Parent, 'NEW', 'New sector')
+        with self.assertRaises(LogicError):
+            mod.main()
+        mod, hh, bus, tf = self.build_sim()
+        mod.main()
+        mod.AddExogenous('HH', 'AlphaFin', '0.3')
+        with self.assertRaises(LogicError):
+            mod.main()
+
+    def test_unchanged_value(self):
+        mod, hh, bus, tf = self.build_sim()
+        mod.main()
+        # Setting an attribute to the same value does not make the sector dirty.
+        bus.ProfitMargin = bus.ProfitMargin
+        hh.AlphaIncome = .6
+        self.assertEqual([], mod.GetDirtySectors())
+        mod.main()
+
+    def test_solver_parameters(self):
+        # Parameters can be changed when solving, without a rebuild.
+        mod, hh, bus, tf = self.build_sim()
+        mod.main()
+        mod.EquationSolver.SolveEquation(params={'HH__AlphaIncome': .7, 'TF__TaxRate': .25})
+        mod2, dummy, dummy2, dummy3 = self.build_sim(alpha_income=.7, taxrate=.25)
+        mod2.main()
+        for series in ('GOOD__SUP_GOOD', 'HH__F', 'TF__T'):
+            self.assertEqual(mod2.GetTimeSeries(series), mod.GetTimeSeries(series))
@@ -0,0 +1,164 @@
+import doctest
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import sfc_models.result_sinks as result_sinks
+from sfc_models.result_sinks import ResultSink, TabDelimitedSink, BinarySink
+from sfc_models.equation_solver import EquationSolver
+from sfc_models.utils import ConstantTimeSeriesView
+
+
+def load_tests(loader, tests, ignore):
+    """
+    Load doctests, so unittest discovery can find them.
+    """
+    tests.addTests(doctest.DocTestSuite(result_sinks))
+    return tests
+
+
+class MockFile(object):
+    def __init__(self):
+        self.buffer = []
+
+    def write(self, msg):
+        self.buffer.append(msg)
+
+
+class RecordingSink(ResultSink):
+    def __init__(self):
+        self.Steps = []
+        self.IsClosed = False
+
+    def WriteStep(self, step, values):
+        self.Steps.append((step, values))
+
+    def Close(self):
+        self.IsClosed = True
+
+
+def get_solver():
+    obj = EquationSolver()
+    obj.ParseString("""
+    x = t
+    z = x + 1
+    exogenous
+    t = [10., 11., 12., 13.]
+    MaxTime = 3""")
+    return obj
+
+
+class TestSolverSinks(TestCase):
+    def test_steps(self):
+        obj = get_solver()
+        sink = RecordingSink()
+        obj.AddResultSink(sink)
+        obj.SolveEquation()
+        self.assertEqual(['k', 't', 'x', 'z'], sink.SeriesNames)
+        self.assertEqual([0, 1, 2, 3], [x[0] for x in sink.Steps])
+        self.assertEqual([3., 13., 13., 14.], sink.Steps[3][1])
+        self.assertTrue(sink.IsClosed)
+
+    def test_close_on_failure(self):
+        obj = EquationSolver()
+        obj.ParseString("""
+        x = log10(t)
+        exogenous
+        t = [1., 0., 0.]
+        MaxTime = 2""")
+        sink = RecordingSink()
+        obj.AddResultSink(sink)
+        with self.assertRaises(ValueError):
+            obj.SolveEquation()
+        self.assertTrue(sink.IsClosed)
+        # Period 0 was still delivered.
+        self.assertEqual([0], [x[0] for x in sink.Steps])
+
+    def test_window(self):
+        obj = get_solver()
+        obj.ParameterMemoryWindow = 2
+        sink = RecordingSink()
+        obj.AddResultSink(sink)
+        obj.SolveEquation()
+        self.assertEqual(4, len(sink.Steps))
+        self.assertEqual(14., obj.TimeSeries['z'][3])
+        self.assertEqual(2, obj.TimeSeries['z'].FirstIndex)
+        with self.assertRaises(IndexError):
+            obj.TimeSeries['z'][1]
+        # Exogenous variables (and the time axis) are also held as a window.
+        self.assertEqual([12., 13.], obj.TimeSeries['t'])
+        self.assertEqual(2, obj.TimeSeries['k'].FirstIndex)
+        self.assertEqual('k\tt\tx\tz\n2\t12\t12\t13\n3\t13\t13\t14\n', obj.GenerateCSVtext())
+
+    def test_window_constants(self):
+        obj = EquationSolver()
+        obj.ParseString("""
+        x = a*t + c
+        # Parameters
+        a = 2.
+        exogenous
+        t = [10., 11., 12., 13.]
+        c = 5.
+        MaxTime = 3""")
+        obj.ParameterMemoryWindow = 2
+        obj.SolveEquation()
+        # Constants are held as a single value, and all periods can be read.
+        for var in ('a', 'c'):
+            self.assertIsInstance(obj.TimeSeries[var], ConstantTimeSeriesView)
+        self.assertEqual([2., 2., 2., 2.], obj.TimeSeries['a'])
+        self.assertEqual(5., obj.TimeSeries['c'][0])
+        self.assertEqual([31.], obj.TimeSeries['x'][3:])
+        self.assertEqual('k\tt\ta\tc\tx\n2\t12\t2\t5\t29\n3\t13\t2\t5\t31\n', obj.GenerateCSVtext())
+        # A solution with the initial steady state.
+        obj.ParameterSolveInitialSteadyState = True
+        obj.SolveEquation()
+        self.assertEqual([29., 31.], obj.TimeSeries['x'][2:])
+
+
+class TestTabDelimitedSink(TestCase):
+    def test_write(self):
+        f = MockFile()
+        sink = TabDelimitedSink(f)
+        sink.Open(['k', 'x'])
+        sink.WriteStep(0, [0., 1.5])
+        sink.Close()
+        self.assertEqual(['k\tx\n', '0\t1.5\n'], f.buffer)
+
+    def test_matches_csv(self):
+        obj = get_solver()
+        f = MockFile()
+        obj.AddResultSink(TabDelimitedSink(f))
+        obj.SolveEquation()
+        self.assertEqual(obj.GenerateCSVtext(), ''.join(f.buffer))
+
+
+class TestBinarySink(TestCase):
+    def setUp(self):
+        self.Dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.Dir)
+
+    def test_round_trip(self):
+        base = os.path.join(self.Dir, 'out')
+        obj = get_solver()
+        obj.AddResultSink(BinarySink(base))
+        obj.SolveEquation()
+        out = BinarySink.Read(base)
+        self.assertEqual(obj.TimeSeries.GetSeriesList(), out.GetSeriesList())
+        for name in out:
+            self.assertEqual(obj.TimeSeries[name], out[name])
+
+    def test_partial(self):
+        base = os.path.join(self.Dir, 'out')
+        sink = BinarySink(base)
+        sink.Open(['k', 'x'])
+        sink.WriteStep(0, [0., 1. / 3.])
+        # File is readable before Close() is called.
+        out = BinarySink.Read(base)
+        self.assertEqual([1. / 3.], out['x'])
+        sink.WriteStep(1, [1., 2.])
+        sink.Close()
+        out = BinarySink.Read(base)
+        self.assertEqual([0., 1.], out['k'])
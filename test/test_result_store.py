@@ -0,0 +1,124 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from sfc_models.equation_solver import EquationSolver, ConvergenceError
+from sfc_models.result_store import ResultStore, get_fingerprint
+import sfc_models.gl_book.chapter3
+
+
+def get_solver():
+    return EquationSolver("""
+      x = a*t + LAG_x
+      LAG_x = x(k-1)
+      # Parameters
+      a = 0.5
+      exogenous
+      t = [1.]*10
+      MaxTime=3""")
+
+
+class TestResultStore(TestCase):
+    def test_AddRun(self):
+        obj = get_solver()
+        obj.SolveEquation()
+        with ResultStore() as store:
+            run_id = store.AddRun(obj, 'base')
+            self.assertEqual([run_id], store.FindRuns())
+            self.assertEqual({run_id: [0., .5, 1., 1.5]}, store.GetSeries('x'))
+            runs = store.GetRuns()
+            self.assertEqual(1, len(runs))
+            self.assertEqual('base', runs[0]['name'])
+            self.assertEqual('ok', runs[0]['status'])
+            self.assertEqual(3, runs[0]['max_time'])
+            self.assertEqual({'a': .5}, runs[0]['parameters'])
+            self.assertEqual(400, runs[0]['settings']['MaxIterations'])
+            self.assertEqual(get_fingerprint(obj), runs[0]['fingerprint'])
+            self.assertEqual(obj.LastSolveTime, runs[0]['solve_time'])
+            holder = store.GetRunSeries(run_id)
+            self.assertEqual([0., 1., 2., 3.], holder['k'])
+            self.assertEqual([.5, .5, .5, .5], holder['a'])
+            with self.assertRaises(KeyError):
+                store.GetSeries('foo')
+
+    def test_AddRun_window(self):
+        obj = get_solver()
+        obj.ParameterMemoryWindow = 2
+        obj.SolveEquation()
+        with ResultStore() as store:
+            run_id = store.AddRun(obj)
+            # Padded to period 0, so that the periods line up with a full run.
+            self.assertEqual({run_id: [None, None, 1., 1.5]}, store.GetSeries('x'))
+            self.assertEqual({run_id: [None, None, .5, .5]}, store.GetSeries('a'))
+            periods = store.Connection.execute(
+                'SELECT period FROM data JOIN series ON data.series_id = series.series_id '
+                'WHERE series.name=? ORDER BY period', ('x',))
+            self.assertEqual([2, 3], [x[0] for x in periods])
+            full = get_solver()
+            full.SolveEquation()
+            full_id = store.AddRun(full)
+            out = store.GetSeries('x')
+            self.assertEqual(out[full_id][2:], out[run_id][2:])
+            holder = store.GetRunSeries(run_id)
+            self.assertEqual([2., 3.], holder['k'])
+            self.assertEqual([.5, .5], holder['a'])
+            self.assertEqual([1., 1.5], holder['x'])
+
+    def test_sink(self):
+        obj = get_solver()
+        store = ResultStore()
+        sink = store.AddSink(obj, 'sweep')
+        for a in (.25, .5, 1.):
+            obj.Solve(params={'a': a})
+        self.assertEqual(3, len(sink.RunIDs))
+        found = store.FindRuns([('a', '>', .3)])
+        self.assertEqual(sink.RunIDs[1:], found)
+        self.assertEqual({found[0]: [0., .5, 1., 1.5], found[1]: [0., 1., 2., 3.]}, store.GetSeries('x', found))
+        self.assertEqual(sink.RunIDs[0:1], store.FindRuns([('a', '<=', .25)], name='sweep', status='ok'))
+        self.assertEqual([], store.FindRuns(name='foo'))
+        with self.assertRaises(ValueError):
+            store.FindRuns([('a', 'LIKE', 1.)])
+        # Same model, same fingerprint.
+        fingerprints = set([x['fingerprint'] for x in store.GetRuns()])
+        self.assertEqual(1, len(fingerprints))
+        self.assertEqual(obj.LastSolveTime, store.GetRuns(sink.RunIDs[-1:])[0]['solve_time'])
+        store.Close()
+
+    def test_sink_failure(self):
+        obj = EquationSolver("""
+          x = LAG_x + 1. - 2.*x
+          LAG_x = x(k-1)
+          MaxTime=3""")
+        obj.MaxIterations = 5
+        store = ResultStore()
+        sink = store.AddSink(obj)
+        with self.assertRaises(ConvergenceError):
+            obj.SolveEquation()
+        self.assertEqual('no_convergence', store.GetRuns()[0]['status'])
+        self.assertEqual({sink.RunIDs[0]: [0.]}, store.GetSeries('x'))
+        # Stopped by the caller
+        obj.MaxIterations = 400
+        gen = obj.IterSolve()
+        next(gen)
+        gen.close()
+        self.assertEqual(['stopped'], [x['status'] for x in store.GetRuns(sink.RunIDs[1:])])
+
+    def test_file(self):
+        directory = tempfile.mkdtemp()
+        try:
+            fname = os.path.join(directory, 'runs.db')
+            mod = sfc_models.gl_book.chapter3.SIM('C', use_book_exogenous=True).build_model()
+            mod.MaxTime = 5
+            store = ResultStore(fname)
+            mod.AddResultStore(store, 'SIM')
+            mod.main()
+            store.Close()
+            store = ResultStore(fname)
+            run_ids = store.FindRuns([('HH__AlphaIncome', '=', .6)])
+            self.assertEqual(1, len(run_ids))
+            series = store.GetSeries('GOOD__SUP_GOOD', run_ids)[run_ids[0]]
+            self.assertEqual(list(mod.GetTimeSeries('GOOD__SUP_GOOD')), series)
+            store.Close()
+        finally:
+            shutil.rmtree(directory)
@@ -20,8 +20,8 @@ class TestHouseHold(TestCase):
         can = Country(mod, 'Eh', 'Canada')
         hh = Household(can, 'HH', 'Household', alpha_fin=0.2, alpha_income=0.9)
         hh._GenerateEquations()
-        self.assertEqual(hh.EquationBlock['AlphaFin'].RHS(), '0.2000')
-        self.assertEqual(hh.EquationBlock['AlphaIncome'].RHS(), '0.9000')
+        self.assertEqual(hh.EquationBlock['AlphaFin'].RHS(), 'PARAMETER(0.2)')
+        self.assertEqual(hh.EquationBlock['AlphaIncome'].RHS(), 'PARAMETER(0.9)')
 
 class TestMultiSupply(TestCase):
     # Changed behaviour
@@ -124,7 +124,7 @@ class TestTaxFlow(TestCase):
         gov = ConsolidatedGovernment(can, 'GOV', 'Gummint')
         mod._GenerateFullSectorCodes()
         tf._GenerateEquations()
-        self.assertEqual('0.1000', tf.EquationBlock['TaxRate'].RHS())
+        self.assertEqual('PARAMETER(0.1)', tf.EquationBlock['TaxRate'].RHS())
         self.assertEqual('Tax__TaxRate*HH__INC', tf.EquationBlock['T'].RHS().replace(' ', ''))
         self.assertIn('-T',hh.EquationBlock['F'].RHS())
         self.assertEqual('Tax__TaxRate*HH__INC', hh.EquationBlock['T'].RHS())
@@ -142,7 +142,7 @@ class TestTaxFlow(TestCase):
         gov = ConsolidatedGovernment(can, 'GOV', 'Gummint')
         mod._GenerateFullSectorCodes()
         tf._GenerateEquations()
-        self.assertEqual('0.1000', tf.EquationBlock['TaxRate'].RHS())
+        self.assertEqual('PARAMETER(0.1)', tf.EquationBlock['TaxRate'].RHS())
         self.assertEqual('HH__TaxRate*HH__INC', tf.EquationBlock['T'].RHS().replace(' ', ''))
         self.assertIn('-T', hh.EquationBlock['F'].RHS())
         self.assertEqual('HH__TaxRate*HH__INC', hh.EquationBlock['T'].RHS())
@@ -196,8 +196,8 @@ class TestCapitalists(TestCase):
         cap.AlphaIncome = 0.99
         cap.AlphaFin = 0.11
         cap._GenerateEquations()
-        self.assertEqual('0.9900', cap.EquationBlock['AlphaIncome'].RHS())
-        self.assertEqual('0.1100', cap.EquationBlock['AlphaFin'].RHS())
+        self.assertEqual('PARAMETER(0.99)', cap.EquationBlock['AlphaIncome'].RHS())
+        self.assertEqual('PARAMETER(0.11)', cap.EquationBlock['AlphaFin'].RHS())
 
 
 class TestMoneyMarket(TestCase):
@@ -1,3 +1,4 @@
+import copy
 import platform
 import doctest
 from unittest import TestCase
@@ -23,6 +24,55 @@ class TestReplace_token(TestCase):
         self.assertEqual(utils.replace_token('', 'foo', 'bar'), '')
 
 
+class TestFastTokenizer(TestCase):
+    # Equation strings of the sort generated by the framework, plus a few odd cases.
+    examples = [
+        'HH__AlphaIncome*HH__AfterTax +HH__AlphaFin*HH__LAG_F',
+        'GOV__DEM_GOOD +HH__DEM_GOOD', 'BUS__SUP_GOOD - BUS__DEM_LAB', '0.0', '.5', '20.',
+        '1e-6', '2.5E+3', '3j', 'x**2', 'x // 2', 'max(x, y)', 'lag_x(k-1)', 'x if y > 0 else z',
+        '[10., 11., 12.]', '[.2]*5 + [.3]*10', 'math.log(x)', 'a != b', 'a >= b <= c', 'x[-1]',
+        'x == y', '-x', '(x - y) / (z + 1)', 'x\t+ y', '{}', 'a, b', 'x;y', '...',
+    ]
+    fallback = ['x = "text"', 'x # comment', '1_000', '0x10', '2abc', '(x', 'x)', 'x\ny',
+                '$x', '1.5.2', '07', 'x \\']
+
+    def test_matches_tokenize(self):
+        for s in self.examples:
+            fast = utils._fast_tokenize(s)
+            self.assertIsNotNone(fast, s)
+            slow = [x for x in utils._tokenize_slow(s) if x[0] not in utils._WHITESPACE_TOKENS]
+            self.assertEqual(slow, fast, s)
+
+    def test_fallback(self):
+        for s in self.fallback:
+            self.assertIsNone(utils._fast_tokenize(s), s)
+
+    def test_untokenize(self):
+        for s in self.examples:
+            self.assertEqual(utils.untokenize(utils._tokenize_slow(s)),
+                             utils._untokenize(utils._fast_tokenize(s)), s)
+
+    def test_cache(self):
+        utils._token_cache.clear()
+        self.assertEqual(['x', 'y'], utils.list_tokens('x + y'))
+        self.assertIn('x + y', utils._token_cache)
+        self.assertEqual(['x', 'y'], utils.list_tokens('x + y'))
+        # Callers cannot modify the cached value.
+        utils.list_equation_tokens('x + y').pop()
+        self.assertEqual(['x', 'y'], utils.list_tokens('x + y'))
+
+    def test_cache_limit(self):
+        old_size = utils.TOKEN_CACHE_SIZE
+        try:
+            utils._token_cache.clear()
+            utils.TOKEN_CACHE_SIZE = 3
+            for i in range(0, 5):
+                utils.list_tokens('x{0}'.format(i))
+            self.assertTrue(len(utils._token_cache) <= 3)
+        finally:
+            utils.TOKEN_CACHE_SIZE = old_size
+
+
 class TestReplaceTokenLookup(TestCase):
     def test_replace_1(self):
         self.assertEqual('a =y ', utils.replace_token_from_lookup('a=b', {'b': 'y'}))
@@ -122,6 +172,42 @@ class TestLogger(TestCase):
         Logger.cleanup()
         self.assertTrue(mock.is_closed)
 
+    def test_lazy(self):
+        calls = []
+
+        def payload():
+            calls.append(1)
+            return 'lazy'
+        Logger.cleanup()
+        Logger(payload)
+        self.assertFalse(Logger.is_enabled())
+        mock = MockFile()
+        Logger.log_file_handles = {'log': mock}
+        self.assertTrue(Logger.is_enabled())
+        self.assertFalse(Logger.is_enabled(priority=Logger.priority_cutoff + 1))
+        Logger(payload, priority=Logger.priority_cutoff + 1)
+        self.assertEqual([], calls)
+        Logger(payload)
+        self.assertEqual([1], calls)
+        self.assertEqual(['lazy\n'], mock.buffer)
+        Logger.cleanup()
+
+    def test_buffered_writer(self):
+        mock = MockFile()
+        writer = utils.BufferedLogWriter(mock, buffer_size=10)
+        writer.write('abc')
+        writer.write('defghijk')
+        writer.write('x')
+        writer.flush()
+        self.assertEqual(['abcdefghijk', 'x'], mock.buffer)
+        writer.write('y')
+        writer.close()
+        self.assertEqual(['abcdefghijk', 'x', 'y'], mock.buffer)
+        self.assertTrue(mock.is_closed)
+        # Second close() does nothing.
+        writer.close()
+        writer.flush()
+
     def test_register(self):
         Logger.cleanup()
         Logger.register_log('filename', 'log')
@@ -187,3 +273,145 @@ class TestTimeSeriesHolder(TestCase):
         obj['t'] = [3, ]
         obj['k'] = [2, ]
         self.assertEqual(['k', 't', 'a'], obj.GetSeriesList())
+
+    def test_csv_empty(self):
+        obj = utils.TimeSeriesHolder('k')
+        self.assertEqual('', obj.GenerateCSVtext())
+
+    def test_csv_columns(self):
+        obj = utils.TimeSeriesHolder('k')
+        obj['k'] = [0, 1, 2]
+        obj['a'] = [1.5, 2.5, 3.5]
+        obj['t'] = [3, 4, 5]
+        self.assertEqual('k\tt\ta\n0\t3\t1.5\n1\t4\t2.5\n2\t5\t3.5\n', obj.GenerateCSVtext())
+        # Subsets keep the GetSeriesList() ordering.
+        self.assertEqual('t\ta\n3\t1.5\n4\t2.5\n5\t3.5\n',
+                         obj.GenerateCSVtext(columns=['a', 't']))
+        with self.assertRaises(KeyError):
+            obj.GenerateCSVtext(columns=['x'])
+
+    def test_write_csv_chunks(self):
+        obj = utils.TimeSeriesHolder('k')
+        obj['k'] = [0, 1, 2]
+        obj['a'] = [1, 2, 3]
+        f = MockFile()
+        obj.WriteCSV(f, format_str='%d', chunk_size=2)
+        self.assertEqual(['k\ta\n', '0\t1\n1\t2\n', '2\t3\n'], f.buffer)
+        self.assertEqual(obj.GenerateCSVtext('%d'), ''.join(f.buffer))
+
+    def test_Truncate(self):
+        obj = utils.TimeSeriesHolder('k')
+        obj['k'] = [0, 1, 2]
+        obj['a'] = [1, ]
+        obj.Truncate(2)
+        self.assertEqual([0, 1], obj['k'])
+        self.assertEqual([1], obj['a'])
+
+
+class TestArrayTimeSeriesHolder(TestCase):
+    def test_Truncate(self):
+        obj = utils.ArrayTimeSeriesHolder('k', ['x', 'y'], 4)
+        obj['x'] = [1., 2., 3.]
+        obj['y'] = [2., ]
+        obj.Truncate(2)
+        self.assertEqual([1., 2.], obj['x'])
+        self.assertEqual([2.], obj['y'])
+        obj['x'].append(5.)
+        self.assertEqual([1., 2., 5.], obj['x'])
+
+    def test_window_constant(self):
+        obj = utils.ArrayTimeSeriesHolder('k', ['k', 'x'], 4, window=2)
+        obj.SetConstant('x', 2., 3)
+        obj['k'] = [0., ]
+        for k in (1., 2., 3.):
+            obj['k'].append(k)
+        self.assertEqual([2., 2., 2.], obj['x'])
+        self.assertEqual([2., 2.], obj['x'][1:])
+        self.assertEqual(2., obj['x'][-1])
+        obj['x'][0] = 2.
+        with self.assertRaises(ValueError):
+            obj['x'][0] = 3.
+        with self.assertRaises(IndexError):
+            obj['x'][3]
+        obj['x'].append(2.)
+        # Rows start at the first period held by every series.
+        self.assertEqual('k\tx\n2\t2\n3\t2\n', obj.GenerateCSVtext())
+        copied = copy.deepcopy(obj)
+        self.assertEqual([2., 2., 2., 2.], copied['x'])
+        obj.Truncate(2)
+        self.assertEqual([2., 2.], obj['x'])
+        self.assertEqual(4, len(copied['x']))
+        # Assigning a list gives the series a row again.
+        obj['x'] = [1., 2.]
+        obj['x'].append(3.)
+        self.assertEqual([2., 3.], obj['x'][1:])
+        self.assertEqual(1, obj['x'].FirstIndex)
+
+    def test_create(self):
+        obj = utils.ArrayTimeSeriesHolder('k', ['x', 'y'], 4)
+        self.assertEqual([], list(obj.keys()))
+        self.assertEqual(8, len(obj.Data))
+
+    def test_assign_append(self):
+        obj = utils.ArrayTimeSeriesHolder('k', ['x', 'y'], 4)
+        obj['x'] = [1., ]
+        obj['y'] = [2., 3.]
+        obj['x'].append(4.)
+        self.assertEqual([1., 4.], obj['x'])
+        self.assertEqual([2., 3.], obj['y'])
+        self.assertEqual(2, len(obj['x']))
+        # Both series live in the same block
+        self.assertIs(obj['x'].Data, obj['y'].Data)
+        self.assertIs(obj.Data, obj['x'].Data)
+
+    def test_grow(self):
+        obj = utils.ArrayTimeSeriesHolder('k', ['x', 'y'], 2)
+        obj['x'] = [1., 2.]
+        obj['y'] = [5., ]
+        obj['x'].append(3.)
+        self.assertEqual([1., 2., 3.], obj['x'])
+        self.assertEqual([5.], obj['y'])
+        self.assertIsNot(obj.Data, obj['x'].Data)
+
+    def test_undeclared(self):
+        obj = utils.ArrayTimeSeriesHolder('k', ['x'], 2)
+        obj['z'] = [1., 2., 3.]
+        self.assertEqual([1., 2., 3.], obj['z'])
+        self.assertEqual(['x'], list(obj.FreeRows.keys()))
+
+    def test_indexing(self):
+        obj = utils.ArrayTimeSeriesHolder('k', ['x'], 5)
+        obj['x'] = [0., 1., 2., 3.]
+        self.assertEqual(3., obj['x'][-1])
+        self.assertEqual([1., 2.], obj['x'][1:3])
+        self.assertEqual([0., 2.], obj['x'][::2])
+        self.assertEqual([], obj['x'][3:1])
+        obj['x'][0] = 10.
+        self.assertEqual(10., obj['x'][0])
+        with self.assertRaises(IndexError):
+            obj['x'][4]
+
+    def test_constant(self):
+        obj = utils.ArrayTimeSeriesHolder('k', ['x'], 3)
+        obj.SetConstant('x', 2., 3)
+        self.assertEqual([2., 2., 2.], obj['x'])
+        obj.SetConstant('x', 1., 5)
+        self.assertEqual([1.] * 5, obj['x'])
+
+    def test_deepcopy(self):
+        obj = utils.ArrayTimeSeriesHolder('k', ['x', 'y'], 3)
+        obj['x'] = [1., 2.]
+        obj['y'] = [3., ]
+        cpy = copy.deepcopy(obj)
+        cpy['x'].append(5.)
+        cpy['y'][0] = 0.
+        self.assertEqual([1., 2.], obj['x'])
+        self.assertEqual([3.], obj['y'])
+        self.assertEqual([1., 2., 5.], cpy['x'])
+        self.assertEqual([0.], cpy['y'])
+
+    def test_csv(self):
+        obj = utils.ArrayTimeSeriesHolder('k', ['k', 'foo'], 2)
+        obj['k'] = [0, 1]
+        obj['foo'] = [10, 11]
+        self.assertEqual('k\tfoo\n0\t10\n1\t11\n', obj.GenerateCSVtext())